@@ -0,0 +1,18 @@
+from .models import AttorneyProfile
+
+
+def get_attorney_profile(request):
+    """
+    Return the current user's AttorneyProfile, loaded once per request.
+
+    Raises AttorneyProfile.DoesNotExist if the user has no profile.
+    """
+    # Cache on the underlying HttpRequest so every DRF Request wrapping it shares it
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, '_attorney_profile'):
+        http_request._attorney_profile = AttorneyProfile.objects.filter(
+            user=request.user
+        ).select_related('user').first()
+    if http_request._attorney_profile is None:
+        raise AttorneyProfile.DoesNotExist('No attorney profile for the current user.')
+    return http_request._attorney_profile
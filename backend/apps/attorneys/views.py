@@ -18,6 +18,7 @@ from .serializers import (
     AttorneyAvailabilitySerializer
 )
 from .filters import AttorneyFilter
+from .utils import get_attorney_profile
 
 
 class IsAttorney(permissions.BasePermission):
@@ -136,14 +137,13 @@ class AttorneyAvailabilityListView(generics.ListCreateAPIView):
         )
 
     def perform_create(self, serializer):
-        attorney_profile = AttorneyProfile.objects.get(user=self.request.user)
-        serializer.save(attorney=attorney_profile)
+        serializer.save(attorney=get_attorney_profile(self.request))
 
     def create(self, request, *args, **kwargs):
         # Handle bulk update via { slots: [...] } format from mobile app
         if 'slots' in request.data:
             try:
-                attorney_profile = AttorneyProfile.objects.get(user=request.user)
+                attorney_profile = get_attorney_profile(request)
             except AttorneyProfile.DoesNotExist:
                 return Response(
                     {"detail": "Complete your attorney profile before setting availability."},
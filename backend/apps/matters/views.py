@@ -264,7 +264,7 @@ class ClientDashboardView(APIView):
 
         upcoming_appointments = Appointment.objects.filter(
             client=user,
-            date__gte=timezone.now().date(),
+            end_at__gt=timezone.now(),
             status='confirmed'
         ).count()
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, Message, MessageReadReceipt
+from .models import Conversation, Message, MessageReadReceipt, MessageAttachment
 
 
 class MessageInline(admin.TabularInline):
@@ -18,7 +18,10 @@ class ConversationAdmin(admin.ModelAdmin):
     list_filter = ('conversation_type', 'is_active', 'created_at')
     search_fields = ('matter__title', 'title')
     filter_horizontal = ('participants',)
-    readonly_fields = ('id', 'created_at', 'updated_at', 'last_message_at')
+    readonly_fields = (
+        'id', 'created_at', 'updated_at', 'last_message_at',
+        'last_message_id', 'last_message_preview', 'last_message_type', 'last_message_sender'
+    )
     inlines = [MessageInline]
 
 
@@ -36,3 +39,11 @@ class MessageReadReceiptAdmin(admin.ModelAdmin):
     list_filter = ('read_at',)
     search_fields = ('user__email',)
     readonly_fields = ('message', 'user', 'read_at')
+
+
+@admin.register(MessageAttachment)
+class MessageAttachmentAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'content_type', 'size', 'preview_status', 'created_at')
+    list_filter = ('content_type', 'preview_status')
+    search_fields = ('sha256',)
+    readonly_fields = ('id', 'sha256', 'size', 'content_type', 'created_at')
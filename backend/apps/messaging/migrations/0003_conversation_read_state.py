@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversation_state(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+    ConversationReadState = apps.get_model('messaging', 'ConversationReadState')
+
+    for conversation in Conversation.objects.prefetch_related('participants').iterator(chunk_size=500):
+        last = Message.objects.filter(conversation=conversation).order_by('-created_at').first()
+        if last:
+            Conversation.objects.filter(pk=conversation.pk).update(
+                last_message_at=last.created_at,
+                last_message_id=last.pk,
+                last_message_preview=(last.content or '')[:100],
+                last_message_type=last.message_type,
+                last_message_sender_id=last.sender_id,
+            )
+
+        states = []
+        for user in conversation.participants.all():
+            unread = Message.objects.filter(
+                conversation=conversation, is_read=False
+            ).exclude(sender=user).count()
+            states.append(ConversationReadState(
+                conversation=conversation, user=user, unread_count=unread
+            ))
+        ConversationReadState.objects.bulk_create(states, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_type',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ConversationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='messaging.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'conversation read state',
+                'verbose_name_plural': 'conversation read states',
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+        migrations.RunPython(backfill_conversation_state, migrations.RunPython.noop),
+    ]
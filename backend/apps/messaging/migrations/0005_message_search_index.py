@@ -0,0 +1,76 @@
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE messaging_message
+    ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+    """,
+    """
+    CREATE INDEX messaging_message_search_idx
+    ON messaging_message USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS messaging_message_search_idx",
+    "ALTER TABLE messaging_message DROP COLUMN IF EXISTS search_vector",
+]
+
+# External-content FTS5 table keyed on the message rowid, kept in sync by
+# triggers. Used as a local stand-in for the PostgreSQL index.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE messaging_message_fts USING fts5(
+        content, content='messaging_message', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER messaging_message_fts_ai AFTER INSERT ON messaging_message BEGIN
+        INSERT INTO messaging_message_fts(rowid, content) VALUES (new.rowid, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER messaging_message_fts_ad AFTER DELETE ON messaging_message BEGIN
+        INSERT INTO messaging_message_fts(messaging_message_fts, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER messaging_message_fts_au AFTER UPDATE OF content ON messaging_message BEGIN
+        INSERT INTO messaging_message_fts(messaging_message_fts, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+        INSERT INTO messaging_message_fts(rowid, content) VALUES (new.rowid, new.content);
+    END
+    """,
+    "INSERT INTO messaging_message_fts(messaging_message_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS messaging_message_fts_au",
+    "DROP TRIGGER IF EXISTS messaging_message_fts_ad",
+    "DROP TRIGGER IF EXISTS messaging_message_fts_ai",
+    "DROP TABLE IF EXISTS messaging_message_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_message_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:36
+
+import apps.messaging.models
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_message_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageAttachment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(max_length=255, upload_to=apps.messaging.models.attachment_upload_path)),
+                ('size', models.PositiveBigIntegerField()),
+                ('content_type', models.CharField(max_length=100)),
+                ('thumbnail', models.ImageField(blank=True, null=True, upload_to='message_files/thumbnails/')),
+                ('preview', models.ImageField(blank=True, null=True, upload_to='message_files/previews/')),
+                ('preview_status', models.CharField(choices=[('none', 'Not Applicable'), ('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'message attachment',
+                'verbose_name_plural': 'message attachments',
+            },
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='messaging.messageattachment'),
+        ),
+    ]
@@ -1,9 +1,17 @@
+import os
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
 
+def attachment_upload_path(instance, filename):
+    """Content-addressed upload path for message attachments."""
+    digest = instance.sha256
+    extension = os.path.splitext(filename)[1].lower()
+    return f'message_files/sha256/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
 class Conversation(models.Model):
     """A conversation between two or more users."""
 
@@ -43,6 +51,17 @@ class Conversation(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_message_at = models.DateTimeField(null=True, blank=True)
 
+    # Denormalized last message, maintained by MessageIngestService
+    last_message_id = models.UUIDField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=100, blank=True)
+    last_message_type = models.CharField(max_length=20, blank=True)
+    last_message_sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+'
+    )
+
     class Meta:
         verbose_name = _('conversation')
         verbose_name_plural = _('conversations')
@@ -59,6 +78,45 @@ class Conversation(models.Model):
         return 0  # Implemented in view
 
 
+class MessageAttachment(models.Model):
+    """
+    A stored attachment file, addressed by the SHA-256 of its content.
+
+    Messages that send identical bytes share one attachment row and one
+    stored copy of the file.
+    """
+
+    class PreviewStatus(models.TextChoices):
+        NONE = 'none', _('Not Applicable')
+        PENDING = 'pending', _('Pending')
+        READY = 'ready', _('Ready')
+        FAILED = 'failed', _('Failed')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=attachment_upload_path, max_length=255)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+
+    # Generated in the background for images
+    thumbnail = models.ImageField(upload_to='message_files/thumbnails/', blank=True, null=True)
+    preview = models.ImageField(upload_to='message_files/previews/', blank=True, null=True)
+    preview_status = models.CharField(
+        max_length=10,
+        choices=PreviewStatus.choices,
+        default=PreviewStatus.NONE
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('message attachment')
+        verbose_name_plural = _('message attachments')
+
+    def __str__(self):
+        return f"{self.content_type} {self.sha256[:12]}"
+
+
 class Message(models.Model):
     """A message within a conversation."""
 
@@ -95,6 +153,12 @@ class Message(models.Model):
     file_name = models.CharField(max_length=255, blank=True)
     file_size = models.PositiveIntegerField(null=True, blank=True)
     file_type = models.CharField(max_length=100, blank=True)
+    attachment = models.ForeignKey(
+        MessageAttachment,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='messages'
+    )
 
     # Status
     is_read = models.BooleanField(default=False)
@@ -118,15 +182,48 @@ class Message(models.Model):
         verbose_name = _('message')
         verbose_name_plural = _('messages')
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at', 'id']),
+            models.Index(fields=['conversation', 'updated_at']),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender} at {self.created_at}"
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update conversation's last_message_at
-        self.conversation.last_message_at = self.created_at
-        self.conversation.save(update_fields=['last_message_at', 'updated_at'])
+        creating = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Only new messages touch conversation metadata; edits and
+            # soft deletes leave the conversation row alone.
+            if creating:
+                from .services import MessageIngestService
+                MessageIngestService.record_new_message(self)
+
+
+class ConversationReadState(models.Model):
+    """Per-participant unread counter for a conversation."""
+
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='read_states'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='conversation_read_states'
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('conversation read state')
+        verbose_name_plural = _('conversation read states')
+        unique_together = ['conversation', 'user']
+
+    def __str__(self):
+        return f"{self.user} has {self.unread_count} unread in {self.conversation_id}"
 
 
 class MessageReadReceipt(models.Model):
@@ -1,12 +1,27 @@
 from rest_framework import serializers
 from django.utils import timezone
 
-from .models import Conversation, Message, MessageReadReceipt
+from .models import Conversation, Message, MessageReadReceipt, MessageAttachment
+
+
+class MessageAttachmentSerializer(serializers.ModelSerializer):
+    """
+    Serializer for attachment metadata in message payloads.
+
+    Only thumbnail and preview URLs are included; the full file is fetched
+    through the message attachment endpoint.
+    """
+
+    class Meta:
+        model = MessageAttachment
+        fields = ['id', 'content_type', 'size', 'thumbnail', 'preview', 'preview_status']
+        read_only_fields = fields
 
 
 class MessageSerializer(serializers.ModelSerializer):
     """Serializer for messages."""
 
+    attachment = MessageAttachmentSerializer(read_only=True)
     sender_name = serializers.CharField(source='sender.full_name', read_only=True)
     sender_avatar = serializers.ImageField(source='sender.avatar', read_only=True)
     is_own = serializers.SerializerMethodField()
@@ -16,7 +31,7 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'conversation', 'sender', 'sender_name', 'sender_avatar',
             'message_type', 'content', 'file', 'file_name', 'file_size', 'file_type',
-            'is_read', 'is_edited', 'is_deleted', 'reply_to',
+            'attachment', 'is_read', 'is_edited', 'is_deleted', 'reply_to',
             'created_at', 'updated_at', 'read_at', 'is_own'
         ]
         read_only_fields = [
@@ -31,6 +46,75 @@ class MessageSerializer(serializers.ModelSerializer):
         return False
 
 
+class MessageSyncSerializer(serializers.ModelSerializer):
+    """Compact serializer for delta sync payloads."""
+
+    attachment = MessageAttachmentSerializer(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = [
+            'id', 'sender', 'message_type', 'content',
+            'file', 'file_name', 'file_size', 'file_type', 'attachment',
+            'reply_to', 'is_edited', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class MessageSyncQuerySerializer(serializers.Serializer):
+    """Serializer for delta sync query parameters."""
+
+    cursor = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=500)
+
+    def validate_cursor(self, value):
+        from .services import MessageSyncService
+
+        if not value:
+            return None
+        try:
+            MessageSyncService.decode_cursor(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+
+class MessageSearchQuerySerializer(serializers.Serializer):
+    """Serializer for message search query parameters."""
+
+    q = serializers.CharField(min_length=2, max_length=200)
+    conversation = serializers.UUIDField(required=False)
+    matter = serializers.UUIDField(required=False)
+    sender = serializers.UUIDField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError("date_from must be before date_to.")
+        return data
+
+
+class MessageSearchResultSerializer(serializers.ModelSerializer):
+    """Serializer for ranked message search results."""
+
+    sender_name = serializers.CharField(source='sender.full_name', read_only=True)
+    highlight = serializers.SerializerMethodField()
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = [
+            'id', 'conversation', 'sender', 'sender_name', 'message_type',
+            'content', 'highlight', 'rank', 'created_at'
+        ]
+        read_only_fields = fields
+
+    def get_highlight(self, obj):
+        from .services import MessageSearchService
+        return MessageSearchService.render_highlight(getattr(obj, 'highlight', ''))
+
+
 class MessageCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating messages."""
 
@@ -49,17 +133,21 @@ class MessageCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['sender'] = self.context['request'].user
 
-        # Handle file upload
-        if 'file' in validated_data and validated_data['file']:
-            file = validated_data['file']
+        # Store the upload as a deduplicated attachment
+        file = validated_data.pop('file', None)
+        if file:
+            from .services import AttachmentService
+
+            attachment = AttachmentService.store(file)
+            validated_data['attachment'] = attachment
             validated_data['file_name'] = file.name
-            validated_data['file_size'] = file.size
-            validated_data['file_type'] = file.content_type
+            validated_data['file_size'] = attachment.size
+            validated_data['file_type'] = attachment.content_type
 
-            # Determine message type from file
-            if file.content_type.startswith('image/'):
+            # Determine message type from the detected content type
+            if attachment.content_type.startswith('image/'):
                 validated_data['message_type'] = Message.MessageType.IMAGE
-            elif file.content_type.startswith('audio/'):
+            elif attachment.content_type.startswith('audio/'):
                 validated_data['message_type'] = Message.MessageType.VOICE
             else:
                 validated_data['message_type'] = Message.MessageType.FILE
@@ -96,23 +184,25 @@ class ConversationSerializer(serializers.ModelSerializer):
         ]
 
     def get_last_message(self, obj):
-        last_msg = obj.messages.order_by('-created_at').first()
-        if last_msg:
+        if obj.last_message_id:
+            sender = obj.last_message_sender
             return {
-                'id': str(last_msg.id),
-                'content': last_msg.content[:100] if last_msg.content else '',
-                'message_type': last_msg.message_type,
-                'sender_name': last_msg.sender.full_name if last_msg.sender else 'System',
-                'created_at': last_msg.created_at
+                'id': str(obj.last_message_id),
+                'content': obj.last_message_preview,
+                'message_type': obj.last_message_type,
+                'sender_name': sender.full_name if sender else 'System',
+                'created_at': obj.last_message_at
             }
         return None
 
     def get_unread_count(self, obj):
         request = self.context.get('request')
         if request and request.user:
-            return obj.messages.filter(
-                is_read=False
-            ).exclude(sender=request.user).count()
+            # Views prefetch the current user's read state into user_read_states
+            states = getattr(obj, 'user_read_states', None)
+            if states is None:
+                states = obj.read_states.filter(user=request.user)
+            return states[0].unread_count if states else 0
         return 0
 
 
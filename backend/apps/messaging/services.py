@@ -0,0 +1,547 @@
+import base64
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import re
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Q, F, Value, FloatField
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.dateparse import parse_datetime
+
+from .models import Conversation, ConversationReadState, Message, MessageAttachment
+
+logger = logging.getLogger(__name__)
+
+
+class MessageIngestService:
+    """Service for keeping conversation metadata in step with its messages."""
+
+    PREVIEW_LENGTH = 100
+
+    @classmethod
+    def record_new_message(cls, message):
+        """
+        Update conversation metadata for a newly created message.
+
+        The conversation row is written with a single conditional UPDATE, so
+        a message that lands after a newer one never rewinds the preview.
+        Unread counters live on ConversationReadState rows and are bumped
+        for every participant except the sender.
+        """
+        Conversation.objects.filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.created_at),
+            pk=message.conversation_id
+        ).update(
+            last_message_at=message.created_at,
+            last_message_id=message.pk,
+            last_message_preview=(message.content or '')[:cls.PREVIEW_LENGTH],
+            last_message_type=message.message_type,
+            last_message_sender_id=message.sender_id,
+            updated_at=timezone.now()
+        )
+
+        counters = ConversationReadState.objects.filter(
+            conversation_id=message.conversation_id
+        )
+        if message.sender_id:
+            counters = counters.exclude(user_id=message.sender_id)
+        counters.update(unread_count=F('unread_count') + 1)
+
+        if message.sender_id and message.message_type != Message.MessageType.SYSTEM:
+            transaction.on_commit(lambda: MessageFanoutService.schedule(message))
+
+    @classmethod
+    def record_changed_message(cls, message):
+        """
+        Refresh the conversation preview after a message is edited or deleted.
+
+        Only touches the conversation while the message is still its latest,
+        so an edit never overwrites the preview of a newer message.
+        """
+        Conversation.objects.filter(
+            pk=message.conversation_id,
+            last_message_id=message.pk
+        ).update(
+            last_message_preview=(message.content or '')[:cls.PREVIEW_LENGTH],
+            last_message_type=message.message_type,
+            updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def add_read_states(conversation_ids, user_ids):
+        """Create missing read state rows for conversation participants."""
+        ConversationReadState.objects.bulk_create(
+            [
+                ConversationReadState(conversation_id=cid, user_id=uid)
+                for cid in conversation_ids
+                for uid in user_ids
+            ],
+            ignore_conflicts=True
+        )
+
+
+class MessageFanoutService:
+    """
+    Service for coalescing new-message notifications.
+
+    Time is split into fixed windows per conversation. The first message in
+    a window schedules one fan-out task for the end of that window. The task
+    then notifies each participant once about every message in the window
+    that they didn't send.
+    """
+
+    # Extra delay after a window closes so late commits are still picked up
+    GRACE_SECONDS = 2
+
+    @staticmethod
+    def _window_seconds():
+        return settings.MESSAGE_NOTIFICATION_WINDOW_SECONDS
+
+    @classmethod
+    def schedule(cls, message):
+        """Schedule the fan-out for the window this message falls in."""
+        from .tasks import fan_out_messages
+
+        window = cls._window_seconds()
+        window_start = int(message.created_at.timestamp()) // window * window
+        key = f'messaging:fanout:{message.conversation_id}:{window_start}'
+
+        # Only the first message of the window schedules the task
+        if not cache.add(key, True, timeout=window * 2):
+            return
+
+        eta = datetime.fromtimestamp(
+            window_start + window + cls.GRACE_SECONDS, tz=dt_timezone.utc
+        )
+        try:
+            fan_out_messages.apply_async(
+                args=[str(message.conversation_id), window_start],
+                eta=eta
+            )
+        except Exception:
+            cache.delete(key)
+            logger.exception('Could not schedule message fan-out for %s', message.conversation_id)
+
+    @classmethod
+    def fan_out(cls, conversation_id, window_start):
+        """
+        Create one new-message notification per recipient for a window.
+        Returns the number of notifications created.
+        """
+        from apps.notifications.models import Notification
+        from apps.notifications.services import NotificationService
+
+        start = datetime.fromtimestamp(window_start, tz=dt_timezone.utc)
+        end = start + timedelta(seconds=cls._window_seconds())
+
+        messages = list(
+            Message.objects.filter(
+                conversation_id=conversation_id,
+                created_at__gte=start,
+                created_at__lt=end,
+                sender__isnull=False,
+                is_deleted=False
+            ).exclude(
+                message_type=Message.MessageType.SYSTEM
+            ).select_related('sender').order_by('created_at')
+        )
+        if not messages:
+            return 0
+
+        conversation = Conversation.objects.get(pk=conversation_id)
+        notifications = []
+
+        for recipient in conversation.participants.filter(is_active=True):
+            incoming = [m for m in messages if m.sender_id != recipient.pk]
+            if not incoming:
+                continue
+
+            sender_names = list(dict.fromkeys(m.sender.full_name for m in incoming))
+            if len(incoming) == 1:
+                title = 'New Message'
+                text = f'New message from {sender_names[0]}'
+            else:
+                title = f'{len(incoming)} New Messages'
+                text = f'{len(incoming)} new messages from {", ".join(sender_names)}'
+
+            notifications.append(Notification(
+                user=recipient,
+                notification_type=Notification.NotificationType.NEW_MESSAGE,
+                title=title,
+                message=text,
+                related_object_type=Conversation.__name__,
+                related_object_id=conversation.pk,
+                action_url=f'/messages/{conversation.pk}'
+            ))
+
+        NotificationService.create_notifications(notifications)
+        return len(notifications)
+
+
+class MessageSyncService:
+    """Service for incremental (delta) message sync."""
+
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 500
+
+    @staticmethod
+    def encode_cursor(created_at, message_id, updated_at, updated_id=None):
+        """Encode a sync position into an opaque cursor string."""
+        payload = {
+            'c': created_at.isoformat() if created_at else None,
+            'i': str(message_id) if message_id else None,
+            'u': updated_at.isoformat() if updated_at else None,
+            'v': str(updated_id) if updated_id else None,
+        }
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Decode a cursor produced by encode_cursor.
+        Raises ValueError if the cursor is malformed.
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            created_at = parse_datetime(payload['c']) if payload.get('c') else None
+            message_id = uuid.UUID(payload['i']) if payload.get('i') else None
+            updated_at = parse_datetime(payload['u']) if payload.get('u') else None
+            updated_id = uuid.UUID(payload['v']) if payload.get('v') else None
+        except (TypeError, KeyError, AttributeError, ValueError) as exc:
+            raise ValueError('Invalid sync cursor.') from exc
+
+        if (created_at is None) != (message_id is None):
+            raise ValueError('Invalid sync cursor.')
+        return created_at, message_id, updated_at, updated_id
+
+    @classmethod
+    def changes_since(cls, conversation_id, cursor=None, limit=DEFAULT_LIMIT):
+        """
+        Collect the messages a client is missing since its cursor.
+
+        Returns a dict with new messages (created after the cursor position),
+        edited messages and deleted message ids (created at or before the
+        cursor position but updated after its watermark), the next cursor
+        and whether another call is needed to catch up.
+        """
+        created_at, message_id, updated_at, updated_id = (
+            cls.decode_cursor(cursor) if cursor else (None, None, None, None)
+        )
+        messages = Message.objects.filter(
+            conversation_id=conversation_id
+        ).select_related('attachment')
+
+        # New messages, in (created_at, id) order after the cursor position
+        new_qs = messages.filter(is_deleted=False)
+        if created_at:
+            new_qs = new_qs.filter(
+                Q(created_at__gt=created_at) |
+                Q(created_at=created_at, id__gt=message_id)
+            )
+        new = list(new_qs.order_by('created_at', 'id')[:limit + 1])
+        new_has_more = len(new) > limit
+        new = new[:limit]
+
+        # Edits and deletes of messages the client already has
+        changed = []
+        changed_has_more = False
+        if created_at:
+            changed_qs = messages.filter(
+                Q(created_at__lt=created_at) |
+                Q(created_at=created_at, id__lte=message_id)
+            )
+            if updated_at and updated_id:
+                changed_qs = changed_qs.filter(
+                    Q(updated_at__gt=updated_at) |
+                    Q(updated_at=updated_at, id__gt=updated_id)
+                )
+            elif updated_at:
+                changed_qs = changed_qs.filter(updated_at__gt=updated_at)
+            changed = list(changed_qs.order_by('updated_at', 'id')[:limit + 1])
+            changed_has_more = len(changed) > limit
+            changed = changed[:limit]
+
+        # Advance the cursor
+        if new:
+            created_at, message_id = new[-1].created_at, new[-1].id
+
+        if changed_has_more:
+            updated_at, updated_id = changed[-1].updated_at, changed[-1].id
+        else:
+            seen = [m.updated_at for m in new + changed]
+            if updated_at:
+                seen.append(updated_at)
+            updated_at = max(seen) if seen else None
+            updated_id = None
+
+        return {
+            'messages': new,
+            'updated': [m for m in changed if not m.is_deleted],
+            'deleted': [m.id for m in changed if m.is_deleted],
+            'cursor': cls.encode_cursor(created_at, message_id, updated_at, updated_id),
+            'has_more': new_has_more or changed_has_more,
+        }
+
+
+class MessageSearchService:
+    """
+    Service for full-text search over the messages a user can see.
+
+    PostgreSQL uses the generated ``search_vector`` column and its GIN index,
+    SQLite uses the ``messaging_message_fts`` FTS5 table. Both are created by
+    migration 0005. Other backends fall back to a substring scan.
+    """
+
+    # Control characters mark matches so content can be escaped before the
+    # markers are turned into HTML.
+    HIGHLIGHT_START = '\x02'
+    HIGHLIGHT_STOP = '\x03'
+
+    @classmethod
+    def search(cls, user, query, conversation_id=None, matter_id=None,
+               sender_id=None, date_from=None, date_to=None):
+        """Return ranked messages matching query, annotated with rank and highlight."""
+        messages = Message.objects.filter(
+            conversation_id__in=Conversation.objects.filter(
+                participants=user
+            ).values('id'),
+            is_deleted=False
+        )
+
+        if conversation_id:
+            messages = messages.filter(conversation_id=conversation_id)
+        if matter_id:
+            messages = messages.filter(conversation__matter_id=matter_id)
+        if sender_id:
+            messages = messages.filter(sender_id=sender_id)
+        if date_from:
+            messages = messages.filter(
+                created_at__gte=timezone.make_aware(datetime.combine(date_from, time.min))
+            )
+        if date_to:
+            messages = messages.filter(
+                created_at__lt=timezone.make_aware(
+                    datetime.combine(date_to + timedelta(days=1), time.min)
+                )
+            )
+
+        messages = messages.select_related('sender')
+
+        if connection.vendor == 'postgresql':
+            return cls._search_postgresql(messages, query)
+        if connection.vendor == 'sqlite':
+            return cls._search_sqlite(messages, query)
+        return cls._search_fallback(messages, query)
+
+    @classmethod
+    def _search_postgresql(cls, messages, query):
+        tsquery = "websearch_to_tsquery('english', %s)"
+        options = (
+            f'StartSel={cls.HIGHLIGHT_START}, StopSel={cls.HIGHLIGHT_STOP}, '
+            'MaxFragments=2, MaxWords=20, MinWords=5'
+        )
+        return messages.extra(
+            select={
+                'rank': f'ts_rank_cd(messaging_message.search_vector, {tsquery})',
+                'highlight': f"ts_headline('english', messaging_message.content, {tsquery}, %s)",
+            },
+            select_params=[query, query, options],
+            where=[f'messaging_message.search_vector @@ {tsquery}'],
+            params=[query]
+        ).order_by('-rank', '-created_at')
+
+    @classmethod
+    def _search_sqlite(cls, messages, query):
+        # Quote every term so user input can't inject FTS5 query syntax
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return messages.none()
+        fts_query = ' '.join(f'"{term}"' for term in terms)
+
+        # bm25() is lower-is-better; negate it so rank sorts like PostgreSQL
+        return messages.extra(
+            tables=['messaging_message_fts'],
+            select={
+                'rank': '-bm25(messaging_message_fts)',
+                'highlight': "snippet(messaging_message_fts, 0, %s, %s, '...', 24)",
+            },
+            select_params=[cls.HIGHLIGHT_START, cls.HIGHLIGHT_STOP],
+            where=[
+                'messaging_message_fts.rowid = messaging_message.rowid',
+                'messaging_message_fts MATCH %s',
+            ],
+            params=[fts_query]
+        ).order_by('-rank', '-created_at')
+
+    @classmethod
+    def _search_fallback(cls, messages, query):
+        return messages.filter(content__icontains=query).annotate(
+            rank=Value(0.0, output_field=FloatField()),
+            highlight=F('content')
+        ).order_by('-created_at')
+
+    @classmethod
+    def render_highlight(cls, highlight):
+        """Escape a highlight fragment and wrap matches in <mark> tags."""
+        return escape(highlight or '').replace(
+            cls.HIGHLIGHT_START, '<mark>'
+        ).replace(cls.HIGHLIGHT_STOP, '</mark>')
+
+
+class AttachmentService:
+    """Service for storing deduplicated message attachments."""
+
+    THUMBNAIL_SIZE = (320, 320)
+    PREVIEW_SIZE = (1280, 1280)
+
+    # (offset, signature, content type), checked in order
+    SIGNATURES = [
+        (0, b'%PDF-', 'application/pdf'),
+        (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+        (0, b'\xff\xd8\xff', 'image/jpeg'),
+        (0, b'GIF87a', 'image/gif'),
+        (0, b'GIF89a', 'image/gif'),
+        (8, b'WEBP', 'image/webp'),
+        (8, b'WAVE', 'audio/wav'),
+        (0, b'ID3', 'audio/mpeg'),
+        (0, b'OggS', 'audio/ogg'),
+        (4, b'ftypM4A', 'audio/mp4'),
+        (4, b'ftyp', 'video/mp4'),
+        (0, b'\x1aE\xdf\xa3', 'video/webm'),
+    ]
+
+    @classmethod
+    def sniff_content_type(cls, head, file_name=''):
+        """
+        Detect a content type from the first bytes of a file.
+
+        The client-supplied type is never trusted. The file name is only
+        used for formats without a usable signature, and can't turn a file
+        into an image or audio type on its own.
+        """
+        guessed, _ = mimetypes.guess_type(file_name or '')
+
+        for offset, signature, content_type in cls.SIGNATURES:
+            if head[offset:offset + len(signature)] == signature:
+                # WebM is used for both voice notes and video
+                if content_type == 'video/webm' and guessed == 'audio/webm':
+                    return guessed
+                return content_type
+
+        if guessed and not guessed.startswith(('image/', 'audio/', 'video/')):
+            return guessed
+        return 'application/octet-stream'
+
+    @classmethod
+    def store(cls, uploaded_file):
+        """
+        Store an uploaded file, reusing an existing copy with the same content.
+
+        The file is hashed chunk by chunk and handed to storage as a file
+        object, so it is never read into memory as a whole.
+        Returns a MessageAttachment.
+        """
+        digest = hashlib.sha256()
+        head = b''
+        size = 0
+        for chunk in uploaded_file.chunks():
+            if len(head) < 16:
+                head += chunk[:16 - len(head)]
+            digest.update(chunk)
+            size += len(chunk)
+        sha256 = digest.hexdigest()
+
+        existing = MessageAttachment.objects.filter(sha256=sha256).first()
+        if existing:
+            return existing
+
+        content_type = cls.sniff_content_type(head, uploaded_file.name)
+        attachment = MessageAttachment(
+            sha256=sha256,
+            size=size,
+            content_type=content_type,
+            preview_status=(
+                MessageAttachment.PreviewStatus.PENDING
+                if content_type.startswith('image/')
+                else MessageAttachment.PreviewStatus.NONE
+            )
+        )
+
+        # Storage backends take the object's content type from the upload
+        uploaded_file.content_type = content_type
+        uploaded_file.seek(0)
+        extension = mimetypes.guess_extension(content_type) or ''
+        attachment.file.save(f'{sha256}{extension}', uploaded_file, save=False)
+
+        try:
+            with transaction.atomic():
+                attachment.save()
+        except IntegrityError:
+            # A concurrent upload of the same content won the race. Storages
+            # that overwrite wrote to the winner's key, so only remove our
+            # copy when it landed under a name of its own.
+            winner = MessageAttachment.objects.get(sha256=sha256)
+            if attachment.file.name != winner.file.name:
+                attachment.file.delete(save=False)
+            return winner
+
+        if attachment.preview_status == MessageAttachment.PreviewStatus.PENDING:
+            transaction.on_commit(lambda: cls._schedule_previews(attachment.pk))
+
+        return attachment
+
+    @staticmethod
+    def _schedule_previews(attachment_id):
+        from .tasks import generate_attachment_previews
+
+        try:
+            generate_attachment_previews.delay(str(attachment_id))
+        except Exception:
+            # Previews are optional; the attachment just stays pending
+            logger.exception('Could not schedule previews for attachment %s', attachment_id)
+
+    @classmethod
+    def generate_previews(cls, attachment_id):
+        """Render thumbnail and preview images for an image attachment."""
+        from PIL import Image, ImageOps
+
+        attachment = MessageAttachment.objects.filter(pk=attachment_id).first()
+        if not attachment or attachment.preview_status != MessageAttachment.PreviewStatus.PENDING:
+            return
+
+        try:
+            with attachment.file.open('rb') as source:
+                image = ImageOps.exif_transpose(Image.open(source))
+                image = image.convert('RGB')
+
+            for field_name, size in (
+                ('thumbnail', cls.THUMBNAIL_SIZE),
+                ('preview', cls.PREVIEW_SIZE),
+            ):
+                rendered = image.copy()
+                rendered.thumbnail(size)
+                buffer = io.BytesIO()
+                rendered.save(buffer, format='JPEG', quality=85, optimize=True)
+                getattr(attachment, field_name).save(
+                    f'{attachment.sha256}.jpg',
+                    ContentFile(buffer.getvalue()),
+                    save=False
+                )
+
+            attachment.preview_status = MessageAttachment.PreviewStatus.READY
+        except Exception:
+            logger.exception('Could not generate previews for attachment %s', attachment_id)
+            attachment.preview_status = MessageAttachment.PreviewStatus.FAILED
+
+        attachment.save(update_fields=['thumbnail', 'preview', 'preview_status'])
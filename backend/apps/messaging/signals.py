@@ -0,0 +1,31 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from .models import Conversation, ConversationReadState
+from .services import MessageIngestService
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_read_states(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep one read state row per conversation participant."""
+    if action == 'post_add' and pk_set:
+        if reverse:
+            MessageIngestService.add_read_states(pk_set, [instance.pk])
+        else:
+            MessageIngestService.add_read_states([instance.pk], pk_set)
+
+    elif action == 'post_remove' and pk_set:
+        if reverse:
+            ConversationReadState.objects.filter(
+                user=instance, conversation_id__in=pk_set
+            ).delete()
+        else:
+            ConversationReadState.objects.filter(
+                conversation=instance, user_id__in=pk_set
+            ).delete()
+
+    elif action == 'post_clear':
+        if reverse:
+            ConversationReadState.objects.filter(user=instance).delete()
+        else:
+            ConversationReadState.objects.filter(conversation=instance).delete()
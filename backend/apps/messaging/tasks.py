@@ -0,0 +1,15 @@
+from celery import shared_task
+
+from .services import AttachmentService, MessageFanoutService
+
+
+@shared_task(ignore_result=True)
+def generate_attachment_previews(attachment_id):
+    """Generate thumbnail and preview images for an attachment."""
+    AttachmentService.generate_previews(attachment_id)
+
+
+@shared_task(ignore_result=True)
+def fan_out_messages(conversation_id, window_start):
+    """Notify participants about the messages sent in one window."""
+    return MessageFanoutService.fan_out(conversation_id, window_start)
@@ -11,8 +11,11 @@ urlpatterns = [
 
     # Messages
     path('conversations/<uuid:conversation_id>/messages/', views.MessageListView.as_view(), name='message-list'),
+    path('conversations/<uuid:conversation_id>/messages/sync/', views.MessageSyncView.as_view(), name='message-sync'),
+    path('messages/search/', views.MessageSearchView.as_view(), name='message-search'),
     path('messages/send/', views.MessageCreateView.as_view(), name='message-send'),
     path('messages/<uuid:pk>/', views.MessageDetailView.as_view(), name='message-detail'),
+    path('messages/<uuid:pk>/attachment/', views.MessageAttachmentView.as_view(), name='message-attachment'),
 
     # Read status
     path('mark-read/', views.MarkAsReadView.as_view(), name='mark-read'),
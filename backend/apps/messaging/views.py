@@ -3,14 +3,30 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.utils import timezone
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Sum, Prefetch, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from .models import Conversation, Message, MessageReadReceipt, TypingIndicator
+from .models import (
+    Conversation, Message, MessageReadReceipt, TypingIndicator,
+    ConversationReadState
+)
 from .serializers import (
     ConversationSerializer, ConversationCreateSerializer,
     MessageSerializer, MessageCreateSerializer,
+    MessageSyncSerializer, MessageSyncQuerySerializer,
+    MessageSearchQuerySerializer, MessageSearchResultSerializer,
     MarkAsReadSerializer, TypingIndicatorSerializer
 )
+from .services import MessageIngestService, MessageSyncService, MessageSearchService
+
+
+def user_read_state_prefetch(user):
+    """Prefetch only the given user's read state for each conversation."""
+    return Prefetch(
+        'read_states',
+        queryset=ConversationReadState.objects.filter(user=user),
+        to_attr='user_read_states'
+    )
 
 
 class ConversationListView(generics.ListAPIView):
@@ -23,7 +39,9 @@ class ConversationListView(generics.ListAPIView):
         return Conversation.objects.filter(
             participants=self.request.user,
             is_active=True
-        ).prefetch_related('participants', 'messages').order_by('-last_message_at')
+        ).select_related('last_message_sender').prefetch_related(
+            'participants', user_read_state_prefetch(self.request.user)
+        ).order_by('-last_message_at')
 
 
 class ConversationCreateView(generics.CreateAPIView):
@@ -42,7 +60,9 @@ class ConversationDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         return Conversation.objects.filter(
             participants=self.request.user
-        ).prefetch_related('participants')
+        ).select_related('last_message_sender').prefetch_related(
+            'participants', user_read_state_prefetch(self.request.user)
+        )
 
 
 class MessageListView(generics.ListAPIView):
@@ -57,7 +77,68 @@ class MessageListView(generics.ListAPIView):
             conversation_id=conversation_id,
             conversation__participants=self.request.user,
             is_deleted=False
-        ).select_related('sender').order_by('created_at')
+        ).select_related('sender', 'attachment').order_by('created_at')
+
+
+class MessageSyncView(APIView):
+    """
+    Delta sync for a conversation.
+
+    Returns only messages created, edited or deleted since the client's
+    cursor, plus the cursor to send next time.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, conversation_id):
+        serializer = MessageSyncQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        if not Conversation.objects.filter(
+            id=conversation_id,
+            participants=request.user
+        ).exists():
+            return Response(
+                {'detail': 'Conversation not found.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        changes = MessageSyncService.changes_since(
+            conversation_id,
+            cursor=serializer.validated_data.get('cursor'),
+            limit=serializer.validated_data.get('limit', MessageSyncService.DEFAULT_LIMIT)
+        )
+
+        return Response({
+            'messages': MessageSyncSerializer(changes['messages'], many=True).data,
+            'updated': MessageSyncSerializer(changes['updated'], many=True).data,
+            'deleted': [str(pk) for pk in changes['deleted']],
+            'cursor': changes['cursor'],
+            'has_more': changes['has_more'],
+        })
+
+
+class MessageSearchView(generics.ListAPIView):
+    """Full-text search across the current user's conversations."""
+
+    serializer_class = MessageSearchResultSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = []
+
+    def get_queryset(self):
+        params = MessageSearchQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        return MessageSearchService.search(
+            self.request.user,
+            data['q'],
+            conversation_id=data.get('conversation'),
+            matter_id=data.get('matter'),
+            sender_id=data.get('sender'),
+            date_from=data.get('date_from'),
+            date_to=data.get('date_to')
+        )
 
 
 class MessageCreateView(generics.CreateAPIView):
@@ -81,13 +162,42 @@ class MessageDetailView(generics.RetrieveUpdateDestroyAPIView):
         )
 
     def perform_update(self, serializer):
-        serializer.save(is_edited=True)
+        message = serializer.save(is_edited=True)
+        MessageIngestService.record_changed_message(message)
 
     def perform_destroy(self, instance):
         # Soft delete
         instance.is_deleted = True
         instance.content = "[Message deleted]"
         instance.save()
+        MessageIngestService.record_changed_message(instance)
+
+
+class MessageAttachmentView(APIView):
+    """Get a download URL for a message's attachment."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        message = Message.objects.filter(
+            pk=pk,
+            conversation__participants=request.user,
+            is_deleted=False
+        ).select_related('attachment').first()
+
+        if not message or not (message.attachment or message.file):
+            return Response(
+                {'detail': 'Attachment not found.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        stored = message.attachment.file if message.attachment else message.file
+        return Response({
+            'url': stored.url,
+            'file_name': message.file_name,
+            'file_size': message.file_size,
+            'file_type': message.file_type,
+        })
 
 
 class MarkAsReadView(APIView):
@@ -113,13 +223,36 @@ class MarkAsReadView(APIView):
             message_ids = list(messages.values_list('id', flat=True))
             messages.update(is_read=True, read_at=now)
 
+            ConversationReadState.objects.filter(
+                conversation_id=serializer.validated_data['conversation_id'],
+                user=user
+            ).update(unread_count=0, last_read_at=now)
+
         elif serializer.validated_data.get('message_ids'):
             message_ids = serializer.validated_data['message_ids']
-            Message.objects.filter(
+            messages = Message.objects.filter(
                 id__in=message_ids,
                 conversation__participants=user,
                 is_read=False
-            ).exclude(sender=user).update(is_read=True, read_at=now)
+            ).exclude(sender=user)
+
+            conversation_ids = set(messages.values_list('conversation_id', flat=True))
+            messages.update(is_read=True, read_at=now)
+
+            # Recount what is left unread in the touched conversations
+            remaining = Message.objects.filter(
+                conversation=OuterRef('conversation'),
+                is_read=False
+            ).exclude(sender=user).order_by().values('conversation').annotate(
+                count=Count('pk')
+            ).values('count')
+            ConversationReadState.objects.filter(
+                conversation_id__in=conversation_ids,
+                user=user
+            ).update(
+                unread_count=Coalesce(Subquery(remaining), 0),
+                last_read_at=now
+            )
 
         # Create read receipts
         for msg_id in message_ids:
@@ -168,10 +301,9 @@ class UnreadCountView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        count = Message.objects.filter(
-            conversation__participants=request.user,
-            is_read=False
-        ).exclude(sender=request.user).count()
+        count = ConversationReadState.objects.filter(
+            user=request.user
+        ).aggregate(total=Sum('unread_count'))['total'] or 0
 
         return Response({'unread_count': count})
 
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Notification, NotificationPreference, DeviceToken
+from .models import (
+    Notification, NotificationArchive, NotificationPreference, NotificationDelivery, DeviceToken
+)
 
 
 @admin.register(Notification)
@@ -11,6 +13,23 @@ class NotificationAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('user', 'notification_type', 'title', 'created_at', 'archived_at')
+    list_filter = ('notification_type',)
+    search_fields = ('user__email', 'title')
+    readonly_fields = ('id', 'created_at', 'read_at', 'archived_at')
+    date_hierarchy = 'created_at'
+
+
+@admin.register(NotificationDelivery)
+class NotificationDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('notification', 'channel', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('channel', 'status')
+    search_fields = ('notification__user__email', 'last_error')
+    readonly_fields = ('id', 'created_at', 'sent_at')
+
+
 @admin.register(NotificationPreference)
 class NotificationPreferenceAdmin(admin.ModelAdmin):
     list_display = ('user', 'email_enabled', 'sms_enabled', 'push_enabled', 'quiet_hours_enabled')
@@ -0,0 +1,110 @@
+"""
+Per-user inbox cache for badge polling.
+
+Each user has a cached unread count and a buffer holding the serialized
+first page of their notifications. The count is adjusted in place with
+incr/decr as notifications are created and read. The buffer is dropped on
+every change and rebuilt by the next list request.
+
+Cache writes run after the surrounding transaction commits, so rolled back
+changes never reach the cache. Both keys expire after CACHE_TIMEOUT, which
+bounds any drift from races between a rebuild and a concurrent write.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification
+
+CACHE_TIMEOUT = 60 * 10
+
+# Notifications kept in the recent buffer: one default-sized page
+RECENT_LIMIT = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+
+
+def unread_count_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def recent_key(user_id):
+    return f'notifications:recent:{user_id}'
+
+
+def get_unread_count(user_id):
+    """Return the user's unread notification count, cached per user."""
+    count = cache.get(unread_count_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(unread_count_key(user_id), count, CACHE_TIMEOUT)
+    return count
+
+
+def get_recent(user_id):
+    """
+    Return the cached first page as {'count': total, 'results': [...]},
+    or None when it needs rebuilding.
+    """
+    return cache.get(recent_key(user_id))
+
+
+def set_recent(user_id, count, results):
+    cache.set(
+        recent_key(user_id),
+        {'count': count, 'results': results[:RECENT_LIMIT]},
+        CACHE_TIMEOUT
+    )
+
+
+def _adjust_unread(user_id, delta):
+    key = unread_count_key(user_id)
+    try:
+        value = cache.incr(key, delta)
+    except ValueError:
+        # Not cached; the next read counts from the database
+        return
+    if value < 0:
+        cache.delete(key)
+
+
+def notification_created(notification):
+    """Count a new unread notification and drop the user's recent buffer."""
+    user_id = notification.user_id
+
+    def apply():
+        if not notification.is_read:
+            _adjust_unread(user_id, 1)
+        cache.delete(recent_key(user_id))
+
+    transaction.on_commit(apply)
+
+
+def notifications_created(notifications):
+    """
+    Drop both keys for every recipient of a bulk insert.
+
+    One delete_many is cheaper than an incr per recipient for large
+    batches; the next poll rebuilds each entry with one query.
+    """
+    invalidate({notification.user_id for notification in notifications})
+
+
+def notifications_read(user_id, count):
+    """Record that count of the user's unread notifications were marked read."""
+    if not count:
+        return
+
+    def apply():
+        _adjust_unread(user_id, -count)
+        cache.delete(recent_key(user_id))
+
+    transaction.on_commit(apply)
+
+
+def invalidate(user_ids):
+    """Drop the cached count and recent buffer for the given users."""
+    keys = []
+    for user_id in user_ids:
+        keys.extend((unread_count_key(user_id), recent_key(user_id)))
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
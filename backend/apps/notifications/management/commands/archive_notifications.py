@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from apps.notifications.services import NotificationRetentionService
+
+
+class Command(BaseCommand):
+    help = "Archive read notifications older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Retention period in days (default: NOTIFICATION_RETENTION_DAYS)'
+        )
+        parser.add_argument('--batch-size', type=int, default=NotificationRetentionService.BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Only print retention metrics'
+        )
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            summary = NotificationRetentionService.run(
+                retention_days=options['days'],
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {summary['archived']} notifications in {summary['batches']} batches "
+                f"({summary['duration_seconds']}s, cutoff {summary['cutoff']})"
+            ))
+
+        for key, value in NotificationRetentionService.metrics(options['days']).items():
+            self.stdout.write(f"{key}: {value}")
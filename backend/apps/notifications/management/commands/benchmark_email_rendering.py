@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from apps.notifications import rendering
+from apps.notifications.models import Notification
+from apps.users.models import User
+
+
+def _legacy_template_name(notification_type):
+    # Per-call prefix scan used before templates were resolved at import
+    for prefix, template_name in rendering.TEMPLATE_PREFIX_ROUTES:
+        if notification_type.startswith(prefix):
+            return template_name
+    return None
+
+
+class Command(BaseCommand):
+    help = "Compare per-call render_to_string with compiled batch email rendering"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=1000)
+        parser.add_argument(
+            '--type', default=Notification.NotificationType.NEW_MESSAGE,
+            choices=Notification.NotificationType.values
+        )
+
+    def handle(self, *args, **options):
+        count = options['recipients']
+        notification_type = options['type']
+        template_name = rendering.EMAIL_TEMPLATES.get(notification_type)
+        if not template_name:
+            self.stderr.write(f"No email template for {notification_type}")
+            return
+
+        # Unsaved instances: rendering only needs attribute access
+        recipients = [
+            (
+                user,
+                Notification(
+                    user=user, notification_type=notification_type,
+                    title='Benchmark', message='Benchmark message body'
+                )
+            )
+            for user in (
+                User(email=f'bench{i}@example.com', first_name=f'User{i}', last_name='Bench')
+                for i in range(count)
+            )
+        ]
+
+        start = time.perf_counter()
+        for user, notification in recipients:
+            context = rendering.base_context()
+            context.update({'user': user, 'notification': notification})
+            render_to_string(_legacy_template_name(notification_type), context)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rendering.render_many(
+            template_name,
+            [{'user': user, 'notification': notification} for user, notification in recipients],
+            shared_context=rendering.base_context()
+        )
+        batched = time.perf_counter() - start
+
+        self.stdout.write(f"Template: {template_name}, recipients: {count}")
+        self.stdout.write(f"render_to_string per email: {legacy * 1000:.1f} ms ({legacy / count * 1e6:.0f} us/email)")
+        self.stdout.write(f"compiled render_many:       {batched * 1000:.1f} ms ({batched / count * 1e6:.0f} us/email)")
+        if batched:
+            self.stdout.write(self.style.SUCCESS(f"Speedup: {legacy / batched:.2f}x"))
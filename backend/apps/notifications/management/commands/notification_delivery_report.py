@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from apps.notifications import metrics
+
+
+class Command(BaseCommand):
+    help = "Print notification delivery health per channel and notification type"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=24,
+            help=f'Hours to report on (at most {metrics.RETENTION_HOURS})'
+        )
+
+    def handle(self, *args, **options):
+        hours = options['hours']
+        rows = metrics.report(hours)
+
+        self.stdout.write(self.style.NOTICE(f"Notification deliveries, last {hours}h"))
+        if not rows:
+            self.stdout.write("No deliveries recorded.")
+        else:
+            header = (
+                f"{'channel':<7} {'type':<24} {'sent':>7} {'failed':>7} {'dead':>5} "
+                f"{'fail%':>6} {'sent/h':>8} {'mean ms':>8} {'p50':>6} {'p95':>6}"
+            )
+            self.stdout.write(header)
+            self.stdout.write('-' * len(header))
+            for row in rows:
+                line = (
+                    f"{row['channel']:<7} {row['notification_type']:<24} {row['sent']:>7} "
+                    f"{row['failed']:>7} {row['dead']:>5} {row['failure_rate'] * 100:>5.1f}% "
+                    f"{row['sent_per_hour']:>8} {_ms(row['latency_ms_mean']):>8} "
+                    f"{_ms(row['latency_ms_p50'], upper=True):>6} {_ms(row['latency_ms_p95'], upper=True):>6}"
+                )
+                if row['failure_rate'] >= 0.05 or row['dead']:
+                    line = self.style.WARNING(line)
+                self.stdout.write(line)
+
+        self.stdout.write('')
+        self.stdout.write(self.style.NOTICE("Outbox"))
+        outbox = metrics.outbox_status()
+        if not outbox:
+            self.stdout.write("Empty.")
+        for channel, statuses in sorted(outbox.items()):
+            counts = ', '.join(f"{name}={count}" for name, count in sorted(statuses.items()))
+            self.stdout.write(f"{channel}: {counts}")
+
+
+def _ms(value, upper=False):
+    if value is None:
+        # Percentiles above the largest bucket have no upper bound
+        return f'>{metrics.LATENCY_BUCKETS_MS[-1]}' if upper else '-'
+    return f'{value}' if upper else f'{value:.1f}'
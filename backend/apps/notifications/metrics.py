@@ -0,0 +1,198 @@
+"""
+Notification delivery metrics.
+
+Every send is recorded per channel and notification type: a sent or failed
+counter, plus a latency histogram with fixed buckets. Counters live in
+the cache in hourly buckets that expire after RETENTION_HOURS, so they
+are shared by every worker.
+
+Inside collect(), records are summed in memory and written once when the
+block exits. That keeps cache traffic per outbox batch, not per send.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Notification, NotificationDelivery
+
+RETENTION_HOURS = 48
+
+# Upper bounds of the latency buckets, in milliseconds
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+SENT = 'sent'
+FAILED = 'failed'
+DEAD = 'dead'
+OUTCOMES = (SENT, FAILED, DEAD)
+
+# Sends recorded under these types as well as the notification types
+DIGEST = 'digest'
+ACCOUNT = 'account'
+EXTRA_TYPES = (DIGEST, ACCOUNT)
+
+_local = threading.local()
+
+
+def _hour(timestamp=None):
+    return int(timestamp or time.time()) // 3600
+
+
+def _key(hour, channel, notification_type, name):
+    return f'notifications:metrics:{hour}:{channel}:{notification_type}:{name}'
+
+
+def _bucket_name(duration_ms):
+    for bound in LATENCY_BUCKETS_MS:
+        if duration_ms <= bound:
+            return f'le_{bound}'
+    return 'le_inf'
+
+
+BUCKET_NAMES = tuple(f'le_{bound}' for bound in LATENCY_BUCKETS_MS) + ('le_inf',)
+
+
+def record(channel, notification_type, outcome, duration=None):
+    """
+    Record one delivery attempt.
+    duration is the send time in seconds; None for outcomes with no send.
+    """
+    counts = Counter()
+    hour = _hour()
+    counts[_key(hour, channel, notification_type, outcome)] += 1
+    if duration is not None:
+        duration_ms = int(duration * 1000)
+        counts[_key(hour, channel, notification_type, _bucket_name(duration_ms))] += 1
+        counts[_key(hour, channel, notification_type, 'latency_ms_sum')] += duration_ms
+
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.update(counts)
+    else:
+        _flush(counts)
+
+
+@contextmanager
+def timed(channel, notification_type):
+    """
+    Time a send and record it as sent, or as failed if the block raises.
+    The exception is re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record(channel, notification_type, FAILED, time.perf_counter() - start)
+        raise
+    record(channel, notification_type, SENT, time.perf_counter() - start)
+
+
+@contextmanager
+def collect():
+    """Buffer records made in this thread and write them when the block exits."""
+    if getattr(_local, 'pending', None) is not None:
+        # Already collecting further up the stack
+        yield
+        return
+
+    _local.pending = Counter()
+    try:
+        yield
+    finally:
+        pending, _local.pending = _local.pending, None
+        _flush(pending)
+
+
+def _flush(counts):
+    timeout = RETENTION_HOURS * 3600
+    # Mark each (hour, channel, type) seen so report() only reads those
+    seen = {key.rsplit(':', 1)[0] + ':seen' for key in counts}
+    for key in seen:
+        cache.add(key, 1, timeout)
+
+    for key, value in counts.items():
+        if not value:
+            continue
+        cache.add(key, 0, timeout)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(key, value, timeout)
+
+
+def _percentile(buckets, total, fraction):
+    """Upper bound of the bucket holding the given fraction of sends."""
+    if not total:
+        return None
+    threshold = total * fraction
+    cumulative = 0
+    for bound, name in zip(LATENCY_BUCKETS_MS + (None,), BUCKET_NAMES):
+        cumulative += buckets.get(name, 0)
+        if cumulative >= threshold:
+            return bound
+    return None
+
+
+def report(hours=24):
+    """
+    Summarize the last `hours` hours per channel and notification type.
+
+    Returns a list of rows with sent, failed and dead counts, failure rate,
+    throughput per hour, mean latency and approximate p50/p95 latency.
+    Percentiles are bucket upper bounds; None means above the largest
+    bucket.
+    """
+    hours = max(1, min(hours, RETENTION_HOURS))
+    current = _hour()
+    names = OUTCOMES + BUCKET_NAMES + ('latency_ms_sum',)
+
+    seen = cache.get_many([
+        _key(hour, channel, notification_type, 'seen')
+        for hour in range(current - hours + 1, current + 1)
+        for channel in NotificationDelivery.Channel.values
+        for notification_type in Notification.NotificationType.values + list(EXTRA_TYPES)
+    ])
+    values = cache.get_many([
+        key[:-len('seen')] + name
+        for key in seen
+        for name in names
+    ])
+
+    totals = {}
+    for key, value in values.items():
+        _, _, _, channel, notification_type, name = key.split(':')
+        totals.setdefault((channel, notification_type), Counter())[name] += value
+
+    rows = []
+    for (channel, notification_type), counts in sorted(totals.items()):
+        attempts = counts[SENT] + counts[FAILED]
+        timed_sends = sum(counts[name] for name in BUCKET_NAMES)
+        rows.append({
+            'channel': channel,
+            'notification_type': notification_type,
+            'sent': counts[SENT],
+            'failed': counts[FAILED],
+            'dead': counts[DEAD],
+            'failure_rate': round(counts[FAILED] / attempts, 4) if attempts else 0.0,
+            'sent_per_hour': round(counts[SENT] / hours, 2),
+            'latency_ms_mean': (
+                round(counts['latency_ms_sum'] / timed_sends, 1) if timed_sends else None
+            ),
+            'latency_ms_p50': _percentile(counts, timed_sends, 0.5),
+            'latency_ms_p95': _percentile(counts, timed_sends, 0.95),
+        })
+    return rows
+
+
+def outbox_status():
+    """Current outbox row counts per channel and status."""
+    summary = {}
+    for row in NotificationDelivery.objects.values('channel', 'status').annotate(
+        total=Count('id')
+    ).order_by():
+        summary.setdefault(row['channel'], {})[row['status']] = row['total']
+    return summary
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_delivery'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='devicetoken',
+            index=models.Index(fields=['user', 'is_active'], name='notificatio_user_id_f0e72c_idx'),
+        ),
+    ]
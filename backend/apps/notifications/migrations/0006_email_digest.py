@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationpreference',
+            name='email_delivery_mode',
+            field=models.CharField(choices=[('immediate', 'Immediate'), ('hourly', 'Hourly Digest'), ('daily', 'Daily Digest')], default='immediate', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='notificationpreference',
+            name='last_digest_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notificationdelivery',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('dead', 'Dead'), ('digest', 'Held for Digest')], default='pending', max_length=10),
+        ),
+    ]
@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -92,15 +93,118 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'is_read', '-created_at']),
+            # Read notifications by age, for the retention job
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(is_read=True),
+                name='notification_read_age_idx'
+            ),
         ]
 
     def __str__(self):
         return f"{self.title} - {self.user.email}"
 
 
+class NotificationArchive(models.Model):
+    """
+    Compact copy of a read notification moved out of the hot table.
+
+    Keeps what is needed to answer history and audit questions; delivery
+    flags and the action URL are dropped.
+    """
+
+    # Same id as the archived notification
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_notifications'
+    )
+
+    notification_type = models.CharField(max_length=30)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+
+    related_object_type = models.CharField(max_length=50, blank=True)
+    related_object_id = models.UUIDField(null=True, blank=True)
+
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('archived notification')
+        verbose_name_plural = _('archived notifications')
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} (archived)"
+
+
+class NotificationDelivery(models.Model):
+    """
+    Outbox entry for delivering a notification over one channel.
+
+    Rows are drained in batches by a background worker. Failed sends are
+    retried with exponential backoff and parked as dead after the last
+    attempt.
+    """
+
+    class Channel(models.TextChoices):
+        EMAIL = 'email', _('Email')
+        PUSH = 'push', _('Push')
+        SMS = 'sms', _('SMS')
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        SENDING = 'sending', _('Sending')
+        SENT = 'sent', _('Sent')
+        DEAD = 'dead', _('Dead')
+        # Email held until the user's next digest
+        DIGEST = 'digest', _('Held for Digest')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name='deliveries'
+    )
+    channel = models.CharField(max_length=10, choices=Channel.choices)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Due time for pending rows; lease expiry for rows being sent
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('notification delivery')
+        verbose_name_plural = _('notification deliveries')
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} delivery of {self.notification_id} ({self.status})"
+
+
 class NotificationPreference(models.Model):
     """User notification preferences."""
 
+    class EmailDeliveryMode(models.TextChoices):
+        IMMEDIATE = 'immediate', _('Immediate')
+        HOURLY = 'hourly', _('Hourly Digest')
+        DAILY = 'daily', _('Daily Digest')
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
@@ -115,6 +219,12 @@ class NotificationPreference(models.Model):
     email_appointments = models.BooleanField(default=True)
     email_payments = models.BooleanField(default=True)
     email_marketing = models.BooleanField(default=False)
+    email_delivery_mode = models.CharField(
+        max_length=10,
+        choices=EmailDeliveryMode.choices,
+        default=EmailDeliveryMode.IMMEDIATE
+    )
+    last_digest_sent_at = models.DateTimeField(null=True, blank=True)
 
     # SMS preferences
     sms_enabled = models.BooleanField(default=False)
@@ -170,6 +280,9 @@ class DeviceToken(models.Model):
         verbose_name = _('device token')
         verbose_name_plural = _('device tokens')
         unique_together = ['user', 'token']
+        indexes = [
+            models.Index(fields=['user', 'is_active']),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.platform}"
@@ -0,0 +1,132 @@
+"""Cached notification preference lookups and type-to-preference routing."""
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Notification, NotificationPreference
+
+CACHE_TIMEOUT = 60 * 15
+
+# Cached in place of a preference row for users that don't have one
+_MISSING = 'missing'
+
+# Notification type prefixes and the email preference field that gates them
+EMAIL_PREFIX_ROUTES = (
+    ('matter_', 'email_matter_updates'),
+    ('new_message', 'email_messages'),
+    ('appointment_', 'email_appointments'),
+    ('payment_', 'email_payments'),
+    ('invoice_', 'email_payments'),
+)
+
+
+def _build_email_routes():
+    routes = {}
+    for notification_type in Notification.NotificationType.values:
+        for prefix, field in EMAIL_PREFIX_ROUTES:
+            if notification_type.startswith(prefix):
+                routes[notification_type] = field
+                break
+    return routes
+
+
+# Resolved once at import: notification type -> email preference field.
+# Types without an entry are always emailed when email is enabled.
+EMAIL_PREFERENCE_FIELDS = _build_email_routes()
+
+
+def cache_key(user_id):
+    return f'notifications:preferences:{user_id}'
+
+
+def get_preferences(user_id):
+    """Return a user's NotificationPreference (or None), cached per user."""
+    cached = cache.get(cache_key(user_id))
+    if cached is not None:
+        return None if cached == _MISSING else cached
+
+    preferences = NotificationPreference.objects.filter(user_id=user_id).first()
+    cache.set(cache_key(user_id), preferences or _MISSING, CACHE_TIMEOUT)
+    return preferences
+
+
+def get_preferences_bulk(user_ids):
+    """
+    Return {user_id: NotificationPreference or None} for many users.
+    Cache misses are loaded with a single query.
+    """
+    keys = {cache_key(user_id): user_id for user_id in set(user_ids)}
+    cached = cache.get_many(list(keys))
+
+    result = {
+        keys[key]: None if value == _MISSING else value
+        for key, value in cached.items()
+    }
+
+    missing = [user_id for key, user_id in keys.items() if key not in cached]
+    if missing:
+        loaded = {
+            preferences.user_id: preferences
+            for preferences in NotificationPreference.objects.filter(user_id__in=missing)
+        }
+        cache.set_many(
+            {cache_key(user_id): loaded.get(user_id, _MISSING) for user_id in missing},
+            CACHE_TIMEOUT
+        )
+        for user_id in missing:
+            result[user_id] = loaded.get(user_id)
+
+    return result
+
+
+def invalidate_preferences(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def _zone(tz_name):
+    try:
+        return ZoneInfo(tz_name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def in_quiet_hours(preferences, local_time):
+    """
+    Whether local_time falls inside the user's quiet hours.
+
+    Windows whose start is after their end cross midnight, e.g. 22:00-07:00.
+    The end time itself is outside the window. A window with equal start
+    and end is treated as empty.
+    """
+    if not preferences or not preferences.quiet_hours_enabled:
+        return False
+    start, end = preferences.quiet_hours_start, preferences.quiet_hours_end
+    if start is None or end is None or start == end:
+        return False
+    if start < end:
+        return start <= local_time < end
+    return local_time >= start or local_time < end
+
+
+def quiet_hours_release_at(preferences, tz_name, now=None):
+    """
+    When a notification held back by quiet hours may be delivered.
+
+    Quiet hours are read in the user's timezone (User.timezone).
+    Returns the aware end of the current quiet window, or None when the
+    user isn't in quiet hours right now.
+    """
+    now = now or timezone.now()
+    zone = _zone(tz_name)
+    local_now = now.astimezone(zone)
+    if not in_quiet_hours(preferences, local_now.time()):
+        return None
+
+    release = datetime.combine(local_now.date(), preferences.quiet_hours_end, tzinfo=zone)
+    if release <= local_now:
+        release = datetime.combine(
+            local_now.date() + timedelta(days=1), preferences.quiet_hours_end, tzinfo=zone
+        )
+    return release
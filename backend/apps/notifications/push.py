@@ -0,0 +1,305 @@
+"""
+Push notification delivery.
+
+Providers implement BasePushProvider.send(), which sends one message to a
+batch of device tokens on one platform and reports the outcome per token.
+The provider is chosen with the PUSH_PROVIDER setting; push is disabled
+while it is empty. LocalPushProvider records sends in memory for
+development and tests, and is never used unless selected.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import DeviceToken
+
+logger = logging.getLogger(__name__)
+
+
+class PushResult:
+    """Outcome of sending to a single device token."""
+
+    __slots__ = ('token', 'ok', 'invalid', 'error')
+
+    def __init__(self, token, ok=True, invalid=False, error=''):
+        self.token = token
+        self.ok = ok
+        # The provider says the token will never work again
+        self.invalid = invalid
+        self.error = error
+
+    def __repr__(self):
+        return f"PushResult(ok={self.ok}, invalid={self.invalid}, error={self.error!r})"
+
+
+class BasePushProvider:
+    """Interface for push providers."""
+
+    # Most tokens sent per send() call
+    max_batch_size = 500
+
+    def send(self, tokens, message, platform):
+        """
+        Send message to every token in tokens.
+
+        message is a dict with title, body and a flat data dict.
+        Returns one PushResult per token, in the same order.
+        """
+        raise NotImplementedError
+
+
+class LocalPushProvider(BasePushProvider):
+    """
+    In-process provider for development and tests.
+
+    The most recent sends are kept in ``sent``. Tokens starting with
+    ``invalid`` are rejected as unregistered.
+    """
+
+    sent = deque(maxlen=1000)
+
+    def send(self, tokens, message, platform):
+        results = []
+        for token in tokens:
+            if token.startswith('invalid'):
+                results.append(PushResult(token, ok=False, invalid=True, error='UNREGISTERED'))
+            else:
+                self.sent.append({'token': token, 'platform': platform, 'message': message})
+                results.append(PushResult(token))
+        return results
+
+
+class FCMPushProvider(BasePushProvider):
+    """
+    Firebase Cloud Messaging (HTTP v1) provider for iOS, Android and web.
+
+    Requests share one persistent HTTP/2 connection. A thread pool keeps
+    up to PUSH_MAX_CONCURRENCY requests multiplexed on that connection.
+    Needs the httpx[http2] and google-auth packages.
+    """
+
+    endpoint = 'https://fcm.googleapis.com/v1/projects/{project_id}/messages:send'
+    scopes = ['https://www.googleapis.com/auth/firebase.messaging']
+
+    # FCM error codes meaning the token should be dropped
+    invalid_token_errors = {'UNREGISTERED', 'INVALID_ARGUMENT', 'SENDER_ID_MISMATCH'}
+
+    def __init__(self):
+        import httpx
+        from google.oauth2 import service_account
+
+        self.credentials = service_account.Credentials.from_service_account_file(
+            settings.FCM_CREDENTIALS_FILE, scopes=self.scopes
+        )
+        project_id = settings.FCM_PROJECT_ID or self.credentials.project_id
+        self.url = self.endpoint.format(project_id=project_id)
+
+        concurrency = settings.PUSH_MAX_CONCURRENCY
+        self.client = httpx.Client(
+            http2=True,
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=4)
+        )
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._token_lock = threading.Lock()
+
+    def _access_token(self):
+        from google.auth.transport.requests import Request
+
+        with self._token_lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(Request())
+            return self.credentials.token
+
+    def send(self, tokens, message, platform):
+        headers = {'Authorization': f'Bearer {self._access_token()}'}
+        futures = [
+            self.executor.submit(self._send_one, token, message, headers)
+            for token in tokens
+        ]
+        return [future.result() for future in futures]
+
+    def _send_one(self, token, message, headers):
+        body = {
+            'message': {
+                'token': token,
+                'notification': {'title': message['title'], 'body': message['body']},
+                'data': {key: str(value) for key, value in message.get('data', {}).items()},
+            }
+        }
+        try:
+            response = self.client.post(self.url, json=body, headers=headers)
+        except Exception as exc:
+            return PushResult(token, ok=False, error=str(exc))
+
+        if response.status_code == 200:
+            return PushResult(token)
+
+        error_code = ''
+        try:
+            for detail in response.json().get('error', {}).get('details', []):
+                error_code = detail.get('errorCode') or error_code
+        except ValueError:
+            pass
+
+        invalid = response.status_code == 404 or error_code in self.invalid_token_errors
+        return PushResult(
+            token, ok=False, invalid=invalid,
+            error=error_code or f'HTTP {response.status_code}'
+        )
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def is_enabled():
+    """Whether a push provider is configured."""
+    return bool(settings.PUSH_PROVIDER)
+
+
+def get_provider():
+    """Return the configured push provider, created once per process."""
+    global _provider
+    if _provider is None:
+        if not is_enabled():
+            raise ImproperlyConfigured('PUSH_PROVIDER is not set')
+        with _provider_lock:
+            if _provider is None:
+                _provider = import_string(settings.PUSH_PROVIDER)()
+    return _provider
+
+
+class PushService:
+    """Service for fanning notifications out to users' devices."""
+
+    # Outcomes returned per notification by send_notifications()
+    SENT = 'sent'
+    NO_DEVICES = 'no_devices'
+    RATE_LIMITED = 'rate_limited'
+    FAILED = 'failed'
+
+    @staticmethod
+    def _rate_limit_key(token, window_start):
+        digest = hashlib.sha1(token.encode()).hexdigest()
+        return f'notifications:push-rate:{digest}:{window_start}'
+
+    @classmethod
+    def _apply_rate_limit(cls, tokens):
+        """
+        Drop tokens that are over PUSH_TOKEN_RATE_LIMIT for this window.
+
+        This is an approximate fixed-window limiter: counts are read and
+        written in bulk, so concurrent workers can overshoot slightly.
+        """
+        limit, window = settings.PUSH_TOKEN_RATE_LIMIT
+        window_start = int(time.time()) // window * window
+        keys = {cls._rate_limit_key(t['token'], window_start): t for t in tokens}
+        counts = cache.get_many(list(keys))
+
+        allowed = []
+        updates = {}
+        for key, token in keys.items():
+            count = counts.get(key, 0)
+            if count < limit:
+                allowed.append(token)
+                updates[key] = count + 1
+        if updates:
+            cache.set_many(updates, window)
+        return allowed
+
+    @classmethod
+    def send_notifications(cls, notifications):
+        """
+        Send push for a batch of notifications.
+
+        Device tokens for every recipient are loaded in one query. Each
+        notification goes to its user's tokens grouped per platform, in
+        provider-sized batches. Tokens the provider rejects are deactivated.
+        Returns {notification_id: (outcome, error)}.
+        """
+        provider = get_provider()
+        tokens_by_user = defaultdict(list)
+        for token in DeviceToken.objects.filter(
+            user_id__in={n.user_id for n in notifications},
+            is_active=True
+        ).values('id', 'user_id', 'token', 'platform'):
+            tokens_by_user[token['user_id']].append(token)
+
+        outcomes = {}
+        invalid_ids = []
+        used_ids = []
+
+        for notification in notifications:
+            user_tokens = tokens_by_user.get(notification.user_id)
+            if not user_tokens:
+                outcomes[notification.pk] = (cls.NO_DEVICES, 'No active device tokens')
+                continue
+
+            user_tokens = cls._apply_rate_limit(user_tokens)
+            if not user_tokens:
+                outcomes[notification.pk] = (cls.RATE_LIMITED, 'Device rate limit reached')
+                continue
+
+            message = {
+                'title': notification.title,
+                'body': notification.message,
+                'data': {
+                    'notification_id': str(notification.pk),
+                    'notification_type': notification.notification_type,
+                    'action_url': notification.action_url,
+                },
+            }
+
+            started = time.perf_counter()
+            by_platform = defaultdict(list)
+            for token in user_tokens:
+                by_platform[token['platform']].append(token)
+
+            delivered = False
+            errors = []
+            for platform, platform_tokens in by_platform.items():
+                for start in range(0, len(platform_tokens), provider.max_batch_size):
+                    batch = platform_tokens[start:start + provider.max_batch_size]
+                    try:
+                        results = provider.send([t['token'] for t in batch], message, platform)
+                    except Exception as exc:
+                        logger.exception('Push provider failed for %s', platform)
+                        errors.append(str(exc))
+                        continue
+
+                    for token, result in zip(batch, results):
+                        if result.ok:
+                            delivered = True
+                            used_ids.append(token['id'])
+                        elif result.invalid:
+                            invalid_ids.append(token['id'])
+                        else:
+                            errors.append(result.error)
+
+            duration = time.perf_counter() - started
+            if delivered:
+                outcomes[notification.pk] = (cls.SENT, '')
+                metrics.record('push', notification.notification_type, metrics.SENT, duration)
+            elif errors:
+                outcomes[notification.pk] = (cls.FAILED, '; '.join(errors)[:500])
+                metrics.record('push', notification.notification_type, metrics.FAILED, duration)
+            else:
+                outcomes[notification.pk] = (cls.NO_DEVICES, 'All device tokens were rejected')
+
+        if invalid_ids:
+            DeviceToken.objects.filter(id__in=invalid_ids).update(is_active=False)
+        if used_ids:
+            DeviceToken.objects.filter(id__in=used_ids).update(last_used_at=timezone.now())
+
+        return outcomes
@@ -0,0 +1,77 @@
+"""
+Email template rendering.
+
+Compiled templates are kept in memory per process, the notification type to
+template mapping is resolved once at import, and render_many() renders one
+template for many recipients.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.autoreload import file_changed
+
+from .models import Notification
+
+# Notification type prefixes and the HTML template used for them
+TEMPLATE_PREFIX_ROUTES = (
+    ('appointment_confirmed', 'email/appointment_confirmed.html'),
+    ('new_message', 'email/new_message.html'),
+    ('matter_', 'email/matter_status_update.html'),
+    ('signature_requested', 'email/signature_requested.html'),
+    ('payment_received', 'email/payment_received.html'),
+)
+
+
+def _build_template_routes():
+    routes = {}
+    for notification_type in Notification.NotificationType.values:
+        for prefix, template_name in TEMPLATE_PREFIX_ROUTES:
+            if notification_type.startswith(prefix):
+                routes[notification_type] = template_name
+                break
+    return routes
+
+
+# Resolved once at import: notification type -> HTML template name
+EMAIL_TEMPLATES = _build_template_routes()
+
+
+@lru_cache(maxsize=None)
+def compiled_template(template_name):
+    """Return the compiled template, loading and parsing it once per process."""
+    return get_template(template_name)
+
+
+@receiver(file_changed)
+def _clear_compiled_templates(sender, file_path, **kwargs):
+    # Keep the dev server picking up template edits
+    compiled_template.cache_clear()
+
+
+def base_context():
+    """Context shared by every email."""
+    return {
+        'site_url': getattr(settings, 'SITE_URL', 'http://localhost:3000'),
+        'year': timezone.now().year,
+    }
+
+
+def render(template_name, context):
+    """Render a template by name with a context dict."""
+    return compiled_template(template_name).render(context)
+
+
+def render_many(template_name, contexts, shared_context=None):
+    """
+    Render one template for many recipients.
+
+    shared_context is merged under each recipient's context, so values
+    common to the batch are built once.
+    Returns the rendered strings in the same order as contexts.
+    """
+    template = compiled_template(template_name)
+    shared = dict(shared_context or {})
+    return [template.render({**shared, **context}) for context in contexts]
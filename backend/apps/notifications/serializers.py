@@ -23,6 +23,7 @@ class NotificationPreferenceSerializer(serializers.ModelSerializer):
         fields = [
             'email_enabled', 'email_matter_updates', 'email_messages',
             'email_appointments', 'email_payments', 'email_marketing',
+            'email_delivery_mode',
             'sms_enabled', 'sms_appointments', 'sms_urgent_only',
             'push_enabled', 'push_messages', 'push_appointments', 'push_documents',
             'quiet_hours_enabled', 'quiet_hours_start', 'quiet_hours_end'
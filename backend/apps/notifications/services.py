@@ -1,13 +1,38 @@
+import logging
+from datetime import timedelta
+from itertools import islice
+
 from django.utils import timezone
-from django.template.loader import render_to_string
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
-from .models import Notification, NotificationPreference
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.core.cache import cache
+from django.db.models import F, Min
+from .models import (
+    DeviceToken, Notification, NotificationArchive, NotificationDelivery, NotificationPreference
+)
+from .preferences import (
+    EMAIL_PREFERENCE_FIELDS, get_preferences, get_preferences_bulk,
+    invalidate_preferences, quiet_hours_release_at
+)
+from . import inbox, metrics, push, rendering
+
+logger = logging.getLogger(__name__)
 
 
 class NotificationService:
     """Service for creating and sending notifications."""
 
+    # Outbox draining
+    OUTBOX_BATCH_SIZE = 100
+    MAX_ATTEMPTS = 5
+    RETRY_BASE_SECONDS = 60
+    SEND_LEASE_SECONDS = 300
+
+    # Recipients handled per transaction by broadcast()
+    BROADCAST_CHUNK_SIZE = 1000
+
     @classmethod
     def create_notification(
         cls,
@@ -40,17 +65,354 @@ class NotificationService:
             related_object_id=related_object_id,
             action_url=action_url
         )
+        inbox.notification_created(notification)
 
-        # Check preferences and send
-        preferences = NotificationPreference.objects.filter(user=user).first()
+        # Check preferences and queue delivery
+        preferences = get_preferences(user.pk)
+        cls._enqueue_deliveries(
+            [notification], {user.pk: preferences}, send_email, send_push
+        )
 
-        if send_email and cls._should_send_email(preferences, notification_type):
-            cls._send_email_notification(notification)
+        return notification
 
-        if send_push and cls._should_send_push(preferences, notification_type):
-            cls._send_push_notification(notification)
+    @classmethod
+    def create_notifications(cls, notifications, send_email=True, send_push=True):
+        """
+        Bulk-insert unsaved Notification instances and queue their delivery.
+
+        Email and push are sent by a background worker once the surrounding
+        transaction commits, so callers never wait on delivery.
+        """
+        created = Notification.objects.bulk_create(notifications)
+        inbox.notifications_created(created)
+
+        preferences = get_preferences_bulk(
+            notification.user_id for notification in created
+        )
+        cls._enqueue_deliveries(created, preferences, send_email, send_push)
 
-        return notification
+        return created
+
+    @classmethod
+    def broadcast(
+        cls,
+        recipients,
+        notification_type,
+        title,
+        message,
+        related_object=None,
+        action_url='',
+        priority=Notification.Priority.NORMAL,
+        send_email=True,
+        send_push=True
+    ):
+        """
+        Send the same notification to many users.
+
+        recipients is a user queryset (or an iterable of users or user ids).
+        Recipients are processed in chunks: each chunk loads preferences in
+        one query, bulk-inserts its notifications and outbox rows, and
+        queues delivery when its transaction commits.
+        Returns the number of notifications created.
+        """
+        related_object_type = ''
+        related_object_id = None
+
+        if related_object:
+            related_object_type = related_object.__class__.__name__
+            related_object_id = related_object.pk
+
+        if hasattr(recipients, 'values_list'):
+            user_ids = recipients.values_list('pk', flat=True).iterator(
+                chunk_size=cls.BROADCAST_CHUNK_SIZE
+            )
+        else:
+            user_ids = (getattr(recipient, 'pk', recipient) for recipient in recipients)
+
+        total = 0
+        while True:
+            chunk = list(islice(user_ids, cls.BROADCAST_CHUNK_SIZE))
+            if not chunk:
+                break
+
+            with transaction.atomic():
+                cls.create_notifications(
+                    [
+                        Notification(
+                            user_id=user_id,
+                            notification_type=notification_type,
+                            priority=priority,
+                            title=title,
+                            message=message,
+                            related_object_type=related_object_type,
+                            related_object_id=related_object_id,
+                            action_url=action_url
+                        )
+                        for user_id in chunk
+                    ],
+                    send_email=send_email,
+                    send_push=send_push
+                )
+            total += len(chunk)
+
+        return total
+
+    @classmethod
+    def _enqueue_deliveries(cls, notifications, preferences, send_email, send_push):
+        """
+        Write outbox rows for the channels each notification should use.
+
+        Emails for users on a digest are held for NotificationDigestService
+        instead of being sent right away. Pushes that land in the user's
+        quiet hours are due when the quiet hours end; the drain's due-time
+        index picks them up then. Users without an active device token get
+        no push row at all.
+        """
+        now = timezone.now()
+        deliveries = []
+        immediate = False
+        push_notifications = []
+        for notification in notifications:
+            user_preferences = preferences.get(notification.user_id)
+
+            if send_email and cls._should_send_email(user_preferences, notification.notification_type):
+                if NotificationDigestService.should_hold(user_preferences, notification):
+                    status = NotificationDelivery.Status.DIGEST
+                else:
+                    status = NotificationDelivery.Status.PENDING
+                    immediate = True
+                deliveries.append(NotificationDelivery(
+                    notification=notification,
+                    channel=NotificationDelivery.Channel.EMAIL,
+                    status=status
+                ))
+
+            if send_push and cls._should_send_push(user_preferences, notification.notification_type):
+                push_notifications.append(notification)
+
+        if push_notifications:
+            with_devices = set(
+                DeviceToken.objects.filter(
+                    user_id__in={n.user_id for n in push_notifications},
+                    is_active=True
+                ).values_list('user_id', flat=True).distinct()
+            )
+            push_notifications = [n for n in push_notifications if n.user_id in with_devices]
+
+        if push_notifications:
+            timezones = cls._user_timezones(
+                n for n in push_notifications
+                if preferences[n.user_id].quiet_hours_enabled
+                and n.priority != Notification.Priority.URGENT
+            )
+            for notification in push_notifications:
+                release_at = None
+                if notification.user_id in timezones:
+                    release_at = quiet_hours_release_at(
+                        preferences[notification.user_id], timezones[notification.user_id], now
+                    )
+                if release_at is None:
+                    immediate = True
+                deliveries.append(NotificationDelivery(
+                    notification=notification,
+                    channel=NotificationDelivery.Channel.PUSH,
+                    next_attempt_at=release_at or now
+                ))
+
+        if deliveries:
+            NotificationDelivery.objects.bulk_create(deliveries)
+        if immediate:
+            cls._schedule_drain()
+        return deliveries
+
+    @staticmethod
+    def _user_timezones(notifications):
+        """{user_id: timezone name} for the recipients of notifications."""
+        timezones = {}
+        missing = set()
+        for notification in notifications:
+            if Notification.user.is_cached(notification):
+                timezones[notification.user_id] = notification.user.timezone
+            else:
+                missing.add(notification.user_id)
+
+        missing.difference_update(timezones)
+        if missing:
+            timezones.update(
+                get_user_model().objects.filter(pk__in=missing).values_list('pk', 'timezone')
+            )
+        return timezones
+
+    @staticmethod
+    def _schedule_drain():
+        """Ask a worker to drain the outbox once the transaction commits."""
+        from .tasks import drain_notification_outbox
+
+        def dispatch():
+            try:
+                drain_notification_outbox.delay()
+            except Exception:
+                # The periodic drain picks the rows up later
+                logger.exception('Could not schedule notification outbox drain')
+
+        transaction.on_commit(dispatch)
+
+    @classmethod
+    def drain_outbox(cls, batch_size=None):
+        """
+        Claim and send one batch of due outbox rows.
+        Returns the number of rows claimed.
+        """
+        batch_size = batch_size or cls.OUTBOX_BATCH_SIZE
+        now = timezone.now()
+
+        # Claim due rows; rows stuck in sending past their lease are reclaimed
+        with transaction.atomic():
+            claimed = list(
+                NotificationDelivery.objects.select_for_update(skip_locked=True).filter(
+                    status__in=[
+                        NotificationDelivery.Status.PENDING,
+                        NotificationDelivery.Status.SENDING,
+                    ],
+                    next_attempt_at__lte=now
+                ).order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size]
+            )
+            NotificationDelivery.objects.filter(pk__in=claimed).update(
+                status=NotificationDelivery.Status.SENDING,
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + timedelta(seconds=cls.SEND_LEASE_SECONDS)
+            )
+
+        if not claimed:
+            return 0
+
+        with metrics.collect():
+            cls._send_claimed(claimed)
+        return len(claimed)
+
+    @classmethod
+    def _send_claimed(cls, claimed):
+        """Send claimed outbox rows through their channel's sender."""
+        deliveries = list(
+            NotificationDelivery.objects.filter(pk__in=claimed).select_related('notification__user')
+        )
+        emails = [d for d in deliveries if d.channel == NotificationDelivery.Channel.EMAIL]
+        pushes = [d for d in deliveries if d.channel == NotificationDelivery.Channel.PUSH]
+        others = [d for d in deliveries if d.channel not in (
+            NotificationDelivery.Channel.EMAIL, NotificationDelivery.Channel.PUSH
+        )]
+
+        if emails:
+            cls._send_email_batch(emails)
+        if pushes:
+            cls._send_push_batch(pushes)
+        for delivery in others:
+            cls._mark_failed(delivery, f'No sender for channel {delivery.channel}', retry=False)
+
+    @classmethod
+    def _send_email_batch(cls, deliveries):
+        """Send a batch of email deliveries over one connection."""
+        sent = []
+        try:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+        except Exception as exc:
+            for delivery in deliveries:
+                cls._mark_failed(delivery, f'Could not open email connection: {exc}')
+            return
+
+        html = cls._render_email_batch([delivery.notification for delivery in deliveries])
+        try:
+            for delivery in deliveries:
+                try:
+                    with metrics.timed(delivery.channel, delivery.notification.notification_type):
+                        email = cls._build_email_message(
+                            delivery.notification, html_content=html.get(delivery.notification_id)
+                        )
+                        connection.send_messages([email])
+                    sent.append(delivery)
+                except Exception as exc:
+                    cls._mark_failed(delivery, str(exc))
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                logger.warning('Error closing email connection', exc_info=True)
+
+        cls._mark_sent(sent, 'email_sent')
+
+    @classmethod
+    def _send_push_batch(cls, deliveries):
+        """Send a batch of push deliveries through the push provider."""
+        from .push import PushService
+
+        # Pushes deferred past quiet hours are pointless once read
+        read = [d.pk for d in deliveries if d.notification.is_read]
+        if read:
+            NotificationDelivery.objects.filter(pk__in=read).delete()
+            deliveries = [d for d in deliveries if not d.notification.is_read]
+            if not deliveries:
+                return
+
+        try:
+            outcomes = PushService.send_notifications([d.notification for d in deliveries])
+        except Exception as exc:
+            logger.exception('Push delivery batch failed')
+            for delivery in deliveries:
+                cls._mark_failed(delivery, str(exc))
+            return
+
+        sent = []
+        no_devices = []
+        for delivery in deliveries:
+            outcome, error = outcomes.get(delivery.notification_id, (PushService.FAILED, 'No result'))
+            if outcome == PushService.SENT:
+                sent.append(delivery)
+            elif outcome == PushService.NO_DEVICES:
+                # The user's tokens went away after it was queued; nothing to do
+                no_devices.append(delivery.pk)
+            else:
+                cls._mark_failed(delivery, error)
+
+        if no_devices:
+            NotificationDelivery.objects.filter(pk__in=no_devices).delete()
+        cls._mark_sent(sent, 'push_sent')
+
+    @staticmethod
+    def _mark_sent(deliveries, sent_flag):
+        if not deliveries:
+            return
+        NotificationDelivery.objects.filter(pk__in=[d.pk for d in deliveries]).update(
+            status=NotificationDelivery.Status.SENT,
+            sent_at=timezone.now(),
+            last_error=''
+        )
+        Notification.objects.filter(
+            pk__in=[d.notification_id for d in deliveries]
+        ).update(**{sent_flag: True})
+
+    @classmethod
+    def _mark_failed(cls, delivery, error, retry=True):
+        """Schedule a retry with exponential backoff, or park the row as dead."""
+        logger.warning(
+            'Notification %s delivery %s failed (attempt %s): %s',
+            delivery.channel, delivery.pk, delivery.attempts, error
+        )
+        if not retry or delivery.attempts >= cls.MAX_ATTEMPTS:
+            status = NotificationDelivery.Status.DEAD
+            next_attempt_at = timezone.now()
+            metrics.record(delivery.channel, delivery.notification.notification_type, metrics.DEAD)
+        else:
+            status = NotificationDelivery.Status.PENDING
+            next_attempt_at = timezone.now() + timedelta(
+                seconds=cls.RETRY_BASE_SECONDS * 2 ** max(delivery.attempts - 1, 0)
+            )
+
+        NotificationDelivery.objects.filter(pk=delivery.pk).update(
+            status=status,
+            next_attempt_at=next_attempt_at,
+            last_error=error[:2000]
+        )
 
     @classmethod
     def _should_send_email(cls, preferences, notification_type):
@@ -58,111 +420,94 @@ class NotificationService:
         if not preferences or not preferences.email_enabled:
             return False
 
-        type_mapping = {
-            'matter_': 'email_matter_updates',
-            'new_message': 'email_messages',
-            'appointment_': 'email_appointments',
-            'payment_': 'email_payments',
-            'invoice_': 'email_payments',
-        }
-
-        for prefix, pref_field in type_mapping.items():
-            if notification_type.startswith(prefix) or notification_type == prefix:
-                return getattr(preferences, pref_field, True)
+        pref_field = EMAIL_PREFERENCE_FIELDS.get(notification_type)
+        if pref_field:
+            return getattr(preferences, pref_field, True)
 
         return True
 
     @classmethod
     def _should_send_push(cls, preferences, notification_type):
-        """Check if push notification should be sent based on preferences."""
+        """
+        Check if push notification should be sent based on preferences.
+        Quiet hours defer the push rather than drop it.
+        """
         if not preferences or not preferences.push_enabled:
             return False
 
-        # Check quiet hours
-        if preferences.quiet_hours_enabled:
-            now = timezone.now().time()
-            if preferences.quiet_hours_start and preferences.quiet_hours_end:
-                if preferences.quiet_hours_start <= now <= preferences.quiet_hours_end:
-                    return False
+        return push.is_enabled()
 
-        return True
+    @classmethod
+    def _render_email_batch(cls, notifications):
+        """
+        Render the HTML bodies for a batch of notifications, one
+        render_many() call per template. Returns {notification_id: html},
+        with '' for a body that couldn't be rendered. A template that fails
+        for the batch is retried per notification so one bad context doesn't
+        cost the others their HTML.
+        """
+        by_template = {}
+        for notification in notifications:
+            template_name = rendering.EMAIL_TEMPLATES.get(notification.notification_type)
+            if template_name:
+                by_template.setdefault(template_name, []).append(notification)
+
+        shared_context = rendering.base_context()
+        html = {}
+        for template_name, group in by_template.items():
+            contexts = [{'user': n.user, 'notification': n} for n in group]
+            try:
+                rendered = rendering.render_many(template_name, contexts, shared_context)
+            except Exception:
+                rendered = []
+                for context in contexts:
+                    try:
+                        rendered.append(rendering.render(template_name, {**shared_context, **context}))
+                    except Exception:
+                        logger.warning('Could not render %s', template_name, exc_info=True)
+                        rendered.append('')
+            html.update(zip((n.pk for n in group), rendered))
+        return html
 
     @classmethod
-    def _send_email_notification(cls, notification, template_name=None, context=None):
-        """Send email notification with HTML template."""
-        try:
-            # Build context for template
-            email_context = {
+    def _build_email_message(cls, notification, template_name=None, context=None, html_content=None):
+        """
+        Build the email for a notification with its HTML template, unless
+        html_content was already rendered.
+        """
+        # Create email
+        subject = notification.title
+        text_content = notification.message
+
+        # Determine template based on notification type
+        if not template_name:
+            template_name = rendering.EMAIL_TEMPLATES.get(notification.notification_type)
+
+        # Try to render HTML template
+        if html_content is None and template_name:
+            email_context = rendering.base_context()
+            email_context.update({
                 'user': notification.user,
                 'notification': notification,
-                'site_url': getattr(settings, 'SITE_URL', 'http://localhost:3000'),
-                'year': timezone.now().year,
-            }
+            })
             if context:
                 email_context.update(context)
-
-            # Determine template based on notification type
-            if not template_name:
-                template_map = {
-                    'appointment_confirmed': 'email/appointment_confirmed.html',
-                    'new_message': 'email/new_message.html',
-                    'matter_': 'email/matter_status_update.html',
-                    'signature_requested': 'email/signature_requested.html',
-                    'payment_received': 'email/payment_received.html',
-                }
-
-                for prefix, template in template_map.items():
-                    if notification.notification_type.startswith(prefix) or notification.notification_type == prefix:
-                        template_name = template
-                        break
-
-            # Create email
-            subject = notification.title
-            text_content = notification.message
-
-            # Try to render HTML template
-            html_content = None
-            if template_name:
-                try:
-                    html_content = render_to_string(template_name, email_context)
-                except Exception:
-                    pass  # Fall back to plain text
-
-            # Send email
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[notification.user.email]
-            )
-
-            if html_content:
-                email.attach_alternative(html_content, "text/html")
-
-            email.send(fail_silently=True)
-
-            notification.email_sent = True
-            notification.save(update_fields=['email_sent'])
-        except Exception:
-            pass
-
-    @classmethod
-    def _send_push_notification(cls, notification):
-        """Send push notification."""
-        # In production, integrate with FCM/APNS
-        from .models import DeviceToken
-
-        tokens = DeviceToken.objects.filter(
-            user=notification.user,
-            is_active=True
+            try:
+                html_content = rendering.render(template_name, email_context)
+            except Exception:
+                logger.warning('Could not render %s', template_name, exc_info=True)
+
+        email = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[notification.user.email]
         )
 
-        # Placeholder for push notification logic
-        # This would integrate with Firebase Cloud Messaging or similar
+        if html_content:
+            email.attach_alternative(html_content, "text/html")
 
-        if tokens.exists():
-            notification.push_sent = True
-            notification.save(update_fields=['push_sent'])
+        return email
 
     @classmethod
     def notify_matter_created(cls, matter):
@@ -238,3 +583,307 @@ class NotificationService:
                 related_object=payment,
                 action_url=f'/payments/{payment.id}'
             )
+
+
+class NotificationRetentionService:
+    """
+    Service for moving old read notifications out of the hot table.
+
+    Notifications that were read and are older than
+    NOTIFICATION_RETENTION_DAYS are copied to NotificationArchive and
+    deleted in small batches. Each batch is its own short transaction, so
+    row locks are held briefly and the job can stop and resume at any point.
+    Notifications with a delivery still pending, in progress or held for a
+    digest are kept.
+    """
+
+    BATCH_SIZE = 1000
+    LAST_RUN_CACHE_KEY = 'notifications:retention:last-run'
+
+    @classmethod
+    def cutoff(cls, retention_days=None):
+        if retention_days is None:
+            retention_days = settings.NOTIFICATION_RETENTION_DAYS
+        return timezone.now() - timedelta(days=retention_days)
+
+    @classmethod
+    def eligible(cls, cutoff):
+        """Queryset of notifications that may be archived."""
+        return Notification.objects.filter(
+            is_read=True,
+            created_at__lt=cutoff
+        ).exclude(
+            deliveries__status__in=[
+                NotificationDelivery.Status.PENDING,
+                NotificationDelivery.Status.SENDING,
+                NotificationDelivery.Status.DIGEST,
+            ]
+        )
+
+    @classmethod
+    def archive_batch(cls, cutoff, batch_size=None):
+        """
+        Archive and delete one batch of eligible notifications.
+        Returns the number of notifications archived.
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+
+        with transaction.atomic():
+            batch = list(
+                cls.eligible(cutoff).order_by('created_at').values(
+                    'id', 'user_id', 'notification_type', 'title', 'message',
+                    'related_object_type', 'related_object_id', 'created_at', 'read_at'
+                )[:batch_size]
+            )
+            if not batch:
+                return 0
+
+            ids = [row['id'] for row in batch]
+            NotificationArchive.objects.bulk_create(
+                [NotificationArchive(**row) for row in batch],
+                ignore_conflicts=True
+            )
+            NotificationDelivery.objects.filter(notification_id__in=ids).delete()
+            Notification.objects.filter(pk__in=ids).delete()
+
+            # Archived rows drop out of each user's total
+            inbox.invalidate({row['user_id'] for row in batch})
+
+        return len(batch)
+
+    @classmethod
+    def run(cls, retention_days=None, batch_size=None, max_batches=None):
+        """
+        Archive eligible notifications batch by batch until none are left
+        or max_batches is reached. Returns the run summary.
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        cutoff = cls.cutoff(retention_days)
+        started = timezone.now()
+
+        archived = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count = cls.archive_batch(cutoff, batch_size)
+            archived += count
+            if count:
+                batches += 1
+            if count < batch_size:
+                break
+
+        summary = {
+            'cutoff': cutoff.isoformat(),
+            'archived': archived,
+            'batches': batches,
+            'started_at': started.isoformat(),
+            'duration_seconds': round((timezone.now() - started).total_seconds(), 3),
+        }
+        cache.set(cls.LAST_RUN_CACHE_KEY, summary, None)
+        logger.info('Archived %s notifications in %s batches', archived, batches)
+        return summary
+
+    @classmethod
+    def metrics(cls, retention_days=None):
+        """Sizes of the hot and archive tables and the current backlog."""
+        cutoff = cls.cutoff(retention_days)
+        hot = Notification.objects.aggregate(oldest=Min('created_at'))
+        return {
+            'retention_days': (
+                settings.NOTIFICATION_RETENTION_DAYS
+                if retention_days is None else retention_days
+            ),
+            'hot_rows': Notification.objects.count(),
+            'oldest_hot_created_at': hot['oldest'],
+            'eligible_rows': cls.eligible(cutoff).count(),
+            'archived_rows': NotificationArchive.objects.count(),
+            'last_run': cache.get(cls.LAST_RUN_CACHE_KEY),
+        }
+
+
+class NotificationDigestService:
+    """
+    Service for sending held emails as one periodic summary per user.
+
+    Users on an hourly or daily digest have their routine emails written
+    to the outbox with the digest status. A periodic job finds users whose
+    window has elapsed, groups their held notifications by type and sends
+    a single summary email. High and urgent notifications are never held.
+    """
+
+    WINDOWS = {
+        NotificationPreference.EmailDeliveryMode.HOURLY: timedelta(hours=1),
+        NotificationPreference.EmailDeliveryMode.DAILY: timedelta(days=1),
+    }
+
+    # Notifications listed per type in the email; the rest are counted
+    ITEMS_PER_TYPE = 5
+
+    IMMEDIATE_PRIORITIES = (Notification.Priority.HIGH, Notification.Priority.URGENT)
+
+    @classmethod
+    def should_hold(cls, preferences, notification):
+        """Whether a notification's email should wait for the user's digest."""
+        if not preferences or preferences.email_delivery_mode not in cls.WINDOWS:
+            return False
+        return notification.priority not in cls.IMMEDIATE_PRIORITIES
+
+    @classmethod
+    def due_user_ids(cls, now=None):
+        """
+        Users with held emails whose digest window has elapsed.
+
+        A window runs from the user's last digest, or from their oldest
+        held email if they haven't had one yet. Users who switched back to
+        immediate delivery are due straight away.
+        """
+        now = now or timezone.now()
+        oldest_held = dict(
+            NotificationDelivery.objects.filter(
+                status=NotificationDelivery.Status.DIGEST
+            ).values_list('notification__user_id').annotate(oldest=Min('created_at'))
+        )
+        if not oldest_held:
+            return []
+
+        preferences = {
+            p.user_id: p for p in NotificationPreference.objects.filter(user_id__in=oldest_held)
+        }
+
+        due = []
+        for user_id, oldest in oldest_held.items():
+            user_preferences = preferences.get(user_id)
+            window = cls.WINDOWS.get(
+                user_preferences.email_delivery_mode if user_preferences else None
+            )
+            if window is None:
+                due.append(user_id)
+                continue
+            anchor = user_preferences.last_digest_sent_at or oldest
+            if anchor <= now - window:
+                due.append(user_id)
+        return due
+
+    @classmethod
+    def send_digests(cls):
+        """Send every due digest over one connection. Returns the number sent."""
+        now = timezone.now()
+        user_ids = cls.due_user_ids(now)
+        if not user_ids:
+            return 0
+
+        connection = get_connection(fail_silently=False)
+        sent = 0
+        try:
+            with metrics.collect():
+                for user_id in user_ids:
+                    if cls.send_digest(user_id, connection, now):
+                        sent += 1
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                logger.warning('Error closing email connection', exc_info=True)
+        return sent
+
+    @classmethod
+    def send_digest(cls, user_id, connection, now=None):
+        """
+        Send one user's held emails as a digest.
+
+        The held rows stay locked while the email is sent. If sending fails
+        the transaction rolls back and the rows wait for the next run.
+        Notifications read in the meantime are dropped from the digest.
+        Returns True if an email was sent.
+        """
+        now = now or timezone.now()
+        with transaction.atomic():
+            deliveries = list(
+                NotificationDelivery.objects.select_for_update(
+                    skip_locked=True, of=('self',)
+                ).filter(
+                    status=NotificationDelivery.Status.DIGEST,
+                    notification__user_id=user_id
+                ).select_related('notification__user').order_by('-created_at')
+            )
+            if not deliveries:
+                return False
+
+            unread = [d for d in deliveries if not d.notification.is_read]
+            read = [d.pk for d in deliveries if d.notification.is_read]
+            if read:
+                NotificationDelivery.objects.filter(pk__in=read).delete()
+
+            if unread:
+                email = cls._build_digest_message(
+                    unread[0].notification.user, [d.notification for d in unread]
+                )
+                try:
+                    with metrics.timed(NotificationDelivery.Channel.EMAIL, metrics.DIGEST):
+                        connection.send_messages([email])
+                except Exception:
+                    logger.exception('Could not send notification digest to user %s', user_id)
+                    transaction.set_rollback(True)
+                    return False
+                NotificationService._mark_sent(unread, 'email_sent')
+
+            NotificationPreference.objects.filter(user_id=user_id).update(
+                last_digest_sent_at=now
+            )
+            invalidate_preferences(user_id)
+
+        return bool(unread)
+
+    @classmethod
+    def _group(cls, notifications):
+        """Group notifications by type, busiest type first."""
+        groups = {}
+        for notification in notifications:
+            group = groups.setdefault(notification.notification_type, {
+                'label': Notification.NotificationType(notification.notification_type).label,
+                'count': 0,
+                'items': [],
+            })
+            group['count'] += 1
+            if len(group['items']) < cls.ITEMS_PER_TYPE:
+                group['items'].append(notification)
+
+        for group in groups.values():
+            group['more'] = group['count'] - len(group['items'])
+        return sorted(groups.values(), key=lambda group: -group['count'])
+
+    @classmethod
+    def _build_digest_message(cls, user, notifications):
+        """Build the summary email for a user's held notifications."""
+        groups = cls._group(notifications)
+        total = len(notifications)
+        subject = (
+            'You have 1 new notification' if total == 1
+            else f'You have {total} new notifications'
+        )
+
+        context = rendering.base_context()
+        context.update({
+            'user': user,
+            'groups': groups,
+            'total': total,
+        })
+
+        lines = [subject, '']
+        for group in groups:
+            lines.append(f"{group['label']} ({group['count']})")
+            lines.extend(f"- {notification.title}" for notification in group['items'])
+            if group['more']:
+                lines.append(f"- and {group['more']} more")
+            lines.append('')
+
+        email = EmailMultiAlternatives(
+            subject=subject,
+            body='\n'.join(lines),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email]
+        )
+        try:
+            email.attach_alternative(rendering.render('email/digest.html', context), 'text/html')
+        except Exception:
+            logger.warning('Could not render email/digest.html', exc_info=True)
+        return email
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import NotificationPreference
+from .preferences import invalidate_preferences
+
+
+@receiver(post_save, sender=NotificationPreference)
+@receiver(post_delete, sender=NotificationPreference)
+def invalidate_cached_preferences(sender, instance, **kwargs):
+    """Drop cached preferences whenever a user's row changes."""
+    invalidate_preferences(instance.user_id)
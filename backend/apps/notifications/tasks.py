@@ -0,0 +1,29 @@
+from celery import shared_task
+
+from .services import (
+    NotificationDigestService, NotificationRetentionService, NotificationService
+)
+
+
+@shared_task(ignore_result=True)
+def drain_notification_outbox(max_batches=50):
+    """Send due notification deliveries in batches until the outbox is empty."""
+    total = 0
+    for _ in range(max_batches):
+        claimed = NotificationService.drain_outbox()
+        total += claimed
+        if claimed < NotificationService.OUTBOX_BATCH_SIZE:
+            break
+    return total
+
+
+@shared_task
+def archive_notifications():
+    """Move old read notifications into the archive table."""
+    return NotificationRetentionService.run()
+
+
+@shared_task
+def send_notification_digests():
+    """Send digest emails to users whose digest window has elapsed."""
+    return NotificationDigestService.send_digests()
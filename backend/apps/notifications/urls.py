@@ -9,6 +9,7 @@ urlpatterns = [
     path('<uuid:pk>/', views.NotificationDetailView.as_view(), name='notification-detail'),
     path('mark-read/', views.MarkNotificationsReadView.as_view(), name='mark-read'),
     path('unread-count/', views.UnreadCountView.as_view(), name='unread-count'),
+    path('metrics/', views.DeliveryMetricsView.as_view(), name='delivery-metrics'),
 
     # Preferences
     path('preferences/', views.NotificationPreferenceView.as_view(), name='preferences'),
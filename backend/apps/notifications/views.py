@@ -1,8 +1,10 @@
 from rest_framework import generics, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from django.utils import timezone
 
+from . import inbox, metrics
 from .models import Notification, NotificationPreference, DeviceToken
 from .serializers import (
     NotificationSerializer, NotificationPreferenceSerializer,
@@ -32,6 +34,42 @@ class NotificationListView(generics.ListAPIView):
 
         return queryset.order_by('-created_at')
 
+    def _is_first_page(self):
+        """
+        Whether this request is the plain first page. Any query parameter
+        besides the page number (filters, ordering, search, page size)
+        changes the results, so those requests skip the shared cache.
+        """
+        params = self.request.query_params
+        page_param = self.paginator.page_query_param
+        if any(name != page_param for name in params):
+            return False
+        return params.get(page_param, '1') == '1'
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is None or not self._is_first_page():
+            return super().list(request, *args, **kwargs)
+
+        recent = inbox.get_recent(request.user.pk)
+        if recent is None:
+            response = super().list(request, *args, **kwargs)
+            inbox.set_recent(
+                request.user.pk, response.data['count'], response.data['results']
+            )
+            return response
+
+        next_link = None
+        if recent['count'] > len(recent['results']):
+            next_link = replace_query_param(
+                request.build_absolute_uri(), self.paginator.page_query_param, 2
+            )
+        return Response({
+            'count': recent['count'],
+            'next': next_link,
+            'previous': None,
+            'results': recent['results'],
+        })
+
 
 class NotificationDetailView(generics.RetrieveDestroyAPIView):
     """Get or delete a notification."""
@@ -49,11 +87,16 @@ class NotificationDetailView(generics.RetrieveDestroyAPIView):
         if not instance.is_read:
             instance.is_read = True
             instance.read_at = timezone.now()
-            instance.save()
+            instance.save(update_fields=['is_read', 'read_at'])
+            inbox.notifications_read(request.user.pk, 1)
 
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        inbox.invalidate([instance.user_id])
+
 
 class MarkNotificationsReadView(APIView):
     """Mark notifications as read."""
@@ -79,6 +122,8 @@ class MarkNotificationsReadView(APIView):
                 is_read=False
             ).update(is_read=True, read_at=now)
 
+        inbox.notifications_read(request.user.pk, count)
+
         return Response({'marked_read': count})
 
 
@@ -88,10 +133,7 @@ class UnreadCountView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).count()
+        count = inbox.get_unread_count(request.user.pk)
 
         return Response({'unread_count': count})
 
@@ -168,3 +210,24 @@ class DeviceListView(generics.ListAPIView):
             user=self.request.user,
             is_active=True
         )
+
+
+class DeliveryMetricsView(APIView):
+    """Delivery counters, latency and outbox backlog for staff."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            hours = int(request.query_params.get('hours', 24))
+        except ValueError:
+            return Response(
+                {'detail': 'hours must be an integer.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'hours': hours,
+            'deliveries': metrics.report(hours),
+            'outbox': metrics.outbox_status(),
+        })
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Appointment, CalendarIntegration, BlockedTime
+from .models import (
+    Appointment, AppointmentReminder, BlockedTime, CalendarFeed, CalendarIntegration,
+    ExternalBusyTime
+)
 
 
 @admin.register(Appointment)
@@ -8,20 +11,51 @@ class AppointmentAdmin(admin.ModelAdmin):
     list_filter = ('status', 'appointment_type', 'meeting_type', 'is_paid', 'date')
     search_fields = ('client__email', 'attorney__user__email', 'matter__title')
     readonly_fields = ('id', 'created_at', 'updated_at', 'confirmed_at', 'cancelled_at')
+    list_select_related = ('client', 'attorney__user')
     date_hierarchy = 'date'
 
 
 @admin.register(CalendarIntegration)
 class CalendarIntegrationAdmin(admin.ModelAdmin):
-    list_display = ('user', 'provider', 'is_active', 'sync_enabled', 'last_synced_at')
+    list_display = ('user', 'provider', 'is_active', 'sync_enabled', 'last_synced_at', 'sync_failures')
+    list_select_related = ('user',)
     list_filter = ('provider', 'is_active', 'sync_enabled')
     search_fields = ('user__email',)
-    readonly_fields = ('id', 'created_at', 'updated_at', 'last_synced_at')
+    readonly_fields = (
+        'id', 'created_at', 'updated_at', 'last_synced_at',
+        'sync_token', 'next_sync_at', 'sync_failures', 'last_sync_error'
+    )
 
 
 @admin.register(BlockedTime)
 class BlockedTimeAdmin(admin.ModelAdmin):
     list_display = ('attorney', 'start_datetime', 'end_datetime', 'is_recurring', 'reason')
+    list_select_related = ('attorney__user',)
     list_filter = ('is_recurring', 'start_datetime')
     search_fields = ('attorney__user__email', 'reason')
     readonly_fields = ('id', 'created_at')
+
+
+@admin.register(CalendarFeed)
+class CalendarFeedAdmin(admin.ModelAdmin):
+    list_display = ('user', 'version', 'modified_at', 'created_at')
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    readonly_fields = ('token', 'version', 'modified_at', 'created_at')
+
+
+@admin.register(AppointmentReminder)
+class AppointmentReminderAdmin(admin.ModelAdmin):
+    list_display = ('appointment', 'user', 'kind', 'due_at')
+    list_select_related = ('appointment__client', 'appointment__attorney__user', 'user')
+    list_filter = ('kind',)
+    search_fields = ('user__email',)
+    raw_id_fields = ('appointment', 'user')
+
+
+@admin.register(ExternalBusyTime)
+class ExternalBusyTimeAdmin(admin.ModelAdmin):
+    list_display = ('user', 'integration', 'start_at', 'end_at')
+    list_select_related = ('user',)
+    search_fields = ('user__email', 'external_id')
+    raw_id_fields = ('integration', 'user')
@@ -0,0 +1,400 @@
+"""
+External calendar sync.
+
+Providers implement BaseCalendarProvider: list_changes() pages through the
+events changed since a sync token, and upsert_event()/delete_event() write
+appointments back. The provider for each CalendarIntegration.provider is
+chosen with the CALENDAR_SYNC_PROVIDERS setting; integrations of a provider
+with no adapter configured are left alone. LocalCalendarProvider keeps
+calendars in memory for development and tests, and is only used when a
+setting selects it.
+
+CalendarSyncService claims due integrations and syncs them on a bounded
+thread pool. Remote busy periods are stored as ExternalBusyTime rows, which
+the availability engine reads like any other busy interval, so slot
+searches never call a provider.
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import freebusy
+from .models import Appointment, CalendarIntegration, ExternalBusyTime
+from .services import ACTIVE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class ExternalEvent:
+    """An event in an external calendar, as reported by a provider."""
+
+    __slots__ = ('id', 'start', 'end', 'deleted', 'busy')
+
+    def __init__(self, id, start=None, end=None, deleted=False, busy=True):
+        self.id = id
+        self.start = start
+        self.end = end
+        self.deleted = deleted
+        # Events marked free or transparent don't block time
+        self.busy = busy
+
+    def __repr__(self):
+        return f"ExternalEvent({self.id!r}, {self.start}, {self.end}, deleted={self.deleted})"
+
+
+class ChangeSet:
+    """Events changed since a sync token, and the token to use next time."""
+
+    __slots__ = ('events', 'next_sync_token', 'full')
+
+    def __init__(self, events, next_sync_token, full=False):
+        self.events = events
+        self.next_sync_token = next_sync_token
+        # A full listing: events missing from it no longer exist
+        self.full = full
+
+
+class RateLimited(Exception):
+    """The provider asked us to slow down."""
+
+    def __init__(self, retry_after=None):
+        super().__init__(f'Rate limited, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+class SyncTokenExpired(Exception):
+    """The sync token is no longer valid and a full sync is needed."""
+
+
+class BaseCalendarProvider:
+    """Interface for calendar providers."""
+
+    def list_changes(self, integration, sync_token):
+        """
+        Return a ChangeSet of the events changed since sync_token.
+
+        With no sync_token every event is listed and the ChangeSet is full.
+        Raises SyncTokenExpired if the token can't be used any more and
+        RateLimited when throttled.
+        """
+        raise NotImplementedError
+
+    def upsert_event(self, integration, event_id, appointment):
+        """Create or update the event for appointment. Returns its event id."""
+        raise NotImplementedError
+
+    def delete_event(self, integration, event_id):
+        """Delete an event; deleting a missing event is not an error."""
+        raise NotImplementedError
+
+
+class LocalCalendarProvider(BaseCalendarProvider):
+    """
+    In-process provider for development and tests.
+
+    Each integration gets an in-memory calendar with a change log; sync
+    tokens are positions in that log. add_event()/remove_event() change a
+    calendar as if from outside, throttle() makes the next calls raise
+    RateLimited and expire_tokens() invalidates outstanding sync tokens.
+    """
+
+    calendars = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _calendar(cls, integration_id):
+        return cls.calendars.setdefault(
+            integration_id,
+            {'events': {}, 'log': [], 'floor': 0, 'throttled': 0}
+        )
+
+    @staticmethod
+    def _record(calendar, event):
+        calendar['events'][event.id] = event
+        calendar['log'].append(event.id)
+
+    @staticmethod
+    def _check_throttle(calendar):
+        if calendar['throttled']:
+            calendar['throttled'] -= 1
+            raise RateLimited(retry_after=30)
+
+    def list_changes(self, integration, sync_token):
+        with self._lock:
+            calendar = self._calendar(integration.pk)
+            self._check_throttle(calendar)
+            position = len(calendar['log'])
+            if not sync_token:
+                events = [e for e in calendar['events'].values() if not e.deleted]
+                return ChangeSet(events, str(position), full=True)
+            if int(sync_token) < calendar['floor']:
+                raise SyncTokenExpired(sync_token)
+            changed = dict.fromkeys(calendar['log'][int(sync_token):])
+            return ChangeSet([calendar['events'][event_id] for event_id in changed], str(position))
+
+    def upsert_event(self, integration, event_id, appointment):
+        with self._lock:
+            calendar = self._calendar(integration.pk)
+            self._check_throttle(calendar)
+            event_id = event_id or f'local-{uuid.uuid4().hex}'
+            self._record(calendar, ExternalEvent(event_id, appointment.start_at, appointment.end_at))
+            return event_id
+
+    def delete_event(self, integration, event_id):
+        with self._lock:
+            calendar = self._calendar(integration.pk)
+            self._check_throttle(calendar)
+            if event_id in calendar['events']:
+                self._record(calendar, ExternalEvent(event_id, deleted=True))
+
+    @classmethod
+    def add_event(cls, integration_id, start, end, busy=True):
+        with cls._lock:
+            calendar = cls._calendar(integration_id)
+            event = ExternalEvent(f'local-{uuid.uuid4().hex}', start, end, busy=busy)
+            cls._record(calendar, event)
+            return event.id
+
+    @classmethod
+    def remove_event(cls, integration_id, event_id):
+        with cls._lock:
+            cls._record(cls._calendar(integration_id), ExternalEvent(event_id, deleted=True))
+
+    @classmethod
+    def throttle(cls, integration_id, calls=1):
+        with cls._lock:
+            cls._calendar(integration_id)['throttled'] = calls
+
+    @classmethod
+    def expire_tokens(cls, integration_id):
+        with cls._lock:
+            calendar = cls._calendar(integration_id)
+            calendar['floor'] = len(calendar['log'])
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def configured_providers():
+    """Provider names with an adapter configured."""
+    return [name for name, path in settings.CALENDAR_SYNC_PROVIDERS.items() if path]
+
+
+def get_provider(name):
+    """
+    Return the provider configured for name, created once per process, or
+    None when no adapter is configured for it.
+    """
+    provider = _providers.get(name)
+    if provider is None:
+        path = settings.CALENDAR_SYNC_PROVIDERS.get(name)
+        if not path:
+            return None
+        with _providers_lock:
+            provider = _providers.get(name)
+            if provider is None:
+                provider = import_string(path)()
+                _providers[name] = provider
+    return provider
+
+
+# Appointment field holding the event id written to each provider
+EVENT_ID_FIELDS = {
+    CalendarIntegration.Provider.GOOGLE: 'google_event_id',
+    CalendarIntegration.Provider.OUTLOOK: 'outlook_event_id',
+}
+
+
+class CalendarSyncService:
+    """Service for syncing calendar integrations in the background."""
+
+    CLAIM_BATCH_SIZE = 100
+    SYNC_LEASE_SECONDS = 600
+    RETRY_BASE_SECONDS = 60
+
+    # Outcomes returned per integration by sync_due()
+    SYNCED = 'synced'
+    RATE_LIMITED = 'rate_limited'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+    @classmethod
+    def claim_due(cls, limit=None, now=None):
+        """Lease due integrations to this worker. Returns their ids."""
+        now = now or timezone.now()
+        providers = configured_providers()
+        if not providers:
+            return []
+        with transaction.atomic():
+            claimed = list(
+                CalendarIntegration.objects.select_for_update(skip_locked=True).filter(
+                    Q(next_sync_at__isnull=True) | Q(next_sync_at__lte=now),
+                    is_active=True,
+                    sync_enabled=True,
+                    provider__in=providers
+                ).order_by('next_sync_at').values_list('pk', flat=True)[:limit or cls.CLAIM_BATCH_SIZE]
+            )
+            CalendarIntegration.objects.filter(pk__in=claimed).update(
+                next_sync_at=now + timedelta(seconds=cls.SYNC_LEASE_SECONDS)
+            )
+        return claimed
+
+    @classmethod
+    def sync_due(cls, limit=None):
+        """
+        Sync every due integration, at most CALENDAR_SYNC_CONCURRENCY at once.
+        Returns {outcome: count}.
+        """
+        claimed = cls.claim_due(limit)
+        summary = {cls.SYNCED: 0, cls.RATE_LIMITED: 0, cls.FAILED: 0, cls.SKIPPED: 0}
+        if not claimed:
+            return summary
+
+        workers = min(settings.CALENDAR_SYNC_CONCURRENCY, len(claimed))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for outcome in executor.map(cls._sync_in_thread, claimed):
+                summary[outcome] += 1
+        return summary
+
+    @classmethod
+    def _sync_in_thread(cls, integration_id):
+        try:
+            integration = CalendarIntegration.objects.select_related('user').get(pk=integration_id)
+            return cls.sync(integration)
+        finally:
+            connection.close()
+
+    @classmethod
+    def sync(cls, integration):
+        """Pull remote changes, then push local ones. Returns the outcome."""
+        provider = get_provider(integration.provider)
+        if provider is None:
+            return cls.SKIPPED
+        started = timezone.now()
+        try:
+            cls.pull(integration, provider)
+            cls.push(integration, provider, started)
+        except RateLimited as exc:
+            cls._backoff(integration, str(exc), exc.retry_after)
+            return cls.RATE_LIMITED
+        except Exception as exc:
+            logger.exception('Calendar sync failed for integration %s', integration.pk)
+            cls._backoff(integration, f'{exc.__class__.__name__}: {exc}'[:500])
+            return cls.FAILED
+
+        integration.sync_failures = 0
+        integration.last_sync_error = ''
+        integration.last_synced_at = started
+        integration.next_sync_at = started + timedelta(seconds=settings.CALENDAR_SYNC_INTERVAL_SECONDS)
+        integration.save(update_fields=[
+            'sync_token', 'sync_failures', 'last_sync_error', 'last_synced_at', 'next_sync_at', 'updated_at'
+        ])
+        return cls.SYNCED
+
+    @classmethod
+    def _backoff(cls, integration, error, retry_after=None):
+        """Exponential backoff, honouring the provider's retry hint."""
+        integration.sync_failures += 1
+        delay = cls.RETRY_BASE_SECONDS * 2 ** (integration.sync_failures - 1)
+        delay = min(max(delay, retry_after or 0), settings.CALENDAR_SYNC_MAX_BACKOFF_SECONDS)
+        integration.last_sync_error = error
+        integration.next_sync_at = timezone.now() + timedelta(seconds=delay)
+        integration.save(update_fields=['sync_failures', 'last_sync_error', 'next_sync_at', 'updated_at'])
+
+    @classmethod
+    def pull(cls, integration, provider):
+        """Apply remote changes to the integration's ExternalBusyTime rows."""
+        try:
+            changes = provider.list_changes(integration, integration.sync_token or None)
+        except SyncTokenExpired:
+            changes = provider.list_changes(integration, None)
+
+        # Appointments we pushed come back as remote events; they're already busy
+        own_ids = set()
+        field = EVENT_ID_FIELDS.get(integration.provider)
+        if field:
+            own_ids = set(Appointment.objects.filter(
+                attorney__user_id=integration.user_id,
+                **{f'{field}__in': [event.id for event in changes.events]}
+            ).values_list(field, flat=True))
+
+        existing = {
+            busy.external_id: busy
+            for busy in ExternalBusyTime.objects.filter(integration=integration)
+        }
+        keep = set()
+        removed = []
+        changed = []
+        new = []
+        for event in changes.events:
+            if event.deleted or not event.busy or event.id in own_ids:
+                if event.id in existing:
+                    removed.append(existing[event.id].pk)
+                continue
+            keep.add(event.id)
+            busy = existing.get(event.id)
+            if busy is None:
+                new.append(ExternalBusyTime(
+                    integration=integration, user_id=integration.user_id,
+                    external_id=event.id, start_at=event.start, end_at=event.end
+                ))
+            elif (busy.start_at, busy.end_at) != (event.start, event.end):
+                busy.start_at, busy.end_at = event.start, event.end
+                changed.append(busy)
+        if changes.full:
+            removed.extend(
+                busy.pk for external_id, busy in existing.items() if external_id not in keep
+            )
+
+        with transaction.atomic():
+            if removed:
+                ExternalBusyTime.objects.filter(pk__in=removed).delete()
+            if changed:
+                ExternalBusyTime.objects.bulk_update(changed, ['start_at', 'end_at'])
+            if new:
+                ExternalBusyTime.objects.bulk_create(new, ignore_conflicts=True)
+        integration.sync_token = changes.next_sync_token or ''
+
+        if removed or changed or new:
+            freebusy.invalidate_attorney(integration.user_id)
+
+    @classmethod
+    def push(cls, integration, provider, now):
+        """
+        Write the attorney's appointments changed since the last sync.
+
+        Appointments hold one event id per provider, so only the attorney's
+        calendar is written; clients subscribe to their calendar feed.
+        """
+        field = EVENT_ID_FIELDS.get(integration.provider)
+        if field is None:
+            # Read-only provider
+            return
+
+        appointments = Appointment.objects.filter(attorney__user_id=integration.user_id)
+        if integration.last_synced_at:
+            appointments = appointments.filter(updated_at__gt=integration.last_synced_at)
+        else:
+            appointments = appointments.filter(end_at__gt=now)
+
+        for appointment in appointments.select_related('client').iterator():
+            event_id = getattr(appointment, field)
+            if appointment.status in ACTIVE_STATUSES and appointment.end_at > now:
+                new_id = provider.upsert_event(integration, event_id or None, appointment)
+            elif event_id:
+                provider.delete_event(integration, event_id)
+                new_id = ''
+            else:
+                continue
+            if new_id != event_id:
+                # update() leaves updated_at alone, so this isn't pushed again
+                Appointment.objects.filter(pk=appointment.pk).update(**{field: new_id})
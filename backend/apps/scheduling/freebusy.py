@@ -0,0 +1,159 @@
+"""
+Cached free/busy bitmaps per attorney per day.
+
+A day is split into QUARTERS 15 minute quarters; bit i of the bitmap is set
+when quarter i is entirely free (inside availability and outside every
+appointment and block). Days run from midnight to midnight in the
+attorney's timezone; the extra hour of a 25 hour DST day is left out.
+Bitmaps are plain ints, cached per attorney and day, and rebuilt in bulk
+for cache misses.
+
+Invalidation:
+- appointment and one-off block changes drop the affected days, padded by
+  a day either side so every timezone's dates are covered;
+- availability, recurring block and timezone changes bump the attorney's
+  generation, which retires all of that attorney's cached days at once.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+
+from .slots import merge_intervals, subtract_intervals
+
+QUARTER = timedelta(minutes=15)
+QUARTERS = 96
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _generation_key(attorney_id):
+    return f'scheduling:freebusy-generation:{attorney_id}'
+
+
+def _bitmap_key(attorney_id, generation, day):
+    return f'scheduling:freebusy:{attorney_id}:{generation}:{day.isoformat()}'
+
+
+def _day_start(day, zone):
+    return datetime.combine(day, time.min, tzinfo=zone).astimezone(dt_timezone.utc)
+
+
+def _generations(attorney_ids):
+    keys = {_generation_key(attorney_id): attorney_id for attorney_id in attorney_ids}
+    found = cache.get_many(list(keys))
+    return {attorney_id: found.get(key, 0) for key, attorney_id in keys.items()}
+
+
+def build_bitmap(day, windows, busy, zone):
+    """Bitmap of the quarters of day in zone that are fully inside free time."""
+    day_start = _day_start(day, zone)
+    day_end = min(_day_start(day + timedelta(days=1), zone), day_start + QUARTER * QUARTERS)
+    windows = merge_intervals(
+        (max(start, day_start), min(end, day_end)) for start, end in windows
+    )
+
+    bitmap = 0
+    for start, end in subtract_intervals(windows, merge_intervals(busy)):
+        first = -((day_start - start) // QUARTER)  # round up
+        last = (end - day_start) // QUARTER
+        if last > first:
+            bitmap |= ((1 << (last - first)) - 1) << first
+    return bitmap
+
+
+def get_bitmaps(attorney_ids, start_date, days, zones):
+    """
+    Free/busy bitmaps for several attorneys over consecutive days.
+
+    zones maps each attorney to the ZoneInfo their days are counted in.
+    Cached days are read with one get_many; misses for all attorneys are
+    rebuilt together from one bulk calendar load.
+    Returns {attorney_id: [bitmap per day]}.
+    """
+    from .services import AvailabilityService
+
+    dates = [start_date + timedelta(days=offset) for offset in range(days)]
+    generations = _generations(attorney_ids)
+    keys = {
+        (attorney_id, day): _bitmap_key(attorney_id, generations[attorney_id], day)
+        for attorney_id in attorney_ids
+        for day in dates
+    }
+    cached = cache.get_many(list(keys.values()))
+
+    missing = [pair for pair, key in keys.items() if key not in cached]
+    built = {}
+    if missing:
+        missing_attorneys = {attorney_id for attorney_id, _ in missing}
+        missing_days = [day for _, day in missing]
+        calendars = AvailabilityService.load_calendars(
+            missing_attorneys, min(missing_days), max(missing_days)
+        )
+        for attorney_id, day in missing:
+            windows, busy = calendars.get(attorney_id, ([], []))
+            built[keys[(attorney_id, day)]] = build_bitmap(day, windows, busy, zones[attorney_id])
+        cache.set_many(built, CACHE_TIMEOUT)
+
+    values = {**cached, **built}
+    return {
+        attorney_id: [values[keys[(attorney_id, day)]] for day in dates]
+        for attorney_id in attorney_ids
+    }
+
+
+def slot_starts(bitmap, duration):
+    """
+    Bitmap of quarters where a slot of duration can start.
+
+    A start is possible when the run of quarters it needs is all free.
+    The duration is rounded up to whole quarters.
+    """
+    needed = max(1, -(-duration // QUARTER))
+    starts = bitmap
+    for shift in range(1, needed):
+        starts &= bitmap >> shift
+    return starts
+
+
+def quarter_time(day, index, zone):
+    """Start of quarter index of day in zone, in UTC."""
+    return _day_start(day, zone) + QUARTER * index
+
+
+def mask_before(day, moment, zone):
+    """Mask clearing the quarters of day in zone that start before moment."""
+    index = -((_day_start(day, zone) - moment) // QUARTER)
+    if index <= 0:
+        return (1 << QUARTERS) - 1
+    if index >= QUARTERS:
+        return 0
+    return ((1 << QUARTERS) - 1) ^ ((1 << index) - 1)
+
+
+def touched_days(start, end):
+    """
+    Dates any timezone's day [start, end) falls in: the UTC dates it
+    touches, padded by a day either side.
+    """
+    day = start.astimezone(dt_timezone.utc).date() - timedelta(days=1)
+    last = (end - timedelta(microseconds=1)).astimezone(dt_timezone.utc).date() + timedelta(days=1)
+    days = []
+    while day <= last:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def invalidate_days(attorney_id, days):
+    """Drop cached bitmaps for some of an attorney's days."""
+    generation = _generations([attorney_id])[attorney_id]
+    cache.delete_many([_bitmap_key(attorney_id, generation, day) for day in days])
+
+
+def invalidate_attorney(attorney_id):
+    """Retire every cached bitmap for an attorney."""
+    key = _generation_key(attorney_id)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
@@ -0,0 +1,285 @@
+"""
+iCalendar (RFC 5545) feed writer.
+
+write_feed() is a generator of encoded chunks, so a feed can be streamed
+straight into the response while the appointments and blocked times are
+read from the database in chunks.
+"""
+import calendar
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from itertools import chain
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Appointment
+
+PRODID = '-//Legal Connect//Scheduling//EN'
+UID_DOMAIN = 'legalconnect'
+
+# Events yielded per chunk written to the response
+CHUNK_EVENTS = 50
+
+APPOINTMENT_STATUSES = {
+    Appointment.AppointmentStatus.PENDING: 'TENTATIVE',
+    Appointment.AppointmentStatus.CONFIRMED: 'CONFIRMED',
+    Appointment.AppointmentStatus.RESCHEDULED: 'CONFIRMED',
+    Appointment.AppointmentStatus.COMPLETED: 'CONFIRMED',
+    Appointment.AppointmentStatus.CANCELLED: 'CANCELLED',
+    Appointment.AppointmentStatus.NO_SHOW: 'CANCELLED',
+}
+
+# Lines a BlockedTime.recurrence_rule may already carry
+RULE_PROPERTIES = ('RRULE:', 'EXDATE', 'RDATE', 'EXRULE:')
+
+
+def escape_text(value):
+    """Escape a TEXT property value."""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _datetime_property(name, value, zone=None):
+    """A DTSTART/DTEND line, as local time with a TZID when zone is given."""
+    if zone is None or zone.key == 'UTC':
+        return f'{name}:{format_datetime(value)}'
+    return f'{name};TZID={zone.key}:{value.astimezone(zone):%Y%m%dT%H%M%S}'
+
+
+def _format_offset(offset):
+    seconds = int(offset.total_seconds())
+    sign = '-' if seconds < 0 else '+'
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f'{sign}{hours:02}{minutes:02}' + (f'{seconds:02}' if seconds else '')
+
+
+def _transitions(zone, year):
+    """(utc, offset_from, offset_to) for each offset change of zone in year."""
+    def offset(moment):
+        return moment.astimezone(zone).utcoffset()
+
+    transitions = []
+    day = datetime(year, 1, 1, tzinfo=dt_timezone.utc)
+    end = datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc)
+    while day < end:
+        before, after = offset(day), offset(day + timedelta(days=1))
+        if before != after:
+            # Bisect the day down to the first minute with the new offset
+            low, high = 0, 24 * 60
+            while high - low > 1:
+                middle = (low + high) // 2
+                if offset(day + timedelta(minutes=middle)) == before:
+                    low = middle
+                else:
+                    high = middle
+            transitions.append((day + timedelta(minutes=high), before, after))
+        day += timedelta(days=1)
+    return transitions
+
+
+def _yearly_rule(local, other_years):
+    """
+    RRULE repeating a transition at local on the same weekday of the month,
+    or None when the transitions of other_years don't follow it.
+    """
+    weekday = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')[local.weekday()]
+    ordinals = [(local.day - 1) // 7 + 1]
+    if local.day + 7 > calendar.monthrange(local.year, local.month)[1]:
+        ordinals.append(-1)
+    for ordinal in ordinals:
+        def matches(other):
+            if (other.month, other.weekday(), other.time()) != (local.month, local.weekday(), local.time()):
+                return False
+            if ordinal == -1:
+                return other.day + 7 > calendar.monthrange(other.year, other.month)[1]
+            return (other.day - 1) // 7 + 1 == ordinal
+        if all(matches(other) for other in other_years):
+            return f'RRULE:FREQ=YEARLY;BYMONTH={local.month};BYDAY={ordinal}{weekday}'
+    return None
+
+
+@lru_cache(maxsize=256)
+def vtimezone(zone, first_year, last_year):
+    """
+    VTIMEZONE lines for zone. Transitions from first_year to last_year are
+    listed one by one; those of last_year also repeat yearly when the years
+    before follow the same rule, so recurring events keep their wall clock
+    time in later years.
+    """
+    observances = []
+    by_year = {year: _transitions(zone, year) for year in range(first_year, last_year + 1)}
+    for year, transitions in by_year.items():
+        for utc, offset_from, offset_to in transitions:
+            local = (utc + offset_from).replace(tzinfo=None)
+            rule = None
+            if year == last_year:
+                others = [
+                    (other_utc + other_from).replace(tzinfo=None)
+                    for other_year in range(first_year, last_year)
+                    for other_utc, other_from, other_to in by_year[other_year]
+                    if (other_from, other_to) == (offset_from, offset_to)
+                ]
+                rule = _yearly_rule(local, others) if others else None
+            after = utc.astimezone(zone)
+            kind = 'DAYLIGHT' if after.dst() else 'STANDARD'
+            observances.append([
+                f'BEGIN:{kind}',
+                f'DTSTART:{local:%Y%m%dT%H%M%S}',
+                f'TZOFFSETFROM:{_format_offset(offset_from)}',
+                f'TZOFFSETTO:{_format_offset(offset_to)}',
+                f'TZNAME:{after.tzname()}',
+                *([rule] if rule else []),
+                f'END:{kind}',
+            ])
+    if not observances:
+        # A fixed offset for the whole span
+        moment = datetime(first_year, 1, 1, tzinfo=dt_timezone.utc).astimezone(zone)
+        offset = _format_offset(moment.utcoffset())
+        observances.append([
+            'BEGIN:STANDARD',
+            f'DTSTART:{first_year}0101T000000',
+            f'TZOFFSETFROM:{offset}',
+            f'TZOFFSETTO:{offset}',
+            f'TZNAME:{moment.tzname()}',
+            'END:STANDARD',
+        ])
+    return ('BEGIN:VTIMEZONE', f'TZID:{zone.key}', *chain.from_iterable(observances), 'END:VTIMEZONE')
+
+
+def fold(line):
+    """Fold a content line to 75 octets, as RFC 5545 requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Don't split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74  # continuation lines start with a space
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _event(uid, start, end, stamp, summary, status, description='', location='', rule_lines=(), zone=None):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}@{UID_DOMAIN}',
+        f'DTSTAMP:{format_datetime(stamp)}',
+        f'LAST-MODIFIED:{format_datetime(stamp)}',
+        _datetime_property('DTSTART', start, zone),
+        _datetime_property('DTEND', end, zone),
+        f'SUMMARY:{escape_text(summary)}',
+        f'STATUS:{status}',
+    ]
+    if description:
+        lines.append(f'DESCRIPTION:{escape_text(description)}')
+    if location:
+        lines.append(f'LOCATION:{escape_text(location)}')
+    lines.extend(rule_lines)
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def _rule_lines(rule):
+    lines = [line.strip() for line in rule.splitlines() if line.strip()]
+    return [
+        line if line.upper().startswith(RULE_PROPERTIES) else f'RRULE:{line}'
+        for line in lines
+    ]
+
+
+def appointment_event(appointment, viewer_is_attorney):
+    """VEVENT for an appointment, titled from the viewer's side."""
+    if viewer_is_attorney:
+        other = appointment.client
+    else:
+        other = appointment.attorney.user
+    other = other.full_name or other.email
+    summary = f'{appointment.get_appointment_type_display()} with {other}'
+    description = appointment.meeting_link or ''
+    if appointment.matter_id:
+        description = f'{appointment.matter.title}\n{description}'.strip()
+    return _event(
+        f'appointment-{appointment.pk}',
+        appointment.start_at,
+        appointment.end_at,
+        appointment.updated_at,
+        summary,
+        APPOINTMENT_STATUSES.get(appointment.status, 'CONFIRMED'),
+        description=description,
+        location=appointment.location,
+    )
+
+
+def blocked_time_event(block, zone=None):
+    """
+    VEVENT for a blocked time. Recurring blocks repeat in the attorney's
+    local time, so they are written with a TZID for zone rather than in UTC.
+    """
+    recurring = block.is_recurring and block.recurrence_rule
+    return _event(
+        f'blocked-{block.pk}',
+        block.start_datetime,
+        block.end_datetime,
+        block.created_at,
+        block.reason or 'Busy',
+        'CONFIRMED',
+        rule_lines=_rule_lines(block.recurrence_rule) if recurring else (),
+        zone=zone if recurring else None,
+    )
+
+
+def write_feed(name, appointments, blocked_times=(), viewer_is_attorney=False, zone=None):
+    """
+    Yield the encoded feed in chunks.
+
+    appointments and blocked_times may be lazy iterables such as
+    QuerySet.iterator(); they are consumed as the feed is written. zone is
+    the attorney's timezone, which recurring blocked times repeat in; its
+    VTIMEZONE is written with the header.
+    """
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+        f'X-PUBLISHED-TTL:PT{settings.CALENDAR_FEED_REFRESH_MINUTES}M',
+    ]
+    if zone is not None and zone.key != 'UTC':
+        # Every TZID used needs a matching VTIMEZONE
+        year = timezone.now().year
+        header.extend(vtimezone(zone, year - 1, year + 1))
+    yield ''.join(fold(line) for line in header).encode()
+
+    events = chain(
+        (appointment_event(appointment, viewer_is_attorney) for appointment in appointments),
+        (blocked_time_event(block, zone) for block in blocked_times),
+    )
+    chunk = []
+    for event in events:
+        chunk.append(event)
+        if len(chunk) >= CHUNK_EVENTS:
+            yield ''.join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield ''.join(chunk).encode()
+
+    yield fold('END:VCALENDAR').encode()
@@ -0,0 +1,70 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+
+from apps.scheduling.slots import free_slots
+
+
+def _legacy_slots(windows, busy, duration):
+    # Per-slot linear scan used by AvailableSlotsView before the slot engine
+    slots = []
+    for window_start, window_end in windows:
+        current = window_start
+        while current + duration <= window_end:
+            slot_end = current + duration
+            if all(slot_end <= start or current >= end for start, end in busy):
+                slots.append((current, slot_end))
+            current += duration
+    return slots
+
+
+class Command(BaseCommand):
+    help = "Compare the interval slot engine with the per-slot scan on a dense calendar"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--busy', type=int, default=150, help='Busy intervals in the day')
+        parser.add_argument('--duration', type=int, default=5, help='Slot length in minutes')
+        parser.add_argument('--windows', type=int, default=4, help='Availability windows in the day')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        day = datetime(2030, 1, 7, tzinfo=dt_timezone.utc)
+        duration = timedelta(minutes=options['duration'])
+
+        window_length = timedelta(hours=24) / options['windows']
+        windows = [
+            (day + window_length * i, day + window_length * (i + 1) - timedelta(minutes=5))
+            for i in range(options['windows'])
+        ]
+        busy = []
+        for _ in range(options['busy']):
+            start = day + timedelta(minutes=rng.randrange(0, 24 * 60 - 5))
+            busy.append((start, start + timedelta(minutes=rng.choice((5, 10, 15)))))
+
+        legacy = self._time(_legacy_slots, windows, busy, duration, options['repeat'])
+        engine = self._time(free_slots, windows, busy, duration, options['repeat'])
+
+        if _legacy_slots(windows, busy, duration) != free_slots(windows, busy, duration):
+            self.stderr.write(self.style.ERROR("Slot engine and per-slot scan disagree"))
+            return
+
+        slot_count = len(free_slots(windows, busy, duration))
+        self.stdout.write(
+            f"{options['windows']} windows, {len(busy)} busy intervals, "
+            f"{options['duration']} min slots, {slot_count} free slots"
+        )
+        self.stdout.write(f"per-slot scan: {legacy * 1000:.2f} ms")
+        self.stdout.write(f"slot engine:   {engine * 1000:.2f} ms")
+        if engine:
+            self.stdout.write(self.style.SUCCESS(f"Speedup: {legacy / engine:.1f}x"))
+
+    @staticmethod
+    def _time(func, windows, busy, duration, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(windows, busy, duration)
+        return (time.perf_counter() - start) / repeat
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.scheduling.services import ReminderService
+
+
+class Command(BaseCommand):
+    help = "Queue reminders for all active upcoming appointments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ReminderService.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = ReminderService.backfill(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Synced reminders for {total} appointments"))
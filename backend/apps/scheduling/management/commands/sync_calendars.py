@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.scheduling.calendar_sync import CalendarSyncService
+
+
+class Command(BaseCommand):
+    help = "Sync the calendar integrations that are due"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Most integrations to sync')
+
+    def handle(self, *args, **options):
+        summary = CalendarSyncService.sync_due(limit=options['limit'])
+        for outcome, count in summary.items():
+            self.stdout.write(f"{outcome}: {count}")
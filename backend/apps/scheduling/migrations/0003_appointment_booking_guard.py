@@ -0,0 +1,104 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:52
+
+import django.db.models.deletion
+from django.core.management.base import CommandError
+from django.db import migrations, models
+
+
+# No two active appointments of an attorney may overlap. Ranges are built
+# from the start and duration so appointments crossing midnight work.
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    ALTER TABLE scheduling_appointment
+    ADD CONSTRAINT scheduling_appointment_no_overlap
+    EXCLUDE USING gist (
+        attorney_id WITH =,
+        tsrange(
+            date + start_time,
+            date + start_time + duration_minutes * interval '1 minute',
+            '[)'
+        ) WITH &&
+    )
+    WHERE (status IN ('pending', 'confirmed', 'rescheduled'))
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "ALTER TABLE scheduling_appointment DROP CONSTRAINT IF EXISTS scheduling_appointment_no_overlap",
+]
+
+
+# Active appointments that already overlap would make adding the constraint
+# fail with a bare IntegrityError, so they are listed up front instead.
+OVERLAP_QUERY = """
+    SELECT a.id, b.id
+    FROM scheduling_appointment a
+    JOIN scheduling_appointment b
+        ON b.attorney_id = a.attorney_id AND a.id < b.id
+    WHERE a.status IN ('pending', 'confirmed', 'rescheduled')
+    AND b.status IN ('pending', 'confirmed', 'rescheduled')
+    AND tsrange(
+        a.date + a.start_time,
+        a.date + a.start_time + a.duration_minutes * interval '1 minute',
+        '[)'
+    ) && tsrange(
+        b.date + b.start_time,
+        b.date + b.start_time + b.duration_minutes * interval '1 minute',
+        '[)'
+    )
+    ORDER BY a.id, b.id
+    LIMIT 50
+"""
+
+
+def check_no_overlaps(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(OVERLAP_QUERY)
+        pairs = cursor.fetchall()
+    if pairs:
+        raise CommandError(
+            "Active appointments overlap, so scheduling_appointment_no_overlap can't be added. "
+            "Cancel or move one appointment of each pair, then run migrate again, "
+            "which lists any pairs left:\n"
+            + "\n".join(f"  {first} and {second}" for first, second in pairs)
+        )
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attorneys', '0002_initial'),
+        ('scheduling', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('attorney', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='attorneys.attorneyprofile')),
+            ],
+            options={
+                'verbose_name': 'booking lock',
+                'verbose_name_plural': 'booking locks',
+                'unique_together': {('attorney', 'date')},
+            },
+        ),
+        migrations.RunPython(check_no_overlaps, migrations.RunPython.noop),
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:14
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.management.base import CommandError
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+# The exclusion constraint moves from a range rebuilt from the naive local
+# fields to the stored UTC interval, so it holds across timezones.
+POSTGRES_FORWARD = [
+    "ALTER TABLE scheduling_appointment DROP CONSTRAINT IF EXISTS scheduling_appointment_no_overlap",
+    """
+    ALTER TABLE scheduling_appointment
+    ADD CONSTRAINT scheduling_appointment_no_overlap
+    EXCLUDE USING gist (
+        attorney_id WITH =,
+        tstzrange(start_at, end_at, '[)') WITH &&
+    )
+    WHERE (status IN ('pending', 'confirmed', 'rescheduled'))
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "ALTER TABLE scheduling_appointment DROP CONSTRAINT IF EXISTS scheduling_appointment_no_overlap",
+    """
+    ALTER TABLE scheduling_appointment
+    ADD CONSTRAINT scheduling_appointment_no_overlap
+    EXCLUDE USING gist (
+        attorney_id WITH =,
+        tsrange(
+            date + start_time,
+            date + start_time + duration_minutes * interval '1 minute',
+            '[)'
+        ) WITH &&
+    )
+    WHERE (status IN ('pending', 'confirmed', 'rescheduled'))
+    """,
+]
+
+
+# Appointments that didn't overlap in their naive local times can once
+# converted to UTC, so they are checked again before the constraint moves.
+OVERLAP_QUERY = """
+    SELECT a.id, b.id
+    FROM scheduling_appointment a
+    JOIN scheduling_appointment b
+        ON b.attorney_id = a.attorney_id AND a.id < b.id
+    WHERE a.status IN ('pending', 'confirmed', 'rescheduled')
+    AND b.status IN ('pending', 'confirmed', 'rescheduled')
+    AND tstzrange(a.start_at, a.end_at, '[)') && tstzrange(b.start_at, b.end_at, '[)')
+    ORDER BY a.id, b.id
+    LIMIT 50
+"""
+
+
+def check_no_overlaps(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(OVERLAP_QUERY)
+        pairs = cursor.fetchall()
+    if pairs:
+        raise CommandError(
+            "Active appointments overlap in UTC, so scheduling_appointment_no_overlap can't be moved "
+            "to start_at/end_at. Cancel or move one appointment of each pair, "
+            "then run migrate again, which lists any pairs left:\n"
+            + "\n".join(f"  {first} and {second}" for first, second in pairs)
+        )
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def _zone(tz_name):
+    try:
+        return ZoneInfo(tz_name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def backfill_utc_times(apps, schema_editor):
+    Appointment = apps.get_model('scheduling', 'Appointment')
+    batch = []
+    for appointment in Appointment.objects.only(
+        'date', 'start_time', 'duration_minutes', 'timezone'
+    ).iterator(chunk_size=BATCH_SIZE):
+        start = datetime.combine(
+            appointment.date, appointment.start_time, tzinfo=_zone(appointment.timezone)
+        ).astimezone(dt_timezone.utc)
+        appointment.start_at = start
+        appointment.end_at = start + timedelta(minutes=appointment.duration_minutes)
+        batch.append(appointment)
+        if len(batch) >= BATCH_SIZE:
+            Appointment.objects.bulk_update(batch, ['start_at', 'end_at'])
+            batch = []
+    if batch:
+        Appointment.objects.bulk_update(batch, ['start_at', 'end_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0003_appointment_booking_guard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='start_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='end_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_utc_times, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='start_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='end_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterModelOptions(
+            name='appointment',
+            options={'ordering': ['start_at'], 'verbose_name': 'appointment', 'verbose_name_plural': 'appointments'},
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['attorney', 'start_at', 'end_at'], name='appointment_attorney_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', 'start_at'], name='appointment_client_time_idx'),
+        ),
+        migrations.RunPython(check_no_overlaps, migrations.RunPython.noop),
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0006_appointment_reminders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarintegration',
+            name='last_sync_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='calendarintegration',
+            name='next_sync_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarintegration',
+            name='sync_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='calendarintegration',
+            name='sync_token',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='ExternalBusyTime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.CharField(max_length=255)),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('integration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='busy_times', to='scheduling.calendarintegration')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'external busy time',
+                'verbose_name_plural': 'external busy times',
+                'indexes': [models.Index(fields=['user', 'start_at', 'end_at'], name='external_busy_user_time_idx')],
+                'unique_together': {('integration', 'external_id')},
+            },
+        ),
+    ]
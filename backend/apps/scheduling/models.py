@@ -1,6 +1,11 @@
+import secrets
 import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 
@@ -74,6 +79,10 @@ class Appointment(models.Model):
     duration_minutes = models.PositiveIntegerField(default=30)
     timezone = models.CharField(max_length=50, default='UTC')
 
+    # The same interval in UTC, derived from the fields above on save
+    start_at = models.DateTimeField(editable=False)
+    end_at = models.DateTimeField(editable=False)
+
     # Location/Meeting details
     location = models.TextField(blank=True)
     meeting_link = models.URLField(blank=True)
@@ -112,11 +121,118 @@ class Appointment(models.Model):
     class Meta:
         verbose_name = _('appointment')
         verbose_name_plural = _('appointments')
-        ordering = ['date', 'start_time']
+        ordering = ['start_at']
+        indexes = [
+            models.Index(fields=['attorney', 'start_at', 'end_at'], name='appointment_attorney_time_idx'),
+            models.Index(fields=['client', 'start_at'], name='appointment_client_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.client.full_name} with {self.attorney.user.full_name} on {self.date}"
 
+    @staticmethod
+    def zone(tz_name):
+        """ZoneInfo for tz_name, falling back to UTC for unknown names."""
+        try:
+            return ZoneInfo(tz_name or 'UTC')
+        except (ZoneInfoNotFoundError, ValueError):
+            return ZoneInfo('UTC')
+
+    @classmethod
+    def bounds(cls, date, start_time, duration_minutes, tz_name):
+        """UTC (start_at, end_at) of a wall clock start in tz_name."""
+        start = datetime.combine(date, start_time, tzinfo=cls.zone(tz_name))
+        start = start.astimezone(dt_timezone.utc)
+        return start, start + timedelta(minutes=duration_minutes)
+
+    def sync_times(self):
+        """Derive end_time, start_at and end_at from the local start and duration."""
+        self.start_at, self.end_at = self.bounds(
+            self.date, self.start_time, self.duration_minutes, self.timezone
+        )
+        self.end_time = (
+            datetime.combine(self.date, self.start_time) + timedelta(minutes=self.duration_minutes)
+        ).time()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets save signals see the stored interval without querying for it
+        if not {'start_at', 'end_at'} & instance.get_deferred_fields():
+            instance._stored_times = (instance.start_at, instance.end_at)
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.sync_times()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'start_at', 'end_at', 'end_time'}
+        super().save(*args, **kwargs)
+        self._stored_times = (self.start_at, self.end_at)
+
+
+class AppointmentReminder(models.Model):
+    """
+    Queued reminder for one attendee of an appointment.
+
+    Rows exist only until they are sent, so the table holds upcoming
+    reminders alone and the due_at index is all the sender scans.
+    """
+
+    class Kind(models.TextChoices):
+        DAY_BEFORE = 'day_before', _('Day Before')
+        HOUR_BEFORE = 'hour_before', _('Hour Before')
+
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.CASCADE,
+        related_name='reminders'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    due_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('appointment reminder')
+        verbose_name_plural = _('appointment reminders')
+        unique_together = ['appointment', 'user', 'kind']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} reminder for {self.appointment_id} at {self.due_at}"
+
+
+class BookingLock(models.Model):
+    """
+    Reservation row locked while booking an attorney's day.
+
+    Bookings and reschedules lock the rows for every day the appointment
+    touches before checking for conflicts, so concurrent bookings for the
+    same attorney and day run one at a time while other attorneys and
+    days proceed in parallel. On PostgreSQL the appointment exclusion
+    constraint is the guard instead.
+    """
+
+    attorney = models.ForeignKey(
+        'attorneys.AttorneyProfile',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    date = models.DateField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('booking lock')
+        verbose_name_plural = _('booking locks')
+        unique_together = ['attorney', 'date']
+
+    def __str__(self):
+        return f"Booking lock {self.attorney_id} {self.date}"
+
 
 class CalendarIntegration(models.Model):
     """Calendar integrations for users."""
@@ -145,6 +261,12 @@ class CalendarIntegration(models.Model):
     calendar_id = models.CharField(max_length=255, blank=True)
     sync_enabled = models.BooleanField(default=True)
 
+    # Incremental sync state
+    sync_token = models.TextField(blank=True)
+    next_sync_at = models.DateTimeField(null=True, blank=True)
+    sync_failures = models.PositiveIntegerField(default=0)
+    last_sync_error = models.TextField(blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_synced_at = models.DateTimeField(null=True, blank=True)
@@ -158,6 +280,85 @@ class CalendarIntegration(models.Model):
         return f"{self.user.email} - {self.provider}"
 
 
+def _feed_token():
+    return secrets.token_urlsafe(32)
+
+
+class CalendarFeed(models.Model):
+    """
+    Secret-URL iCalendar feed of a user's appointments and blocked times.
+
+    version is bumped whenever something in the feed changes, and together
+    with modified_at drives the feed's ETag and Last-Modified headers.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='calendar_feed'
+    )
+    token = models.CharField(max_length=64, unique=True, default=_feed_token)
+    version = models.PositiveIntegerField(default=1)
+    modified_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('calendar feed')
+        verbose_name_plural = _('calendar feeds')
+
+    def __str__(self):
+        return f"Calendar feed for {self.user.email}"
+
+    @property
+    def etag(self):
+        return f'"{self.user_id}-{self.version}"'
+
+    def regenerate_token(self):
+        """Replace the token, which revokes the old feed URL."""
+        self.token = _feed_token()
+        self.version += 1
+        self.modified_at = timezone.now()
+        self.save(update_fields=['token', 'version', 'modified_at'])
+
+    @classmethod
+    def bump(cls, user_ids):
+        """Mark the feeds of user_ids as changed."""
+        cls.objects.filter(user_id__in=user_ids).update(
+            version=models.F('version') + 1,
+            modified_at=timezone.now()
+        )
+
+
+class ExternalBusyTime(models.Model):
+    """Busy period imported from a user's external calendar."""
+
+    integration = models.ForeignKey(
+        CalendarIntegration,
+        on_delete=models.CASCADE,
+        related_name='busy_times'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    external_id = models.CharField(max_length=255)
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('external busy time')
+        verbose_name_plural = _('external busy times')
+        unique_together = ['integration', 'external_id']
+        indexes = [
+            models.Index(fields=['user', 'start_at', 'end_at'], name='external_busy_user_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"External busy: {self.start_at} - {self.end_at}"
+
+
 class BlockedTime(models.Model):
     """Blocked time slots for attorneys."""
 
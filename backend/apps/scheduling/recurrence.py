@@ -0,0 +1,148 @@
+"""
+Recurring blocked time expansion.
+
+BlockedTime.recurrence_rule holds an iCalendar RRULE (optionally with
+EXDATE/RDATE lines); start_datetime/end_datetime are the first occurrence.
+Rules repeat in wall-clock time in the attorney's timezone, so a weekly
+12:00 block stays at 12:00 local across DST changes; occurrences are
+returned in UTC.
+
+Occurrences are expanded lazily, one calendar month at a time, and only
+for the months a request touches. Each expanded month is cached per block
+under the block's rule version, a hash of the rule and its first
+occurrence, so editing a block retires its cached occurrences without an
+explicit invalidation. Parsed rules are also kept per process, and the
+rule objects cache their own iteration, so later months don't re-walk
+the rule from its start.
+"""
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+
+from dateutil.rrule import rrulestr
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+class InvalidRecurrenceRule(ValueError):
+    pass
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(rule, start, zone=dt_timezone.utc):
+    """
+    Parse a recurrence rule into a dateutil rruleset, anchored at start as
+    wall-clock time in zone.
+    """
+    try:
+        return rrulestr(rule, dtstart=start.astimezone(zone), forceset=True, unfold=True, cache=True)
+    except (ValueError, TypeError) as exc:
+        raise InvalidRecurrenceRule(str(exc)) from exc
+
+
+def rule_version(rule, start, end, zone=dt_timezone.utc):
+    """Short hash identifying a block's recurrence; changes when it's edited."""
+    raw = f'{rule}|{start.isoformat()}|{end.isoformat()}|{zone}'
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def _month_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _next_month(month):
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def _months(range_start, range_end):
+    month = _month_start(range_start)
+    while month < range_end:
+        yield month
+        month = _next_month(month)
+
+
+def _cache_key(block_id, version, month):
+    return f'scheduling:occurrences:{block_id}:{version}:{month:%Y-%m}'
+
+
+def _expand_month(rule, start, month, zone):
+    """Occurrence starts of the rule within one UTC month, in UTC."""
+    recurrence = parse_rule(rule, start, zone)
+    month_end = _next_month(month) - timedelta(microseconds=1)
+    try:
+        return [
+            occurrence.astimezone(dt_timezone.utc)
+            for occurrence in recurrence.between(month, month_end, inc=True)
+        ]
+    except (ValueError, TypeError) as exc:
+        raise InvalidRecurrenceRule(str(exc)) from exc
+
+
+def occurrences(blocks, range_start, range_end):
+    """
+    Busy intervals for recurring blocks that overlap [range_start, range_end).
+
+    blocks is an iterable of (id, start, end, rule, zone), zone being the
+    attorney's ZoneInfo. Cached months for every block are read with one
+    get_many; missing months are expanded and
+    written back with one set_many. Blocks with an invalid rule count as
+    their first occurrence only.
+    Returns {block id: [(start, end), ...]}.
+    """
+    plan = {}
+    keys = []
+    for block_id, start, end, rule, zone in blocks:
+        length = end - start
+        version = rule_version(rule, start, end, zone)
+        # Occurrences starting up to one length early can still overlap
+        block_keys = [
+            (_cache_key(block_id, version, month), month)
+            for month in _months(max(range_start - length, start), range_end)
+        ]
+        plan[block_id] = (start, end, rule, zone, block_keys)
+        keys.extend(key for key, _ in block_keys)
+
+    cached = cache.get_many(keys)
+    expanded = {}
+    result = {}
+    for block_id, (start, end, rule, zone, block_keys) in plan.items():
+        length = end - start
+        starts = []
+        try:
+            for key, month in block_keys:
+                if key in cached:
+                    month_starts = cached[key]
+                else:
+                    month_starts = _expand_month(rule, start, month, zone)
+                    expanded[key] = month_starts
+                starts.extend(month_starts)
+        except InvalidRecurrenceRule:
+            logger.warning('Ignoring invalid recurrence rule %r on blocked time %s', rule, block_id)
+            starts = [start]
+
+        result[block_id] = [
+            (occurrence, occurrence + length)
+            for occurrence in starts
+            if occurrence < range_end and occurrence + length > range_start
+        ]
+
+    if expanded:
+        cache.set_many(expanded, CACHE_TIMEOUT)
+    return result
+
+
+def validate_rule(rule, start, zone=dt_timezone.utc):
+    """Raise InvalidRecurrenceRule if rule can't be expanded from start."""
+    recurrence = parse_rule(rule, start, zone)
+    # Some errors only surface once the rule is iterated
+    try:
+        recurrence.after(start, inc=True)
+    except (ValueError, TypeError) as exc:
+        raise InvalidRecurrenceRule(str(exc)) from exc
@@ -1,8 +1,13 @@
 from rest_framework import serializers
-from django.utils import timezone
+from rest_framework.settings import api_settings
+from django.urls import reverse
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from .models import Appointment, CalendarIntegration, BlockedTime
+from .models import Appointment, CalendarFeed, CalendarIntegration, BlockedTime
+from .recurrence import InvalidRecurrenceRule, validate_rule
+from .services import BookingService, SlotUnavailable
+from apps.attorneys.models import AttorneyProfile
 
 
 class AppointmentSerializer(serializers.ModelSerializer):
@@ -11,6 +16,8 @@ class AppointmentSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.full_name', read_only=True)
     attorney_name = serializers.SerializerMethodField()
     matter_title = serializers.CharField(source='matter.title', read_only=True)
+    local_start = serializers.SerializerMethodField()
+    local_end = serializers.SerializerMethodField()
 
     class Meta:
         model = Appointment
@@ -18,7 +25,8 @@ class AppointmentSerializer(serializers.ModelSerializer):
             'id', 'client', 'client_name', 'attorney', 'attorney_name',
             'matter', 'matter_title', 'appointment_type', 'meeting_type',
             'status', 'date', 'start_time', 'end_time', 'duration_minutes',
-            'timezone', 'location', 'meeting_link',
+            'timezone', 'start_at', 'end_at', 'local_start', 'local_end',
+            'location', 'meeting_link',
             'client_notes', 'attorney_notes', 'fee', 'is_paid',
             'created_at', 'confirmed_at', 'cancelled_at'
         ]
@@ -29,10 +37,27 @@ class AppointmentSerializer(serializers.ModelSerializer):
     def get_attorney_name(self, obj):
         return obj.attorney.user.full_name
 
+    def _viewer_zone(self, obj):
+        # The viewer's timezone, else the one the appointment was booked in
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        return Appointment.zone(getattr(user, 'timezone', None) or obj.timezone)
+
+    def get_local_start(self, obj):
+        return obj.start_at.astimezone(self._viewer_zone(obj)).isoformat()
+
+    def get_local_end(self, obj):
+        return obj.end_at.astimezone(self._viewer_zone(obj)).isoformat()
+
 
 class CreateAppointmentSerializer(serializers.ModelSerializer):
     """Serializer for creating appointments."""
 
+    # Booking signals read attorney.user
+    attorney = serializers.PrimaryKeyRelatedField(
+        queryset=AttorneyProfile.objects.select_related('user')
+    )
+
     class Meta:
         model = Appointment
         fields = [
@@ -41,52 +66,27 @@ class CreateAppointmentSerializer(serializers.ModelSerializer):
             'location', 'client_notes'
         ]
 
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError('Unknown timezone.')
+        return value
+
     def validate(self, data):
         # Calculate end time
         start = datetime.combine(data['date'], data['start_time'])
         duration = timedelta(minutes=data.get('duration_minutes', 30))
         data['end_time'] = (start + duration).time()
-
-        # Check attorney availability
-        attorney = data['attorney']
-
-        # Check for conflicting appointments
-        conflicts = Appointment.objects.filter(
-            attorney=attorney,
-            date=data['date'],
-            status__in=['pending', 'confirmed']
-        ).exclude(
-            end_time__lte=data['start_time']
-        ).exclude(
-            start_time__gte=data['end_time']
-        )
-
-        if conflicts.exists():
-            raise serializers.ValidationError(
-                "This time slot is not available."
-            )
-
-        # Check blocked times
-        start_dt = timezone.make_aware(start)
-        end_dt = timezone.make_aware(datetime.combine(data['date'], data['end_time']))
-
-        blocked = BlockedTime.objects.filter(
-            attorney=attorney,
-            start_datetime__lt=end_dt,
-            end_datetime__gt=start_dt
-        )
-
-        if blocked.exists():
-            raise serializers.ValidationError(
-                "The attorney is not available during this time."
-            )
-
         return data
 
     def create(self, validated_data):
         validated_data['client'] = self.context['request'].user
         validated_data['fee'] = validated_data['attorney'].consultation_fee
-        return super().create(validated_data)
+        try:
+            return BookingService.book(**validated_data)
+        except SlotUnavailable as exc:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [str(exc)]})
 
 
 class RescheduleAppointmentSerializer(serializers.Serializer):
@@ -97,29 +97,10 @@ class RescheduleAppointmentSerializer(serializers.Serializer):
     duration_minutes = serializers.IntegerField(default=30, min_value=15)
 
     def validate(self, data):
-        appointment = self.instance
-
         # Calculate end time
         start = datetime.combine(data['date'], data['start_time'])
         duration = timedelta(minutes=data['duration_minutes'])
         data['end_time'] = (start + duration).time()
-
-        # Check for conflicts (excluding current appointment)
-        conflicts = Appointment.objects.filter(
-            attorney=appointment.attorney,
-            date=data['date'],
-            status__in=['pending', 'confirmed']
-        ).exclude(pk=appointment.pk).exclude(
-            end_time__lte=data['start_time']
-        ).exclude(
-            start_time__gte=data['end_time']
-        )
-
-        if conflicts.exists():
-            raise serializers.ValidationError(
-                "This time slot is not available."
-            )
-
         return data
 
 
@@ -130,9 +111,25 @@ class CalendarIntegrationSerializer(serializers.ModelSerializer):
         model = CalendarIntegration
         fields = [
             'id', 'provider', 'is_active', 'sync_enabled',
-            'calendar_id', 'created_at', 'last_synced_at'
+            'calendar_id', 'created_at', 'last_synced_at', 'last_sync_error'
         ]
-        read_only_fields = ['id', 'created_at', 'last_synced_at']
+        read_only_fields = ['id', 'created_at', 'last_synced_at', 'last_sync_error']
+
+
+class CalendarFeedSerializer(serializers.ModelSerializer):
+    """Serializer for a user's calendar feed subscription URL."""
+
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CalendarFeed
+        fields = ['url', 'version', 'modified_at', 'created_at']
+        read_only_fields = fields
+
+    def get_url(self, obj):
+        path = reverse('scheduling:calendar-feed-ics', args=[obj.token])
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
 
 
 class BlockedTimeSerializer(serializers.ModelSerializer):
@@ -146,6 +143,29 @@ class BlockedTimeSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
 
+    def validate(self, data):
+        start = data.get('start_datetime', getattr(self.instance, 'start_datetime', None))
+        end = data.get('end_datetime', getattr(self.instance, 'end_datetime', None))
+        if start and end and end <= start:
+            raise serializers.ValidationError('end_datetime must be after start_datetime.')
+
+        is_recurring = data.get('is_recurring', getattr(self.instance, 'is_recurring', False))
+        rule = data.get('recurrence_rule', getattr(self.instance, 'recurrence_rule', ''))
+        if is_recurring:
+            if not rule:
+                raise serializers.ValidationError(
+                    {'recurrence_rule': 'A recurrence rule is required for recurring blocks.'}
+                )
+            request = self.context.get('request')
+            zone = Appointment.zone(request.user.timezone if request else None)
+            try:
+                validate_rule(rule, start, zone)
+            except InvalidRecurrenceRule as exc:
+                raise serializers.ValidationError(
+                    {'recurrence_rule': f'Invalid recurrence rule: {exc}'}
+                )
+        return data
+
 
 class AvailableSlotsSerializer(serializers.Serializer):
     """Serializer for available time slots request."""
@@ -155,6 +175,46 @@ class AvailableSlotsSerializer(serializers.Serializer):
     duration_minutes = serializers.IntegerField(default=30, min_value=15)
 
 
+class AvailabilitySearchSerializer(serializers.Serializer):
+    """Serializer for searching free slots across attorneys and days."""
+
+    MAX_DAYS = 31
+
+    attorney_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=50
+    )
+    start_date = serializers.DateField()
+    end_date = serializers.DateField(required=False)
+    duration_minutes = serializers.IntegerField(default=30, min_value=15)
+    limit = serializers.IntegerField(default=5, min_value=1, max_value=100)
+    merge = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        end_date = data.setdefault('end_date', data['start_date'] + timedelta(days=6))
+        if end_date < data['start_date']:
+            raise serializers.ValidationError('end_date must not be before start_date.')
+        if (end_date - data['start_date']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(
+                f'Search at most {self.MAX_DAYS} days at a time.'
+            )
+        return data
+
+
+class AvailabilityBadgesSerializer(serializers.Serializer):
+    """Serializer for availability badges across many attorneys."""
+
+    attorney_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=500
+    )
+    start_date = serializers.DateField(required=False)
+    days = serializers.IntegerField(default=7, min_value=1, max_value=14)
+    duration_minutes = serializers.IntegerField(default=30, min_value=15)
+
+
 class TimeSlotSerializer(serializers.Serializer):
     """Serializer for time slot response."""
 
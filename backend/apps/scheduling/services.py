@@ -0,0 +1,485 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, Q
+from django.utils import timezone
+
+from .models import Appointment, AppointmentReminder, BlockedTime, BookingLock, ExternalBusyTime
+from . import recurrence
+from .slots import free_slots
+from apps.attorneys.models import AttorneyAvailability, AttorneyProfile
+from apps.notifications.models import Notification
+from apps.notifications.services import NotificationService
+
+
+# Appointments in these statuses take up the attorney's time
+ACTIVE_STATUSES = [
+    Appointment.AppointmentStatus.PENDING,
+    Appointment.AppointmentStatus.CONFIRMED,
+    Appointment.AppointmentStatus.RESCHEDULED,
+]
+
+
+class SlotUnavailable(Exception):
+    """The requested time conflicts with an appointment or blocked time."""
+
+
+class AvailabilityService:
+    """Service for computing attorneys' free slots."""
+
+    BUSY_STATUSES = ACTIVE_STATUSES
+
+    # Widest UTC offset either side, so a range of dates covers every zone
+    MAX_UTC_OFFSET = timedelta(hours=14)
+
+    @staticmethod
+    def _aware(day, at, zone):
+        return datetime.combine(day, at, tzinfo=zone).astimezone(dt_timezone.utc)
+
+    @staticmethod
+    def attorney_zones(attorney_user_ids):
+        """
+        {attorney user id: ZoneInfo} from each attorney's User.timezone,
+        UTC for unknown users.
+        """
+        attorney_user_ids = list(attorney_user_ids)
+        found = dict(
+            get_user_model().objects.filter(pk__in=attorney_user_ids).values_list('pk', 'timezone')
+        )
+        return {user_id: Appointment.zone(found.get(user_id)) for user_id in attorney_user_ids}
+
+    @classmethod
+    def load_calendars(cls, attorney_user_ids, start_date, end_date):
+        """
+        Load availability windows and busy intervals for several attorneys.
+
+        Covers start_date through end_date inclusive, as dates in each
+        attorney's own timezone: weekly availability is wall-clock time
+        there, like the times bookings are made in. Uses four queries
+        whatever the number of attorneys or days. Busy time imported from
+        external calendars counts like blocked time.
+        Returns {attorney user id: (windows, busy)}, all in UTC.
+        """
+        utc_start = datetime.combine(start_date, time.min, tzinfo=dt_timezone.utc)
+        range_start = utc_start - cls.MAX_UTC_OFFSET
+        range_end = utc_start + timedelta(days=(end_date - start_date).days + 1) + cls.MAX_UTC_OFFSET
+
+        weekly = defaultdict(lambda: defaultdict(list))
+        zones = {}
+        for attorney_id, tz_name, day_of_week, start_time, end_time in AttorneyAvailability.objects.filter(
+            attorney__user_id__in=attorney_user_ids,
+            is_active=True
+        ).values_list('attorney__user_id', 'attorney__user__timezone', 'day_of_week', 'start_time', 'end_time'):
+            weekly[attorney_id][day_of_week].append((start_time, end_time))
+            zones[attorney_id] = tz_name
+
+        calendars = {}
+        days = (end_date - start_date).days + 1
+        for attorney_id, by_weekday in weekly.items():
+            zone = Appointment.zone(zones[attorney_id])
+            windows = []
+            for offset in range(days):
+                day = start_date + timedelta(days=offset)
+                for start_time, end_time in by_weekday.get(day.weekday(), ()):
+                    windows.append((cls._aware(day, start_time, zone), cls._aware(day, end_time, zone)))
+            calendars[attorney_id] = (windows, [])
+
+        if not calendars:
+            return calendars
+
+        for attorney_id, start_at, end_at in Appointment.objects.filter(
+            attorney__user_id__in=calendars,
+            start_at__lt=range_end,
+            end_at__gt=range_start,
+            status__in=cls.BUSY_STATUSES
+        ).values_list('attorney__user_id', 'start_at', 'end_at'):
+            calendars[attorney_id][1].append((start_at, end_at))
+
+        for attorney_id, start_at, end_at in ExternalBusyTime.objects.filter(
+            user_id__in=calendars,
+            start_at__lt=range_end,
+            end_at__gt=range_start
+        ).values_list('user_id', 'start_at', 'end_at'):
+            calendars[attorney_id][1].append((start_at, end_at))
+
+        recurring = {}
+        for block_id, attorney_id, block_start, block_end, is_recurring, rule in BlockedTime.objects.filter(
+            Q(start_datetime__lt=range_end, end_datetime__gt=range_start) |
+            Q(is_recurring=True, start_datetime__lt=range_end),
+            attorney__user_id__in=calendars
+        ).values_list(
+            'id', 'attorney__user_id', 'start_datetime', 'end_datetime',
+            'is_recurring', 'recurrence_rule'
+        ):
+            if is_recurring and rule:
+                recurring[block_id] = (attorney_id, block_start, block_end, rule)
+            else:
+                calendars[attorney_id][1].append((block_start, block_end))
+
+        if recurring:
+            expanded = recurrence.occurrences(
+                [
+                    (block_id, block_start, block_end, rule, Appointment.zone(zones[attorney_id]))
+                    for block_id, (attorney_id, block_start, block_end, rule) in recurring.items()
+                ],
+                range_start,
+                range_end
+            )
+            for block_id, (attorney_id, *_) in recurring.items():
+                calendars[attorney_id][1].extend(expanded[block_id])
+
+        return calendars
+
+    @classmethod
+    def find_slots(
+        cls,
+        attorney_user_ids,
+        start_date,
+        end_date,
+        duration,
+        limit=None,
+        not_before=None
+    ):
+        """
+        Free slots of duration for each attorney between two dates.
+
+        Slots starting before not_before are skipped. At most limit slots
+        are returned per attorney, earliest first.
+        Returns {attorney user id: [(start, end), ...]}.
+        """
+        results = {}
+        calendars = cls.load_calendars(attorney_user_ids, start_date, end_date)
+        for attorney_id, (windows, busy) in calendars.items():
+            slots = free_slots(windows, busy, duration)
+            if not_before is not None:
+                slots = [slot for slot in slots if slot[0] >= not_before]
+            results[attorney_id] = slots[:limit] if limit else slots
+        return results
+
+    @classmethod
+    def earliest_slots(cls, slots_by_attorney, limit):
+        """Merge per-attorney slots into the earliest limit slots overall."""
+        merged = sorted(
+            (start, end, attorney_id)
+            for attorney_id, slots in slots_by_attorney.items()
+            for start, end in slots
+        )
+        return merged[:limit]
+
+
+class BookingService:
+    """
+    Service for booking and rescheduling appointments without double booking.
+
+    On PostgreSQL an exclusion constraint on (attorney, time range) rejects
+    overlapping active appointments, so concurrent bookings race safely and
+    the loser gets SlotUnavailable. Elsewhere, bookings lock BookingLock rows
+    for the attorney's affected days before checking for conflicts, which
+    serializes bookings per attorney and day only.
+
+    Conflicts are checked on the stored UTC start_at/end_at, so appointments
+    booked in different timezones compare correctly.
+    """
+
+    EXCLUSION_CONSTRAINT = 'scheduling_appointment_no_overlap'
+
+    SLOT_TAKEN = 'This time slot is not available.'
+    ATTORNEY_BLOCKED = 'The attorney is not available during this time.'
+
+    @staticmethod
+    def uses_exclusion_constraint():
+        return connection.vendor == 'postgresql'
+
+    @staticmethod
+    def _days(start, end):
+        day = timezone.localtime(start).date()
+        last = timezone.localtime(end - timedelta(microseconds=1)).date()
+        days = []
+        while day <= last:
+            days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    @classmethod
+    def _lock_days(cls, attorney, start, end):
+        """Lock the attorney's reservation rows for the days [start, end) touches."""
+        # Upserting writes every row, which takes the lock straight away,
+        # also on SQLite
+        BookingLock.objects.bulk_create(
+            [BookingLock(attorney=attorney, date=day, locked_at=timezone.now()) for day in cls._days(start, end)],
+            update_conflicts=True,
+            unique_fields=['attorney', 'date'],
+            update_fields=['locked_at']
+        )
+
+    @classmethod
+    def check_available(cls, attorney, start, end, exclude_pk=None):
+        """
+        Raise SlotUnavailable if [start, end) overlaps the attorney's calendar.
+
+        Appointments, external busy time and blocked time are checked in one
+        query; recurring blocks are only loaded and expanded when the
+        attorney has some that started before end.
+        """
+        appointments = Appointment.objects.filter(
+            attorney=attorney,
+            status__in=ACTIVE_STATUSES,
+            start_at__lt=end,
+            end_at__gt=start
+        )
+        if exclude_pk:
+            appointments = appointments.exclude(pk=exclude_pk)
+        recurring_blocks = BlockedTime.objects.filter(
+            attorney=attorney, is_recurring=True, start_datetime__lt=end
+        ).exclude(recurrence_rule='')
+
+        taken, external, blocked, has_recurring = AttorneyProfile.objects.filter(pk=attorney.pk).annotate(
+            taken=Exists(appointments),
+            external=Exists(ExternalBusyTime.objects.filter(
+                user_id=attorney.user_id, start_at__lt=end, end_at__gt=start
+            )),
+            blocked=Exists(BlockedTime.objects.filter(
+                Q(is_recurring=False) | Q(recurrence_rule=''),
+                attorney=attorney, start_datetime__lt=end, end_datetime__gt=start
+            )),
+            has_recurring=Exists(recurring_blocks)
+        ).values_list('taken', 'external', 'blocked', 'has_recurring').get()
+
+        if taken:
+            raise SlotUnavailable(cls.SLOT_TAKEN)
+        if external or blocked:
+            raise SlotUnavailable(cls.ATTORNEY_BLOCKED)
+        if has_recurring:
+            recurring = [
+                (block_id, block_start, block_end, rule, Appointment.zone(tz_name))
+                for block_id, block_start, block_end, rule, tz_name in recurring_blocks.values_list(
+                    'id', 'start_datetime', 'end_datetime', 'recurrence_rule', 'attorney__user__timezone'
+                )
+            ]
+            if any(recurrence.occurrences(recurring, start, end).values()):
+                raise SlotUnavailable(cls.ATTORNEY_BLOCKED)
+
+    @classmethod
+    def _save(cls, appointment, **kwargs):
+        # Always called inside book()/reschedule()'s atomic block, which the
+        # raised SlotUnavailable rolls back, so no savepoint of its own
+        try:
+            appointment.save(**kwargs)
+        except IntegrityError as exc:
+            if cls.EXCLUSION_CONSTRAINT in str(exc):
+                raise SlotUnavailable(cls.SLOT_TAKEN) from exc
+            raise
+
+    @classmethod
+    def book(cls, **fields):
+        """
+        Create an appointment if its time is free.
+        Raises SlotUnavailable otherwise.
+        """
+        appointment = Appointment(**fields)
+        appointment.sync_times()
+        start, end = appointment.start_at, appointment.end_at
+        with transaction.atomic():
+            if not cls.uses_exclusion_constraint():
+                cls._lock_days(appointment.attorney, start, end)
+            cls.check_available(appointment.attorney, start, end)
+            cls._save(appointment, force_insert=True)
+        return appointment
+
+    @classmethod
+    def reschedule(cls, appointment, date, start_time, duration_minutes):
+        """
+        Move an appointment to a new time through the same guarded path.
+        Raises SlotUnavailable if the new time isn't free.
+        """
+        start, end = Appointment.bounds(date, start_time, duration_minutes, appointment.timezone)
+        with transaction.atomic():
+            if not cls.uses_exclusion_constraint():
+                cls._lock_days(appointment.attorney, start, end)
+            cls.check_available(appointment.attorney, start, end, exclude_pk=appointment.pk)
+
+            appointment.date = date
+            appointment.start_time = start_time
+            appointment.duration_minutes = duration_minutes
+            appointment.status = Appointment.AppointmentStatus.RESCHEDULED
+            cls._save(appointment)
+        return appointment
+
+
+class ReminderService:
+    """
+    Service for queueing and sending appointment reminders.
+
+    Every active upcoming appointment has an AppointmentReminder row per
+    attendee and reminder kind that is still ahead. sync() keeps the rows in
+    step with their appointments; send_due() claims due rows with SKIP
+    LOCKED, turns them into notifications and deletes them.
+    """
+
+    BATCH_SIZE = 500
+    DELETE_CHUNK_SIZE = 100
+
+    @staticmethod
+    def due_at(kind, start_at, tz_name):
+        """When a reminder of kind is due for a start, in the attendee's timezone."""
+        if kind == AppointmentReminder.Kind.DAY_BEFORE:
+            # Same wall clock time the day before, even across a DST change
+            zone = Appointment.zone(tz_name)
+            local = start_at.astimezone(zone)
+            return datetime.combine(local.date() - timedelta(days=1), local.time(), tzinfo=zone)
+        return start_at - timedelta(hours=1)
+
+    @classmethod
+    def sync(cls, appointments, now=None, new=False):
+        """
+        Bring the queued reminders of appointments up to date.
+
+        appointments should have client and attorney__user loaded; new says
+        they were just created and have no reminders yet. Reminders still
+        ahead are upserted in one query. Ones whose due time has passed, and
+        all reminders of inactive appointments, are dropped.
+        """
+        now = now or timezone.now()
+        active = [a for a in appointments if a.status in ACTIVE_STATUSES]
+        inactive = [a.pk for a in appointments if a.status not in ACTIVE_STATUSES]
+        if inactive and not new:
+            AppointmentReminder.objects.filter(appointment__in=inactive).delete()
+
+        wanted = []
+        passed = []
+        for appointment in active:
+            for user in (appointment.client, appointment.attorney.user):
+                for kind in AppointmentReminder.Kind.values:
+                    due = cls.due_at(kind, appointment.start_at, user.timezone)
+                    if due > now:
+                        wanted.append(AppointmentReminder(
+                            appointment_id=appointment.pk, user_id=user.pk, kind=kind, due_at=due
+                        ))
+                    elif not new:
+                        passed.append(Q(appointment_id=appointment.pk, user_id=user.pk, kind=kind))
+
+        if wanted:
+            AppointmentReminder.objects.bulk_create(
+                wanted,
+                update_conflicts=True,
+                unique_fields=['appointment', 'user', 'kind'],
+                update_fields=['due_at']
+            )
+        # Chunked to keep the OR'ed conditions within database limits
+        for offset in range(0, len(passed), cls.DELETE_CHUNK_SIZE):
+            AppointmentReminder.objects.filter(
+                reduce(or_, passed[offset:offset + cls.DELETE_CHUNK_SIZE])
+            ).delete()
+
+    @classmethod
+    def backfill(cls, batch_size=None):
+        """Queue reminders for every active upcoming appointment. Returns the count."""
+        return cls._sync_upcoming(Q(), batch_size)
+
+    @classmethod
+    def resync_user(cls, user_id, batch_size=None):
+        """
+        Recompute the reminders of a user's upcoming appointments, which
+        follow the attendees' timezones. Returns the appointment count.
+        """
+        return cls._sync_upcoming(Q(client_id=user_id) | Q(attorney__user_id=user_id), batch_size)
+
+    @classmethod
+    def _sync_upcoming(cls, condition, batch_size=None):
+        batch_size = batch_size or cls.BATCH_SIZE
+        appointments = Appointment.objects.filter(
+            condition,
+            status__in=ACTIVE_STATUSES,
+            start_at__gt=timezone.now()
+        ).select_related('client', 'attorney__user').order_by('start_at')
+
+        total = 0
+        batch = []
+        for appointment in appointments.iterator(chunk_size=batch_size):
+            batch.append(appointment)
+            if len(batch) >= batch_size:
+                cls.sync(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            cls.sync(batch)
+            total += len(batch)
+        return total
+
+    @classmethod
+    def send_due(cls, batch_size=None, now=None):
+        """
+        Claim one batch of due reminders and send them.
+        Returns the number of reminders claimed.
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        now = now or timezone.now()
+
+        with transaction.atomic():
+            claimed = list(
+                AppointmentReminder.objects.select_for_update(skip_locked=True).filter(
+                    due_at__lte=now
+                ).order_by('due_at').values_list('pk', flat=True)[:batch_size]
+            )
+            if not claimed:
+                return 0
+
+            reminders = AppointmentReminder.objects.filter(pk__in=claimed).select_related(
+                'user', 'appointment__client', 'appointment__attorney__user'
+            )
+            notifications = [
+                cls._build_notification(reminder)
+                for reminder in reminders
+                if cls._still_relevant(reminder, now)
+            ]
+            if notifications:
+                NotificationService.create_notifications(notifications)
+            AppointmentReminder.objects.filter(pk__in=claimed).delete()
+
+        return len(claimed)
+
+    @staticmethod
+    def _still_relevant(reminder, now):
+        appointment = reminder.appointment
+        if appointment.status not in ACTIVE_STATUSES or appointment.start_at <= now:
+            return False
+        # A day-before reminder sent late would only duplicate the hour-before one
+        if reminder.kind == AppointmentReminder.Kind.DAY_BEFORE:
+            return appointment.start_at - now > timedelta(hours=1)
+        return True
+
+    @staticmethod
+    def _build_notification(reminder):
+        appointment = reminder.appointment
+        if reminder.user_id == appointment.client_id:
+            other = appointment.attorney.user
+        else:
+            other = appointment.client
+        zone = Appointment.zone(reminder.user.timezone)
+        local_start = appointment.start_at.astimezone(zone)
+
+        if reminder.kind == AppointmentReminder.Kind.DAY_BEFORE:
+            title = 'Appointment Tomorrow'
+            priority = Notification.Priority.NORMAL
+        else:
+            title = 'Appointment in One Hour'
+            priority = Notification.Priority.HIGH
+
+        return Notification(
+            user=reminder.user,
+            notification_type=Notification.NotificationType.APPOINTMENT_REMINDER,
+            priority=priority,
+            title=title,
+            message=(
+                f'Your {appointment.get_appointment_type_display().lower()} with '
+                f'{other.full_name or other.email} is on {local_start:%b %d} at '
+                f'{local_start:%H:%M} ({zone.key}).'
+            ),
+            related_object_type='Appointment',
+            related_object_id=appointment.pk,
+            action_url=f'/appointments/{appointment.id}'
+        )
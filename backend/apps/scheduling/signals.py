@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import freebusy
+from .models import Appointment, BlockedTime, CalendarFeed
+from .services import ReminderService
+from apps.attorneys.models import AttorneyAvailability
+
+
+# Saves touching none of these leave the appointment's time unchanged
+TIME_FIELDS = {'date', 'start_time', 'duration_minutes', 'timezone'}
+
+
+def _changes(update_fields, fields):
+    return update_fields is None or not fields.isdisjoint(update_fields)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_appointment_times(sender, instance, update_fields=None, **kwargs):
+    """Remember the stored interval so a reschedule clears the old days too."""
+    if instance._state.adding or not _changes(update_fields, TIME_FIELDS):
+        instance._freebusy_old_times = None
+    elif hasattr(instance, '_stored_times'):
+        instance._freebusy_old_times = instance._stored_times
+    else:
+        instance._freebusy_old_times = Appointment.objects.filter(
+            pk=instance.pk
+        ).values_list('start_at', 'end_at').first()
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_days(sender, instance, **kwargs):
+    days = set(freebusy.touched_days(instance.start_at, instance.end_at))
+    old_times = getattr(instance, '_freebusy_old_times', None)
+    if old_times:
+        days.update(freebusy.touched_days(*old_times))
+    attorney_id = instance.attorney.user_id
+    transaction.on_commit(lambda: freebusy.invalidate_days(attorney_id, days))
+
+
+@receiver(post_save, sender=BlockedTime)
+@receiver(post_delete, sender=BlockedTime)
+def invalidate_blocked_days(sender, instance, signal, created=False, **kwargs):
+    attorney_id = instance.attorney.user_id
+    edited = signal is post_save and not created
+    if instance.is_recurring or edited:
+        # Recurring or edited blocks can touch any day
+        transaction.on_commit(lambda: freebusy.invalidate_attorney(attorney_id))
+    else:
+        days = freebusy.touched_days(instance.start_datetime, instance.end_datetime)
+        transaction.on_commit(lambda: freebusy.invalidate_days(attorney_id, days))
+
+
+@receiver(post_save, sender=AttorneyAvailability)
+@receiver(post_delete, sender=AttorneyAvailability)
+def invalidate_weekly_availability(sender, instance, **kwargs):
+    attorney_id = instance.attorney.user_id
+    transaction.on_commit(lambda: freebusy.invalidate_attorney(attorney_id))
+
+
+@receiver(pre_save, sender=get_user_model())
+def remember_user_timezone(sender, instance, update_fields=None, **kwargs):
+    """Remember the stored timezone so only a real change is acted on."""
+    if instance._state.adding or not _changes(update_fields, {'timezone'}):
+        instance._previous_timezone = instance.timezone
+    else:
+        instance._previous_timezone = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('timezone', flat=True).first()
+
+
+@receiver(post_save, sender=get_user_model())
+def apply_timezone_change(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_previous_timezone', instance.timezone) == instance.timezone:
+        return
+    user_id = instance.pk
+    # Reminders are due at a wall clock time in each attendee's timezone
+    transaction.on_commit(lambda: ReminderService.resync_user(user_id))
+    if instance.is_attorney:
+        # Free/busy days and recurring blocks follow the attorney's timezone
+        transaction.on_commit(lambda: freebusy.invalidate_attorney(user_id))
+        transaction.on_commit(lambda: CalendarFeed.bump([user_id]))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def bump_appointment_feeds(sender, instance, **kwargs):
+    user_ids = [instance.client_id, instance.attorney.user_id]
+    transaction.on_commit(lambda: CalendarFeed.bump(user_ids))
+
+
+@receiver(post_save, sender=BlockedTime)
+@receiver(post_delete, sender=BlockedTime)
+def bump_blocked_time_feed(sender, instance, **kwargs):
+    user_id = instance.attorney.user_id
+    transaction.on_commit(lambda: CalendarFeed.bump([user_id]))
+
+
+@receiver(post_save, sender=Appointment)
+def sync_appointment_reminders(sender, instance, created, update_fields=None, **kwargs):
+    if not _changes(update_fields, TIME_FIELDS | {'status'}):
+        return
+    transaction.on_commit(lambda: ReminderService.sync([instance], new=created))
@@ -0,0 +1,96 @@
+"""
+Interval arithmetic for availability and slot generation.
+
+Intervals are (start, end) pairs of aware datetimes, half-open: an
+appointment ending at 10:00 doesn't overlap one starting at 10:00.
+
+Busy intervals are merged once with a sort and sweep, then subtracted from
+the availability windows in a single pass, so generating a day's slots is
+O(n log n) in the number of intervals plus the number of slots emitted.
+"""
+from bisect import bisect_right
+
+
+def merge_intervals(intervals):
+    """Sort intervals and merge the ones that overlap or touch."""
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(windows, busy):
+    """
+    Return the parts of windows not covered by busy.
+
+    Both inputs must be sorted and non-overlapping, as returned by
+    merge_intervals(). Runs in O(len(windows) + len(busy)).
+    """
+    free = []
+    i = 0
+    for window_start, window_end in windows:
+        cursor = window_start
+        # Skip busy intervals that end before this window
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < window_end:
+            busy_start, busy_end = busy[j]
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            if cursor >= window_end:
+                break
+            j += 1
+        if cursor < window_end:
+            free.append((cursor, window_end))
+    return free
+
+
+def slots_in_window(window, free, duration):
+    """
+    Yield (start, end) slots of duration on the window's grid that fit in free.
+
+    Slots are aligned to the window start, so a 30 minute grid starting at
+    09:00 only offers :00 and :30 starts. free must be sorted.
+    """
+    window_start, window_end = window
+    for free_start, free_end in free:
+        start = max(free_start, window_start)
+        end = min(free_end, window_end)
+        if end <= start:
+            continue
+        # Round up to the next grid point
+        offset = (start - window_start) % duration
+        if offset:
+            start += duration - offset
+        while start + duration <= end:
+            yield start, start + duration
+            start += duration
+
+
+def free_slots(windows, busy, duration):
+    """
+    Return the free slots of duration in windows, in start order.
+
+    windows are availability intervals; each keeps its own slot grid.
+    busy is any iterable of busy intervals, in any order.
+    """
+    free = subtract_intervals(merge_intervals(windows), merge_intervals(busy))
+    free_ends = [end for _, end in free]
+
+    slots = []
+    for window in sorted(windows):
+        # First free interval that ends after the window starts
+        first = bisect_right(free_ends, window[0])
+        last = first
+        while last < len(free) and free[last][0] < window[1]:
+            last += 1
+        slots.extend(slots_in_window(window, free[first:last], duration))
+    return slots
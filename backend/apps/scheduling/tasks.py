@@ -0,0 +1,22 @@
+from celery import shared_task
+
+from .calendar_sync import CalendarSyncService
+from .services import ReminderService
+
+
+@shared_task
+def send_appointment_reminders(max_batches=100):
+    """Send due appointment reminders in batches until none are left."""
+    total = 0
+    for _ in range(max_batches):
+        claimed = ReminderService.send_due()
+        total += claimed
+        if claimed < ReminderService.BATCH_SIZE:
+            break
+    return total
+
+
+@shared_task
+def sync_calendars():
+    """Sync the calendar integrations that are due."""
+    return CalendarSyncService.sync_due()
@@ -0,0 +1,776 @@
+import threading
+import time as clock
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.attorneys.models import AttorneyAvailability, AttorneyProfile
+from apps.notifications.models import Notification
+from apps.scheduling import calendar_sync, freebusy, recurrence
+from apps.scheduling.calendar_sync import CalendarSyncService, LocalCalendarProvider
+from apps.scheduling.models import (
+    Appointment, AppointmentReminder, BlockedTime, CalendarFeed, CalendarIntegration, ExternalBusyTime
+)
+from apps.scheduling.services import ACTIVE_STATUSES, BookingService, ReminderService, SlotUnavailable
+from apps.scheduling.slots import free_slots, merge_intervals, slots_in_window, subtract_intervals
+from apps.users.models import User
+
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_attorney(email, **extra):
+    user = User.objects.create_user(
+        email=email, password=None, first_name='Test', last_name='Attorney',
+        user_type=User.UserType.ATTORNEY, **extra
+    )
+    return AttorneyProfile.objects.create(
+        user=user, bar_number=email, bar_state='CA', bar_admission_date=date(2010, 1, 1)
+    )
+
+
+def create_client(email):
+    return User.objects.create_user(
+        email=email, password=None, first_name='Test', last_name='Client',
+        user_type=User.UserType.CLIENT
+    )
+
+
+def at(hour, minute=0):
+    return datetime(2026, 6, 1, hour, minute, tzinfo=dt_timezone.utc)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConcurrentBookingTests(TransactionTestCase):
+    """Many threads booking overlapping slots at once never double book."""
+
+    THREADS = 8
+    ROUNDS = 3
+
+    def setUp(self):
+        self.attorneys = [create_attorney(f'attorney{n}@example.com') for n in range(2)]
+        self.client_user = create_client('client@example.com')
+        self.day = date.today() + timedelta(days=30)
+
+    def test_concurrent_bookings_never_overlap(self):
+        jobs = [
+            # Rounds overlap each other by 15 minutes
+            (attorney, time(9 + round_number))
+            for attorney in self.attorneys
+            for round_number in range(self.ROUNDS)
+            for _ in range(self.THREADS)
+        ]
+        barrier = threading.Barrier(len(jobs))
+        outcomes = []
+        errors = []
+
+        def book(attorney, start):
+            # SQLite's shared in-memory test database reports a held lock
+            # straight away rather than waiting, so retry like a busy timeout
+            for _ in range(200):
+                try:
+                    return BookingService.book(
+                        attorney=attorney, client=self.client_user, date=self.day,
+                        start_time=start, duration_minutes=75, timezone='UTC'
+                    )
+                except OperationalError as exc:
+                    if connection.vendor != 'sqlite' or 'locked' not in str(exc):
+                        raise
+                    clock.sleep(0.01)
+            raise AssertionError('Gave up waiting for the database lock')
+
+        def attempt(attorney, start):
+            try:
+                barrier.wait()
+                book(attorney, start)
+                outcomes.append('booked')
+            except SlotUnavailable:
+                outcomes.append('rejected')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=job) for job in jobs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(outcomes), len(jobs))
+        for attorney in self.attorneys:
+            booked = list(
+                Appointment.objects.filter(
+                    attorney=attorney, status__in=ACTIVE_STATUSES
+                ).order_by('start_at').values_list('start_at', 'end_at')
+            )
+            self.assertTrue(booked)
+            for previous, current in zip(booked, booked[1:]):
+                self.assertGreaterEqual(current[0], previous[1])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryCountTests(TestCase):
+    """
+    Query budgets for the scheduling endpoints.
+
+    Authentication is forced, so the user lookup a real request makes isn't
+    counted. Reads aim for 2-4 queries; the free/busy endpoints need one per
+    calendar source (availability, appointments, external busy time, blocked
+    time) plus the attorney or timezone lookup. Writes also count the
+    on-commit work their signals trigger: bumping the calendar feed version
+    and syncing reminders. Bookings add the BookingLock upsert PostgreSQL's
+    exclusion constraint makes unnecessary, and the SAVEPOINT/RELEASE pair
+    their atomic block becomes inside the test's transaction.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.attorney = create_attorney('attorney@example.com')
+        self.client_user = create_client('client@example.com')
+        self.day = timezone.localdate() + timedelta(days=7)
+        AttorneyAvailability.objects.create(
+            attorney=self.attorney, day_of_week=self.day.weekday(), start_time=time(9), end_time=time(17)
+        )
+        self.as_attorney = APIClient()
+        self.as_attorney.force_authenticate(self.attorney.user)
+        self.as_client = APIClient()
+        self.as_client.force_authenticate(self.client_user)
+
+    def book(self, start_time=time(10), status=Appointment.AppointmentStatus.PENDING):
+        return Appointment.objects.create(
+            attorney=self.attorney, client=self.client_user, date=self.day,
+            start_time=start_time, duration_minutes=30, timezone='UTC', status=status
+        )
+
+    def assertQueries(self, count, api, method, url, expected_status, **kwargs):
+        # Cached free/busy bitmaps would hide queries
+        cache.clear()
+        # on_commit work triggered by the request is counted too
+        with self.assertNumQueries(count), self.captureOnCommitCallbacks(execute=True):
+            response = getattr(api, method)(url, format='json', **kwargs)
+        self.assertEqual(response.status_code, expected_status, response.content[:300])
+        return response
+
+    def test_create(self):
+        self.assertQueries(
+            8, self.as_client, 'post', reverse('scheduling:appointment-create'), 201,
+            data={
+                'attorney': str(self.attorney.pk), 'date': self.day.isoformat(),
+                'start_time': '10:00', 'duration_minutes': 30, 'timezone': 'UTC',
+            }
+        )
+
+    def test_list(self):
+        self.book()
+        self.assertQueries(2, self.as_client, 'get', reverse('scheduling:appointment-list'), 200)
+        self.assertQueries(2, self.as_attorney, 'get', reverse('scheduling:appointment-list'), 200)
+
+    def test_detail(self):
+        appointment = self.book()
+        self.assertQueries(
+            1, self.as_client, 'get', reverse('scheduling:appointment-detail', args=[appointment.pk]), 200
+        )
+
+    def test_upcoming(self):
+        self.book()
+        self.assertQueries(2, self.as_attorney, 'get', reverse('scheduling:upcoming-appointments'), 200)
+
+    def test_confirm(self):
+        appointment = self.book()
+        self.assertQueries(
+            4, self.as_attorney, 'post', reverse('scheduling:appointment-confirm', args=[appointment.pk]), 200
+        )
+
+    def test_reschedule(self):
+        appointment = self.book()
+        self.assertQueries(
+            8, self.as_client, 'post', reverse('scheduling:appointment-reschedule', args=[appointment.pk]), 200,
+            data={'date': self.day.isoformat(), 'start_time': '11:00', 'duration_minutes': 30}
+        )
+
+    def test_complete(self):
+        appointment = self.book(status=Appointment.AppointmentStatus.CONFIRMED)
+        self.assertQueries(
+            4, self.as_attorney, 'post', reverse('scheduling:appointment-complete', args=[appointment.pk]), 200
+        )
+
+    def test_cancel(self):
+        appointment = self.book()
+        self.assertQueries(
+            4, self.as_client, 'post', reverse('scheduling:appointment-cancel', args=[appointment.pk]), 200
+        )
+
+    def test_available_slots(self):
+        self.book()
+        self.assertQueries(
+            5, self.as_client, 'post', reverse('scheduling:available-slots'), 200,
+            data={'attorney_id': str(self.attorney.user_id), 'date': self.day.isoformat()}
+        )
+
+    def test_search(self):
+        self.book()
+        self.assertQueries(
+            5, self.as_client, 'post', reverse('scheduling:availability-search'), 200,
+            data={'attorney_ids': [str(self.attorney.user_id)], 'start_date': self.day.isoformat()}
+        )
+
+    def test_badges(self):
+        self.book()
+        self.assertQueries(
+            5, self.as_client, 'post', reverse('scheduling:availability-badges'), 200,
+            data={'attorney_ids': [str(self.attorney.user_id)]}
+        )
+
+    def test_blocked_times(self):
+        start = timezone.now() + timedelta(days=2)
+        BlockedTime.objects.create(
+            attorney=self.attorney, start_datetime=start, end_datetime=start + timedelta(hours=1)
+        )
+        self.assertQueries(2, self.as_attorney, 'get', reverse('scheduling:blocked-time-list'), 200)
+        start += timedelta(days=1)
+        response = self.assertQueries(
+            3, self.as_attorney, 'post', reverse('scheduling:blocked-time-list'), 201,
+            data={'start_datetime': start.isoformat(), 'end_datetime': (start + timedelta(hours=1)).isoformat()}
+        )
+        self.assertQueries(
+            3, self.as_attorney, 'delete',
+            reverse('scheduling:blocked-time-delete', args=[response.data['id']]), 204
+        )
+
+    def test_calendar_integrations(self):
+        self.assertQueries(1, self.as_attorney, 'get', reverse('scheduling:calendar-integrations'), 200)
+
+    def test_calendar_feed(self):
+        feed = CalendarFeed.objects.create(user=self.attorney.user)
+        self.assertQueries(1, self.as_attorney, 'get', reverse('scheduling:calendar-feed'), 200)
+        self.assertQueries(
+            1, APIClient(), 'get', reverse('scheduling:calendar-feed-ics', args=[feed.token]), 304,
+            HTTP_IF_NONE_MATCH=feed.etag
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UpcomingAppointmentsTests(TestCase):
+    """Upcoming appointments are the active ones that haven't ended yet."""
+
+    def setUp(self):
+        self.attorney = create_attorney('attorney@example.com')
+        self.client_user = create_client('client@example.com')
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def appointment_at(self, start, status=Appointment.AppointmentStatus.CONFIRMED):
+        start = start.astimezone(dt_timezone.utc)
+        return Appointment.objects.create(
+            attorney=self.attorney, client=self.client_user, date=start.date(),
+            start_time=start.time(), duration_minutes=30, timezone='UTC', status=status
+        )
+
+    def test_lists_active_appointments_until_they_end(self):
+        now = timezone.now().replace(second=0, microsecond=0)
+        ended = self.appointment_at(now - timedelta(hours=2))
+        in_progress = self.appointment_at(now - timedelta(minutes=10))
+        later = self.appointment_at(now + timedelta(days=1), status=Appointment.AppointmentStatus.PENDING)
+        self.appointment_at(now + timedelta(days=2), status=Appointment.AppointmentStatus.CANCELLED)
+        self.appointment_at(now + timedelta(days=3), status=Appointment.AppointmentStatus.RESCHEDULED)
+
+        response = self.api.get(reverse('scheduling:upcoming-appointments'))
+
+        self.assertEqual(response.status_code, 200)
+        ids = [item['id'] for item in response.data['results']]
+        self.assertEqual(ids, [str(in_progress.pk), str(later.pk)])
+        self.assertNotIn(str(ended.pk), ids)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CalendarFeedTests(TestCase):
+    """The iCalendar feed served to calendar apps."""
+
+    def setUp(self):
+        self.attorney = create_attorney('attorney@example.com', timezone='America/New_York')
+        self.feed = CalendarFeed.objects.create(user=self.attorney.user)
+        self.api = APIClient()
+
+    def get_feed(self, token=None, **headers):
+        return self.api.get(reverse('scheduling:calendar-feed-ics', args=[token or self.feed.token]), **headers)
+
+    def test_unchanged_feed_is_not_modified(self):
+        response = self.get_feed()
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        for headers in ({'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': last_modified}):
+            not_modified = self.get_feed(**headers)
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified['ETag'], etag)
+
+    def test_feed_changes_when_its_version_is_bumped(self):
+        etag = self.get_feed()['ETag']
+        start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.create(
+                attorney=self.attorney, client=create_client('client@example.com'), date=start.date(),
+                start_time=start.time(), duration_minutes=30, timezone='UTC'
+            )
+
+        response = self.get_feed(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(f'UID:appointment-{appointment.pk}@', b''.join(response.streaming_content).decode())
+
+    def test_unknown_or_revoked_token_is_not_found(self):
+        self.assertEqual(self.get_feed(token='not-a-token').status_code, 404)
+        old_token = self.feed.token
+        self.feed.regenerate_token()
+        self.assertEqual(self.get_feed(token=old_token).status_code, 404)
+        self.assertEqual(self.get_feed().status_code, 200)
+
+    def test_recurring_blocks_come_with_their_timezone(self):
+        # Early March, before New York's clocks go forward
+        year = timezone.now().year
+        start = datetime(year, 3, 2, 14, tzinfo=dt_timezone.utc)
+        BlockedTime.objects.create(
+            attorney=self.attorney, start_datetime=start, end_datetime=start + timedelta(hours=1),
+            is_recurring=True, recurrence_rule='FREQ=WEEKLY;BYDAY=MO'
+        )
+
+        body = b''.join(self.get_feed().streaming_content).decode()
+
+        self.assertIn(f'DTSTART;TZID=America/New_York:{year}0302T090000', body)
+        self.assertEqual(body.count('BEGIN:VTIMEZONE'), 1)
+        self.assertIn('TZID:America/New_York\r\n', body)
+        self.assertLess(body.index('END:VTIMEZONE'), body.index('BEGIN:VEVENT'))
+        self.assertIn('TZOFFSETFROM:-0500\r\nTZOFFSETTO:-0400\r\nTZNAME:EDT', body)
+        self.assertIn('RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=2SU', body)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TimezoneChangeTests(TestCase):
+    """A user's timezone change refreshes what depends on it, and only then."""
+
+    def setUp(self):
+        cache.clear()
+        self.attorney = create_attorney('attorney@example.com')
+        self.attorney_user = self.attorney.user
+        self.client_user = create_client('client@example.com')
+        self.feed = CalendarFeed.objects.create(user=self.attorney_user)
+        start = (timezone.now() + timedelta(days=5)).astimezone(dt_timezone.utc).replace(
+            hour=15, minute=0, second=0, microsecond=0
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment = Appointment.objects.create(
+                attorney=self.attorney, client=self.client_user, date=start.date(),
+                start_time=start.time(), duration_minutes=30, timezone='UTC',
+                status=Appointment.AppointmentStatus.CONFIRMED
+            )
+        self.feed.refresh_from_db()
+        self.version = self.feed.version
+
+    def save(self, user, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(**kwargs)
+
+    def day_before_due(self, user):
+        return AppointmentReminder.objects.get(
+            appointment=self.appointment, user=user, kind=AppointmentReminder.Kind.DAY_BEFORE
+        ).due_at
+
+    def test_saving_without_a_timezone_change_invalidates_nothing(self):
+        generation = freebusy._generations([self.attorney_user.pk])[self.attorney_user.pk]
+        self.attorney_user.first_name = 'Renamed'
+        self.save(self.attorney_user)
+
+        self.feed.refresh_from_db()
+        self.assertEqual(self.feed.version, self.version)
+        self.assertEqual(freebusy._generations([self.attorney_user.pk])[self.attorney_user.pk], generation)
+
+    def test_attorney_timezone_change_invalidates_and_resyncs(self):
+        generation = freebusy._generations([self.attorney_user.pk])[self.attorney_user.pk]
+        self.attorney_user.timezone = 'America/New_York'
+        self.save(self.attorney_user, update_fields=['timezone'])
+
+        self.feed.refresh_from_db()
+        self.assertEqual(self.feed.version, self.version + 1)
+        self.assertNotEqual(freebusy._generations([self.attorney_user.pk])[self.attorney_user.pk], generation)
+        self.assertEqual(
+            self.day_before_due(self.attorney_user),
+            ReminderService.due_at(
+                AppointmentReminder.Kind.DAY_BEFORE, self.appointment.start_at, 'America/New_York'
+            )
+        )
+
+    def test_client_timezone_change_resyncs_their_reminders(self):
+        attorney_due = self.day_before_due(self.attorney_user)
+        self.client_user.timezone = 'Asia/Tokyo'
+        self.save(self.client_user)
+
+        self.assertEqual(
+            self.day_before_due(self.client_user),
+            ReminderService.due_at(AppointmentReminder.Kind.DAY_BEFORE, self.appointment.start_at, 'Asia/Tokyo')
+        )
+        self.assertEqual(self.day_before_due(self.attorney_user), attorney_due)
+        self.feed.refresh_from_db()
+        self.assertEqual(self.feed.version, self.version)
+
+
+class SlotIntervalTests(SimpleTestCase):
+    """Interval arithmetic behind slot generation."""
+
+    HALF_HOUR = timedelta(minutes=30)
+
+    def test_merge_joins_touching_and_nested_intervals(self):
+        self.assertEqual(
+            merge_intervals([(at(13), at(14)), (at(9), at(10)), (at(10), at(11)), (at(9, 30), at(9, 45))]),
+            [(at(9), at(11)), (at(13), at(14))]
+        )
+
+    def test_merge_drops_empty_intervals(self):
+        self.assertEqual(merge_intervals([(at(9), at(9)), (at(11), at(10))]), [])
+        self.assertEqual(merge_intervals([]), [])
+
+    def test_subtract_cuts_busy_time_out_of_windows(self):
+        windows = [(at(9), at(12)), (at(13), at(17))]
+        busy = [(at(8), at(9, 30)), (at(10), at(10, 30)), (at(11, 30), at(13, 30)), (at(17), at(18))]
+        self.assertEqual(subtract_intervals(windows, busy), [
+            (at(9, 30), at(10)), (at(10, 30), at(11, 30)), (at(13, 30), at(17)),
+        ])
+
+    def test_subtract_keeps_windows_that_busy_time_only_touches(self):
+        windows = [(at(9), at(10))]
+        self.assertEqual(subtract_intervals(windows, [(at(8), at(9)), (at(10), at(11))]), windows)
+
+    def test_subtract_drops_fully_covered_windows(self):
+        self.assertEqual(subtract_intervals([(at(9), at(10))], [(at(8), at(11))]), [])
+
+    def test_slots_follow_the_grid_of_an_off_step_window(self):
+        window = (at(9, 10), at(11))
+        self.assertEqual(
+            list(slots_in_window(window, [window], self.HALF_HOUR)),
+            [(at(9, 10), at(9, 40)), (at(9, 40), at(10, 10)), (at(10, 10), at(10, 40))]
+        )
+
+    def test_slots_round_free_time_up_to_the_grid(self):
+        window = (at(9), at(11))
+        self.assertEqual(
+            list(slots_in_window(window, [(at(9, 5), at(10, 45))], self.HALF_HOUR)),
+            [(at(9, 30), at(10)), (at(10), at(10, 30))]
+        )
+
+    def test_free_slots_skip_busy_time(self):
+        slots = free_slots(
+            [(at(9), at(11))], [(at(10), at(10, 30)), (at(9), at(9, 15))], self.HALF_HOUR
+        )
+        self.assertEqual(slots, [(at(9, 30), at(10)), (at(10, 30), at(11))])
+
+    def test_each_window_keeps_its_own_grid(self):
+        slots = free_slots([(at(13, 15), at(14, 15)), (at(9), at(10))], [], self.HALF_HOUR)
+        self.assertEqual(slots, [
+            (at(9), at(9, 30)), (at(9, 30), at(10)), (at(13, 15), at(13, 45)), (at(13, 45), at(14, 15)),
+        ])
+
+    def test_no_availability_means_no_slots(self):
+        self.assertEqual(free_slots([], [(at(9), at(10))], self.HALF_HOUR), [])
+        self.assertEqual(free_slots([(at(9), at(9, 20))], [], self.HALF_HOUR), [])
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    CALENDAR_SYNC_PROVIDERS={'google': 'apps.scheduling.calendar_sync.LocalCalendarProvider'}
+)
+class CalendarSyncTests(TestCase):
+    """Syncing against the in-memory LocalCalendarProvider."""
+
+    def setUp(self):
+        calendar_sync._providers.clear()
+        self.addCleanup(calendar_sync._providers.clear)
+        self.attorney = create_attorney('attorney@example.com')
+        self.integration = CalendarIntegration.objects.create(
+            user=self.attorney.user, provider=CalendarIntegration.Provider.GOOGLE, access_token='token'
+        )
+        self.addCleanup(LocalCalendarProvider.calendars.pop, self.integration.pk, None)
+        self.start = (timezone.now() + timedelta(days=3)).replace(microsecond=0)
+
+    def sync(self):
+        outcome = CalendarSyncService.sync(self.integration)
+        self.integration.refresh_from_db()
+        return outcome
+
+    def busy_ids(self):
+        return set(
+            ExternalBusyTime.objects.filter(integration=self.integration).values_list('external_id', flat=True)
+        )
+
+    def test_rate_limits_back_off_exponentially(self):
+        LocalCalendarProvider.throttle(self.integration.pk, calls=2)
+
+        self.assertEqual(self.sync(), CalendarSyncService.RATE_LIMITED)
+        self.assertEqual(self.integration.sync_failures, 1)
+        first_delay = self.integration.next_sync_at - timezone.now()
+        self.assertEqual(self.sync(), CalendarSyncService.RATE_LIMITED)
+        self.assertEqual(self.integration.sync_failures, 2)
+        second_delay = self.integration.next_sync_at - timezone.now()
+
+        base = timedelta(seconds=CalendarSyncService.RETRY_BASE_SECONDS)
+        self.assertAlmostEqual(first_delay, base, delta=timedelta(seconds=5))
+        self.assertAlmostEqual(second_delay, base * 2, delta=timedelta(seconds=5))
+        self.assertIn('Rate limited', self.integration.last_sync_error)
+
+        self.assertEqual(self.sync(), CalendarSyncService.SYNCED)
+        self.assertEqual(self.integration.sync_failures, 0)
+        self.assertEqual(self.integration.last_sync_error, '')
+
+    def test_expired_sync_token_falls_back_to_a_full_sync(self):
+        stale = LocalCalendarProvider.add_event(self.integration.pk, self.start, self.start + timedelta(hours=1))
+        self.assertEqual(self.sync(), CalendarSyncService.SYNCED)
+        self.assertEqual(self.busy_ids(), {stale})
+
+        LocalCalendarProvider.remove_event(self.integration.pk, stale)
+        fresh = LocalCalendarProvider.add_event(
+            self.integration.pk, self.start + timedelta(hours=2), self.start + timedelta(hours=3)
+        )
+        LocalCalendarProvider.expire_tokens(self.integration.pk)
+
+        self.assertEqual(self.sync(), CalendarSyncService.SYNCED)
+        self.assertEqual(self.busy_ids(), {fresh})
+
+    def test_pushed_appointments_are_not_imported_back(self):
+        appointment = Appointment.objects.create(
+            attorney=self.attorney, client=create_client('client@example.com'),
+            date=self.start.date(), start_time=self.start.time(), duration_minutes=30,
+            timezone='UTC', status=Appointment.AppointmentStatus.CONFIRMED
+        )
+        other = LocalCalendarProvider.add_event(
+            self.integration.pk, self.start + timedelta(hours=2), self.start + timedelta(hours=3)
+        )
+
+        self.assertEqual(self.sync(), CalendarSyncService.SYNCED)
+        appointment.refresh_from_db()
+        self.assertTrue(appointment.google_event_id)
+        # The next pull sees the event the first sync pushed
+        self.assertEqual(self.sync(), CalendarSyncService.SYNCED)
+        self.assertEqual(self.busy_ids(), {other})
+
+
+class FreeBusyBitmapTests(SimpleTestCase):
+    """The 96 quarter bitmap of a day."""
+
+    ALL_FREE = (1 << freebusy.QUARTERS) - 1
+
+    def setUp(self):
+        self.day = date(2026, 6, 1)
+        self.utc = ZoneInfo('UTC')
+
+    def bitmap(self, windows, busy=(), day=None, zone=None):
+        return freebusy.build_bitmap(day or self.day, windows, list(busy), zone or self.utc)
+
+    def test_whole_day_sets_all_96_bits(self):
+        self.assertEqual(self.bitmap([(at(0), at(0) + timedelta(days=1))]), self.ALL_FREE)
+
+    def test_windows_are_clipped_to_the_day(self):
+        before = (at(0) - timedelta(hours=2), at(0, 15))
+        after = (at(23, 45), at(0) + timedelta(days=1, hours=1))
+        self.assertEqual(self.bitmap([before]), 1)
+        self.assertEqual(self.bitmap([after]), 1 << 95)
+
+    def test_partly_busy_quarters_are_not_free(self):
+        bitmap = self.bitmap([(at(10), at(11))], busy=[(at(10, 20), at(10, 25))])
+        self.assertEqual(bitmap, 0b1101 << 40)
+
+    def test_days_follow_the_zone(self):
+        new_york = ZoneInfo('America/New_York')
+        # Local midnight in New York is 04:00 UTC in June
+        bitmap = self.bitmap([(at(4), at(4, 30))], zone=new_york)
+        self.assertEqual(bitmap, 0b11)
+        self.assertEqual(freebusy.quarter_time(self.day, 2, new_york), at(4, 30))
+
+    def test_short_and_long_dst_days(self):
+        new_york = ZoneInfo('America/New_York')
+        spring, autumn = date(2026, 3, 8), date(2026, 11, 1)
+        whole = (
+            datetime(2026, 3, 7, tzinfo=dt_timezone.utc), datetime(2026, 11, 3, tzinfo=dt_timezone.utc)
+        )
+        # A 23 hour day has 92 quarters; a 25 hour day is cut at 96
+        self.assertEqual(self.bitmap([whole], day=spring, zone=new_york), (1 << 92) - 1)
+        self.assertEqual(self.bitmap([whole], day=autumn, zone=new_york), self.ALL_FREE)
+
+    def test_mask_before(self):
+        self.assertEqual(freebusy.mask_before(self.day, at(0) - timedelta(hours=1), self.utc), self.ALL_FREE)
+        self.assertEqual(freebusy.mask_before(self.day, at(0, 10), self.utc), self.ALL_FREE ^ 1)
+        self.assertEqual(freebusy.mask_before(self.day, at(0) + timedelta(days=1), self.utc), 0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FreeBusyCacheTests(TestCase):
+    """Cached bitmaps are dropped when the attorney's calendar changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.attorney = create_attorney('attorney@example.com')
+        self.attorney_id = self.attorney.user_id
+        self.day = timezone.localdate() + timedelta(days=7)
+        AttorneyAvailability.objects.create(
+            attorney=self.attorney, day_of_week=self.day.weekday(), start_time=time(9), end_time=time(17)
+        )
+        self.zones = {self.attorney_id: ZoneInfo('UTC')}
+
+    def bitmap(self):
+        return freebusy.get_bitmaps([self.attorney_id], self.day, 1, self.zones)[self.attorney_id][0]
+
+    def quarters(self, start_hour, end_hour):
+        return ((1 << (end_hour - start_hour) * 4) - 1) << start_hour * 4
+
+    def test_cached_day_is_rebuilt_after_a_booking(self):
+        self.assertEqual(self.bitmap(), self.quarters(9, 17))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.bitmap(), self.quarters(9, 17))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                attorney=self.attorney, client=create_client('client@example.com'), date=self.day,
+                start_time=time(10), duration_minutes=60, timezone='UTC'
+            )
+
+        self.assertEqual(self.bitmap(), self.quarters(9, 17) & ~self.quarters(10, 11))
+
+    def test_bumping_the_generation_retires_cached_days(self):
+        self.bitmap()
+        generation = freebusy._generations([self.attorney_id])[self.attorney_id]
+
+        freebusy.invalidate_attorney(self.attorney_id)
+
+        self.assertEqual(freebusy._generations([self.attorney_id])[self.attorney_id], generation + 1)
+        with self.assertNumQueries(4):
+            self.assertEqual(self.bitmap(), self.quarters(9, 17))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecurrenceTests(SimpleTestCase):
+    """Expanding recurring blocked time."""
+
+    def setUp(self):
+        cache.clear()
+        self.zone = ZoneInfo('America/New_York')
+        # Mondays 12:00-13:00 in New York, starting while on EST
+        self.start = datetime(2026, 3, 2, 17, tzinfo=dt_timezone.utc)
+        self.end = self.start + timedelta(hours=1)
+
+    def expand(self, rule, range_start, range_end):
+        block = ('block', self.start, self.end, rule, self.zone)
+        return recurrence.occurrences([block], range_start, range_end)['block']
+
+    def cache_key(self, rule, month):
+        return recurrence._cache_key('block', recurrence.rule_version(rule, self.start, self.end, self.zone), month)
+
+    def test_occurrences_keep_their_local_time_across_dst(self):
+        found = self.expand(
+            'FREQ=WEEKLY;BYDAY=MO',
+            datetime(2026, 3, 1, tzinfo=dt_timezone.utc), datetime(2026, 3, 17, tzinfo=dt_timezone.utc)
+        )
+        # Clocks go forward on March 8, so noon moves from 17:00 to 16:00 UTC
+        self.assertEqual([start for start, _ in found], [
+            datetime(2026, 3, 2, 17, tzinfo=dt_timezone.utc),
+            datetime(2026, 3, 9, 16, tzinfo=dt_timezone.utc),
+            datetime(2026, 3, 16, 16, tzinfo=dt_timezone.utc),
+        ])
+        self.assertTrue(all(end - start == timedelta(hours=1) for start, end in found))
+
+    def test_editing_the_rule_retires_cached_months(self):
+        march = (datetime(2026, 3, 1, tzinfo=dt_timezone.utc), datetime(2026, 4, 1, tzinfo=dt_timezone.utc))
+        weekly = 'FREQ=WEEKLY;BYDAY=MO'
+        self.assertEqual(len(self.expand(weekly, *march)), 5)
+        self.assertEqual(len(cache.get(self.cache_key(weekly, march[0]))), 5)
+
+        daily = 'FREQ=DAILY'
+        self.assertNotEqual(
+            recurrence.rule_version(daily, self.start, self.end, self.zone),
+            recurrence.rule_version(weekly, self.start, self.end, self.zone)
+        )
+        self.assertEqual(len(self.expand(daily, *march)), 30)
+
+    def test_cached_months_are_reused(self):
+        march = (datetime(2026, 3, 1, tzinfo=dt_timezone.utc), datetime(2026, 4, 1, tzinfo=dt_timezone.utc))
+        rule = 'FREQ=WEEKLY;BYDAY=MO'
+        self.expand(rule, *march)
+        cache.set(self.cache_key(rule, march[0]), [self.start])
+
+        self.assertEqual(self.expand(rule, *march), [(self.start, self.end)])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReminderTests(TestCase):
+    """Queued appointment reminders."""
+
+    def setUp(self):
+        self.attorney = create_attorney('attorney@example.com')
+        self.client_user = create_client('client@example.com')
+        self.client_user.timezone = 'America/New_York'
+        self.client_user.save(update_fields=['timezone'])
+        # 10:00 in New York on the day clocks go back, 2030-11-03
+        self.start = datetime(2030, 11, 3, 15, tzinfo=dt_timezone.utc)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment = Appointment.objects.create(
+                attorney=self.attorney, client=self.client_user, date=self.start.date(),
+                start_time=self.start.time(), duration_minutes=30, timezone='UTC',
+                status=Appointment.AppointmentStatus.CONFIRMED
+            )
+
+    def due(self):
+        return {
+            (reminder.user_id, reminder.kind): reminder.due_at
+            for reminder in AppointmentReminder.objects.filter(appointment=self.appointment)
+        }
+
+    def test_due_times_follow_each_attendees_timezone(self):
+        day_before, hour_before = AppointmentReminder.Kind.DAY_BEFORE, AppointmentReminder.Kind.HOUR_BEFORE
+        self.assertEqual(self.due(), {
+            # 10:00 the day before is still daylight time in New York
+            (self.client_user.pk, day_before): datetime(2030, 11, 2, 14, tzinfo=dt_timezone.utc),
+            (self.attorney.user_id, day_before): datetime(2030, 11, 2, 15, tzinfo=dt_timezone.utc),
+            (self.client_user.pk, hour_before): datetime(2030, 11, 3, 14, tzinfo=dt_timezone.utc),
+            (self.attorney.user_id, hour_before): datetime(2030, 11, 3, 14, tzinfo=dt_timezone.utc),
+        })
+
+    def test_reminders_are_sent_once(self):
+        reminders = Notification.objects.filter(
+            notification_type=Notification.NotificationType.APPOINTMENT_REMINDER
+        )
+        now = datetime(2030, 11, 2, 15, 30, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(ReminderService.send_due(now=now), 2)
+        self.assertEqual(
+            set(reminders.values_list('user_id', flat=True)), {self.client_user.pk, self.attorney.user_id}
+        )
+        self.assertEqual(ReminderService.send_due(now=now), 0)
+        self.assertEqual(reminders.count(), 2)
+        self.assertEqual(len(self.due()), 2)
+
+    def test_moving_an_appointment_moves_its_reminders(self):
+        self.appointment.date = date(2030, 11, 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment.save()
+
+        due = self.due()
+        self.assertEqual(len(due), 4)
+        self.assertEqual(
+            due[(self.client_user.pk, AppointmentReminder.Kind.HOUR_BEFORE)],
+            datetime(2030, 11, 10, 14, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(
+            due[(self.client_user.pk, AppointmentReminder.Kind.DAY_BEFORE)],
+            datetime(2030, 11, 9, 15, tzinfo=dt_timezone.utc)
+        )
+
+    def test_cancelling_an_appointment_drops_its_reminders(self):
+        self.appointment.status = Appointment.AppointmentStatus.CANCELLED
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment.save(update_fields=['status'])
+
+        self.assertEqual(self.due(), {})
@@ -16,6 +16,8 @@ urlpatterns = [
 
     # Availability
     path('available-slots/', views.AvailableSlotsView.as_view(), name='available-slots'),
+    path('available-slots/search/', views.AvailabilitySearchView.as_view(), name='availability-search'),
+    path('availability-badges/', views.AvailabilityBadgesView.as_view(), name='availability-badges'),
 
     # Blocked times
     path('blocked-times/', views.BlockedTimeListCreateView.as_view(), name='blocked-time-list'),
@@ -23,4 +25,8 @@ urlpatterns = [
 
     # Calendar integrations
     path('calendar-integrations/', views.CalendarIntegrationListView.as_view(), name='calendar-integrations'),
+
+    # Calendar feed
+    path('calendar-feed/', views.CalendarFeedView.as_view(), name='calendar-feed'),
+    path('calendar-feed/<str:token>.ics', views.CalendarFeedICSView.as_view(), name='calendar-feed-ics'),
 ]
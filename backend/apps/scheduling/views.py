@@ -1,18 +1,35 @@
 from rest_framework import generics, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
 from django.db.models import Q
-from datetime import datetime, timedelta, time
+from datetime import timedelta
 
-from .models import Appointment, CalendarIntegration, BlockedTime
+from .models import Appointment, CalendarFeed, CalendarIntegration, BlockedTime
+from . import freebusy, ical
+from .services import AvailabilityService, BookingService, SlotUnavailable
 from .serializers import (
     AppointmentSerializer, CreateAppointmentSerializer,
-    RescheduleAppointmentSerializer, CalendarIntegrationSerializer,
-    BlockedTimeSerializer, AvailableSlotsSerializer
+    RescheduleAppointmentSerializer, CalendarIntegrationSerializer, CalendarFeedSerializer,
+    BlockedTimeSerializer, AvailableSlotsSerializer, AvailabilitySearchSerializer,
+    AvailabilityBadgesSerializer
 )
 from apps.attorneys.views import IsAttorney, IsClient
-from apps.attorneys.models import AttorneyAvailability
+from apps.attorneys.utils import get_attorney_profile
+
+
+def appointments_for(user):
+    """Appointments visible to user, with everything AppointmentSerializer reads."""
+    if user.user_type == 'attorney':
+        appointments = Appointment.objects.filter(attorney__user=user)
+    else:
+        appointments = Appointment.objects.filter(client=user)
+    return appointments.select_related('client', 'attorney__user', 'matter')
 
 
 class AppointmentListView(generics.ListAPIView):
@@ -22,14 +39,7 @@ class AppointmentListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'attorney':
-            return Appointment.objects.filter(
-                attorney__user=user
-            ).select_related('client', 'attorney__user', 'matter')
-        return Appointment.objects.filter(
-            client=user
-        ).select_related('attorney__user', 'matter')
+        return appointments_for(self.request.user)
 
 
 class AppointmentCreateView(generics.CreateAPIView):
@@ -46,10 +56,7 @@ class AppointmentDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'attorney':
-            return Appointment.objects.filter(attorney__user=user)
-        return Appointment.objects.filter(client=user)
+        return appointments_for(self.request.user)
 
 
 class AppointmentConfirmView(APIView):
@@ -59,9 +66,8 @@ class AppointmentConfirmView(APIView):
 
     def post(self, request, pk):
         try:
-            appointment = Appointment.objects.get(
+            appointment = appointments_for(request.user).get(
                 pk=pk,
-                attorney__user=request.user,
                 status=Appointment.AppointmentStatus.PENDING
             )
         except Appointment.DoesNotExist:
@@ -72,9 +78,9 @@ class AppointmentConfirmView(APIView):
 
         appointment.status = Appointment.AppointmentStatus.CONFIRMED
         appointment.confirmed_at = timezone.now()
-        appointment.save()
+        appointment.save(update_fields=['status', 'confirmed_at', 'updated_at'])
 
-        return Response(AppointmentSerializer(appointment).data)
+        return Response(AppointmentSerializer(appointment, context={'request': request}).data)
 
 
 class AppointmentCancelView(APIView):
@@ -83,17 +89,9 @@ class AppointmentCancelView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        user = request.user
-        query = Q(pk=pk)
-
-        if user.user_type == 'attorney':
-            query &= Q(attorney__user=user)
-        else:
-            query &= Q(client=user)
-
         try:
-            appointment = Appointment.objects.get(
-                query,
+            appointment = appointments_for(request.user).get(
+                pk=pk,
                 status__in=['pending', 'confirmed']
             )
         except Appointment.DoesNotExist:
@@ -105,9 +103,9 @@ class AppointmentCancelView(APIView):
         appointment.status = Appointment.AppointmentStatus.CANCELLED
         appointment.cancelled_at = timezone.now()
         appointment.cancellation_reason = request.data.get('reason', '')
-        appointment.save()
+        appointment.save(update_fields=['status', 'cancelled_at', 'cancellation_reason', 'updated_at'])
 
-        return Response(AppointmentSerializer(appointment).data)
+        return Response(AppointmentSerializer(appointment, context={'request': request}).data)
 
 
 class AppointmentRescheduleView(APIView):
@@ -116,17 +114,9 @@ class AppointmentRescheduleView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        user = request.user
-        query = Q(pk=pk)
-
-        if user.user_type == 'attorney':
-            query &= Q(attorney__user=user)
-        else:
-            query &= Q(client=user)
-
         try:
-            appointment = Appointment.objects.get(
-                query,
+            appointment = appointments_for(request.user).get(
+                pk=pk,
                 status__in=['pending', 'confirmed']
             )
         except Appointment.DoesNotExist:
@@ -142,14 +132,17 @@ class AppointmentRescheduleView(APIView):
         serializer.is_valid(raise_exception=True)
 
         data = serializer.validated_data
-        appointment.date = data['date']
-        appointment.start_time = data['start_time']
-        appointment.end_time = data['end_time']
-        appointment.duration_minutes = data['duration_minutes']
-        appointment.status = Appointment.AppointmentStatus.RESCHEDULED
-        appointment.save()
+        try:
+            BookingService.reschedule(
+                appointment, data['date'], data['start_time'], data['duration_minutes']
+            )
+        except SlotUnavailable as exc:
+            return Response(
+                {'detail': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        return Response(AppointmentSerializer(appointment).data)
+        return Response(AppointmentSerializer(appointment, context={'request': request}).data)
 
 
 class AppointmentCompleteView(APIView):
@@ -159,9 +152,8 @@ class AppointmentCompleteView(APIView):
 
     def post(self, request, pk):
         try:
-            appointment = Appointment.objects.get(
+            appointment = appointments_for(request.user).get(
                 pk=pk,
-                attorney__user=request.user,
                 status=Appointment.AppointmentStatus.CONFIRMED
             )
         except Appointment.DoesNotExist:
@@ -172,9 +164,9 @@ class AppointmentCompleteView(APIView):
 
         appointment.status = Appointment.AppointmentStatus.COMPLETED
         appointment.attorney_notes = request.data.get('notes', appointment.attorney_notes)
-        appointment.save()
+        appointment.save(update_fields=['status', 'attorney_notes', 'updated_at'])
 
-        return Response(AppointmentSerializer(appointment).data)
+        return Response(AppointmentSerializer(appointment, context={'request': request}).data)
 
 
 class AvailableSlotsView(APIView):
@@ -190,7 +182,7 @@ class AvailableSlotsView(APIView):
         from apps.attorneys.models import AttorneyProfile
 
         try:
-            attorney = AttorneyProfile.objects.get(user_id=data['attorney_id'])
+            attorney = AttorneyProfile.objects.select_related('user').get(user_id=data['attorney_id'])
         except AttorneyProfile.DoesNotExist:
             return Response(
                 {'detail': 'Attorney not found.'},
@@ -198,73 +190,133 @@ class AvailableSlotsView(APIView):
             )
 
         date = data['date']
-        duration = data['duration_minutes']
-
-        # Get attorney's availability for this day of week
-        day_of_week = date.weekday()
-        availability = AttorneyAvailability.objects.filter(
-            attorney=attorney,
-            day_of_week=day_of_week,
-            is_active=True
-        )
+        duration = timedelta(minutes=data['duration_minutes'])
 
-        if not availability.exists():
-            return Response({'slots': []})
+        # Slot times are wall-clock times in the attorney's timezone
+        zone = Appointment.zone(attorney.user.timezone)
+        found = AvailabilityService.find_slots([attorney.user_id], date, date, duration)
+        slots = [
+            {
+                'start_time': slot_start.astimezone(zone).strftime('%H:%M'),
+                'end_time': slot_end.astimezone(zone).strftime('%H:%M'),
+                'is_available': True
+            }
+            for slot_start, slot_end in found.get(attorney.user_id, [])
+        ]
 
-        # Get existing appointments
-        existing = Appointment.objects.filter(
-            attorney=attorney,
-            date=date,
-            status__in=['pending', 'confirmed']
-        ).values_list('start_time', 'end_time')
-
-        # Get blocked times
-        date_start = timezone.make_aware(datetime.combine(date, time.min))
-        date_end = timezone.make_aware(datetime.combine(date, time.max))
-        blocked = BlockedTime.objects.filter(
-            attorney=attorney,
-            start_datetime__lt=date_end,
-            end_datetime__gt=date_start
-        )
+        return Response({'timezone': zone.key, 'slots': slots})
 
-        # Generate available slots
-        slots = []
-        slot_duration = timedelta(minutes=duration)
 
-        for avail in availability:
-            current = datetime.combine(date, avail.start_time)
-            end = datetime.combine(date, avail.end_time)
+class AvailabilitySearchView(APIView):
+    """
+    Find the earliest free slots for several attorneys over a date range.
 
-            while current + slot_duration <= end:
-                slot_start = current.time()
-                slot_end = (current + slot_duration).time()
+    Returns the first `limit` slots per attorney, or with `merge` the first
+    `limit` slots across all of them.
+    """
 
-                # Check if slot conflicts with existing appointments
-                is_available = True
-                for appt_start, appt_end in existing:
-                    if not (slot_end <= appt_start or slot_start >= appt_end):
-                        is_available = False
-                        break
+    permission_classes = [permissions.IsAuthenticated]
 
-                # Check blocked times
-                if is_available:
-                    slot_start_dt = timezone.make_aware(current)
-                    slot_end_dt = timezone.make_aware(current + slot_duration)
-                    for block in blocked:
-                        if not (slot_end_dt <= block.start_datetime or slot_start_dt >= block.end_datetime):
-                            is_available = False
-                            break
+    @staticmethod
+    def _slot(attorney_id, slot_start, slot_end, zone):
+        # date and times are wall-clock in the attorney's timezone
+        local_start = slot_start.astimezone(zone)
+        return {
+            'attorney_id': attorney_id,
+            'date': local_start.date(),
+            'start_time': local_start.strftime('%H:%M'),
+            'end_time': slot_end.astimezone(zone).strftime('%H:%M'),
+            'timezone': zone.key,
+            'start': slot_start,
+            'end': slot_end,
+        }
 
-                if is_available:
-                    slots.append({
-                        'start_time': slot_start.strftime('%H:%M'),
-                        'end_time': slot_end.strftime('%H:%M'),
-                        'is_available': True
-                    })
+    def post(self, request):
+        serializer = AvailabilitySearchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-                current += slot_duration
+        data = serializer.validated_data
+        found = AvailabilityService.find_slots(
+            data['attorney_ids'],
+            data['start_date'],
+            data['end_date'],
+            timedelta(minutes=data['duration_minutes']),
+            limit=data['limit'],
+            not_before=timezone.now()
+        )
+        zones = AvailabilityService.attorney_zones(data['attorney_ids'])
+
+        if data['merge']:
+            return Response({
+                'slots': [
+                    self._slot(attorney_id, slot_start, slot_end, zones[attorney_id])
+                    for slot_start, slot_end, attorney_id in
+                    AvailabilityService.earliest_slots(found, data['limit'])
+                ]
+            })
+
+        return Response({
+            'attorneys': [
+                {
+                    'attorney_id': attorney_id,
+                    'slots': [
+                        self._slot(attorney_id, slot_start, slot_end, zones[attorney_id])
+                        for slot_start, slot_end in found.get(attorney_id, [])
+                    ]
+                }
+                for attorney_id in data['attorney_ids']
+            ]
+        })
+
+
+class AvailabilityBadgesView(APIView):
+    """
+    Availability summary for many attorneys, for the matching screen.
+
+    Reads cached free/busy bitmaps, so hundreds of attorneys cost a couple
+    of cache reads plus a bulk rebuild of any days not cached yet.
+    """
 
-        return Response({'slots': slots})
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = AvailabilityBadgesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        now = timezone.now()
+        start_date = max(data.get('start_date') or timezone.localdate(), timezone.localdate())
+        duration = timedelta(minutes=data['duration_minutes'])
+        dates = [start_date + timedelta(days=offset) for offset in range(data['days'])]
+
+        # Days are counted in each attorney's timezone
+        zones = AvailabilityService.attorney_zones(data['attorney_ids'])
+        bitmaps = freebusy.get_bitmaps(data['attorney_ids'], start_date, data['days'], zones)
+
+        badges = []
+        for attorney_id in data['attorney_ids']:
+            zone = zones[attorney_id]
+            next_available = None
+            available_days = 0
+            free_slots = 0
+            for day, bitmap in zip(dates, bitmaps[attorney_id]):
+                starts = freebusy.slot_starts(bitmap, duration) & freebusy.mask_before(day, now, zone)
+                if not starts:
+                    continue
+                available_days += 1
+                free_slots += bin(starts).count('1')
+                if next_available is None:
+                    first = (starts & -starts).bit_length() - 1
+                    next_available = freebusy.quarter_time(day, first, zone)
+
+            badges.append({
+                'attorney_id': attorney_id,
+                'next_available': next_available,
+                'available_days': available_days,
+                'free_slot_starts': free_slots,
+            })
+
+        return Response({'start_date': start_date, 'days': data['days'], 'attorneys': badges})
 
 
 class UpcomingAppointmentsView(generics.ListAPIView):
@@ -274,21 +326,10 @@ class UpcomingAppointmentsView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        today = timezone.now().date()
-
-        if user.user_type == 'attorney':
-            return Appointment.objects.filter(
-                attorney__user=user,
-                date__gte=today,
-                status__in=['pending', 'confirmed']
-            ).select_related('client', 'matter').order_by('date', 'start_time')[:10]
-
-        return Appointment.objects.filter(
-            client=user,
-            date__gte=today,
+        return appointments_for(self.request.user).filter(
+            end_at__gt=timezone.now(),
             status__in=['pending', 'confirmed']
-        ).select_related('attorney__user', 'matter').order_by('date', 'start_time')[:10]
+        ).order_by('start_at')[:10]
 
 
 class CalendarIntegrationListView(generics.ListAPIView):
@@ -298,7 +339,7 @@ class CalendarIntegrationListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return CalendarIntegration.objects.filter(user=self.request.user)
+        return CalendarIntegration.objects.filter(user=self.request.user).order_by('provider')
 
 
 class BlockedTimeListCreateView(generics.ListCreateAPIView):
@@ -311,9 +352,7 @@ class BlockedTimeListCreateView(generics.ListCreateAPIView):
         return BlockedTime.objects.filter(attorney__user=self.request.user)
 
     def perform_create(self, serializer):
-        from apps.attorneys.models import AttorneyProfile
-        attorney = AttorneyProfile.objects.get(user=self.request.user)
-        serializer.save(attorney=attorney)
+        serializer.save(attorney=get_attorney_profile(self.request))
 
 
 class BlockedTimeDeleteView(generics.DestroyAPIView):
@@ -322,4 +361,72 @@ class BlockedTimeDeleteView(generics.DestroyAPIView):
     permission_classes = [IsAttorney]
 
     def get_queryset(self):
-        return BlockedTime.objects.filter(attorney__user=self.request.user)
+        # The delete signals read attorney.user_id
+        return BlockedTime.objects.filter(attorney__user=self.request.user).select_related('attorney')
+
+
+class CalendarFeedView(APIView):
+    """Get the current user's calendar feed URL, or rotate it with POST."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        feed, _ = CalendarFeed.objects.get_or_create(user=request.user)
+        return Response(CalendarFeedSerializer(feed, context={'request': request}).data)
+
+    def post(self, request):
+        feed, created = CalendarFeed.objects.get_or_create(user=request.user)
+        if not created:
+            feed.regenerate_token()
+        return Response(CalendarFeedSerializer(feed, context={'request': request}).data)
+
+
+class CalendarFeedICSView(View):
+    """
+    iCalendar feed for calendar apps, authenticated by the URL token.
+
+    Polls that send If-None-Match or If-Modified-Since for an unchanged feed
+    get a 304 after a single indexed lookup. Otherwise the feed is streamed
+    as it is read from the database.
+    """
+
+    def get(self, request, token):
+        feed = CalendarFeed.objects.select_related('user').filter(token=token).first()
+        if feed is None:
+            raise Http404
+
+        last_modified = int(feed.modified_at.timestamp())
+        response = get_conditional_response(
+            request, etag=feed.etag, last_modified=last_modified
+        )
+        if response is None:
+            response = StreamingHttpResponse(
+                self.stream(feed.user), content_type='text/calendar; charset=utf-8'
+            )
+            response['Content-Disposition'] = 'inline; filename="calendar.ics"'
+        response['ETag'] = feed.etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def stream(self, user):
+        since = timezone.now() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS)
+        is_attorney = user.user_type == 'attorney'
+        appointments = Appointment.objects.filter(end_at__gt=since)
+        if is_attorney:
+            appointments = appointments.filter(attorney__user=user).select_related('client', 'matter')
+            blocked_times = BlockedTime.objects.filter(
+                Q(end_datetime__gt=since) | Q(is_recurring=True),
+                attorney__user=user
+            ).iterator(chunk_size=500)
+        else:
+            appointments = appointments.filter(client=user).select_related('attorney__user', 'matter')
+            blocked_times = ()
+
+        return ical.write_feed(
+            f'{settings.SITE_NAME} - {user.full_name}',
+            appointments.order_by('start_at').iterator(chunk_size=500),
+            blocked_times,
+            viewer_is_attorney=is_attorney,
+            zone=Appointment.zone(user.timezone) if is_attorney else None,
+        )
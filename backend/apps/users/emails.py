@@ -1,9 +1,23 @@
 """Email utility functions for user-related emails."""
-from django.template.loader import render_to_string
+import logging
+
 from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
 from django.utils import timezone
 
+from apps.notifications import metrics, rendering
+
+logger = logging.getLogger(__name__)
+
+
+def _send(email):
+    """Send an account email, recording it without failing the caller."""
+    try:
+        with metrics.timed('email', metrics.ACCOUNT):
+            email.send(fail_silently=False)
+    except Exception:
+        logger.exception('Could not send account email to %s', email.to)
+
 
 def send_welcome_email(user):
     """Send welcome email to new user."""
@@ -16,8 +30,8 @@ def send_welcome_email(user):
     }
 
     subject = 'Welcome to Legal Connect!'
-    text_content = render_to_string('email/welcome.txt', context)
-    html_content = render_to_string('email/welcome.html', context)
+    text_content = rendering.render('email/welcome.txt', context)
+    html_content = rendering.render('email/welcome.html', context)
 
     email = EmailMultiAlternatives(
         subject=subject,
@@ -26,7 +40,7 @@ def send_welcome_email(user):
         to=[user.email]
     )
     email.attach_alternative(html_content, "text/html")
-    email.send(fail_silently=True)
+    _send(email)
 
 
 def send_password_changed_email(user):
@@ -57,7 +71,7 @@ The Legal Connect Team
         from_email=settings.DEFAULT_FROM_EMAIL,
         to=[user.email]
     )
-    email.send(fail_silently=True)
+    _send(email)
 
 
 def send_account_deactivated_email(user):
@@ -82,4 +96,4 @@ The Legal Connect Team
         from_email=settings.DEFAULT_FROM_EMAIL,
         to=[user.email]
     )
-    email.send(fail_silently=True)
+    _send(email)
@@ -0,0 +1,16 @@
+"""
+Celery application for legal_connect.
+
+Start a worker with ``celery -A legal_connect worker`` and the scheduler
+with ``celery -A legal_connect beat``.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'legal_connect.settings')
+
+app = Celery('legal_connect')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
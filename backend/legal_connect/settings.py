@@ -305,9 +305,30 @@ STRIPE_PUBLIC_KEY = config('STRIPE_PUBLIC_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
 
+# Push Notifications
+# Push is disabled until a provider is set: apps.notifications.push.FCMPushProvider
+# in production. LocalPushProvider only records sends in memory, for development.
+PUSH_PROVIDER = config('PUSH_PROVIDER', default='')
+FCM_PROJECT_ID = config('FCM_PROJECT_ID', default='')
+FCM_CREDENTIALS_FILE = config('FCM_CREDENTIALS_FILE', default='')
+PUSH_MAX_CONCURRENCY = config('PUSH_MAX_CONCURRENCY', default=32, cast=int)
+# (pushes, seconds) allowed per device token
+PUSH_TOKEN_RATE_LIMIT = (
+    config('PUSH_TOKEN_RATE_LIMIT_COUNT', default=20, cast=int),
+    config('PUSH_TOKEN_RATE_LIMIT_WINDOW', default=60, cast=int),
+)
+
 # Redis Configuration (for Channels and Celery)
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379')
 
+# Cache (shared across workers in production)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache' if DEBUG else 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': '' if DEBUG else REDIS_URL,
+    },
+}
+
 # Channel Layers for WebSockets
 CHANNEL_LAYERS = {
     'default': {
@@ -325,9 +346,77 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+# Tasks are queued from on_commit hooks on the request thread, so an
+# unreachable broker must fail fast instead of holding up the response
+CELERY_BROKER_CONNECTION_TIMEOUT = 2
+CELERY_BROKER_TRANSPORT_OPTIONS = {'socket_connect_timeout': 2, 'socket_timeout': 5}
+CELERY_TASK_PUBLISH_RETRY_POLICY = {
+    'max_retries': 1,
+    'interval_start': 0,
+    'interval_step': 0.5,
+    'interval_max': 0.5,
+}
+# Only workers reconnect in the background; they keep retrying
+CELERY_BROKER_CONNECTION_RETRY = True
+CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+CELERY_REDIS_SOCKET_CONNECT_TIMEOUT = 2
+CELERY_REDIS_SOCKET_TIMEOUT = 5
+CELERY_RESULT_BACKEND_TRANSPORT_OPTIONS = {
+    'retry_policy': {'max_retries': 1, 'interval_start': 0, 'interval_step': 0.5, 'interval_max': 0.5},
+}
+CELERY_BEAT_SCHEDULE = {
+    # Picks up retries and anything a per-request drain missed
+    'drain-notification-outbox': {
+        'task': 'apps.notifications.tasks.drain_notification_outbox',
+        'schedule': 30.0,
+    },
+    'send-notification-digests': {
+        'task': 'apps.notifications.tasks.send_notification_digests',
+        'schedule': 60 * 5,
+    },
+    'archive-notifications': {
+        'task': 'apps.notifications.tasks.archive_notifications',
+        'schedule': 60 * 60 * 6,
+    },
+    'send-appointment-reminders': {
+        'task': 'apps.scheduling.tasks.send_appointment_reminders',
+        'schedule': 60.0,
+    },
+    'sync-calendars': {
+        'task': 'apps.scheduling.tasks.sync_calendars',
+        'schedule': 60.0,
+    },
+}
+
+# Read notifications older than this are moved to the archive table
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=90, cast=int)
+
+# Messaging
+# New-message notifications for a conversation are coalesced per window
+MESSAGE_NOTIFICATION_WINDOW_SECONDS = config('MESSAGE_NOTIFICATION_WINDOW_SECONDS', default=60, cast=int)
+
+# Scheduling
+# Calendar feeds include appointments that ended up to this many days ago
+CALENDAR_FEED_PAST_DAYS = config('CALENDAR_FEED_PAST_DAYS', default=90, cast=int)
+# Refresh interval suggested to calendar apps polling a feed
+CALENDAR_FEED_REFRESH_MINUTES = config('CALENDAR_FEED_REFRESH_MINUTES', default=15, cast=int)
+# Adapter per CalendarIntegration.provider. Integrations of a provider left
+# empty are not synced. apps.scheduling.calendar_sync.LocalCalendarProvider
+# is an in-memory fake for development only.
+CALENDAR_SYNC_PROVIDERS = {
+    'google': config('CALENDAR_SYNC_GOOGLE_PROVIDER', default=''),
+    'outlook': config('CALENDAR_SYNC_OUTLOOK_PROVIDER', default=''),
+    'apple': config('CALENDAR_SYNC_APPLE_PROVIDER', default=''),
+}
+# Integrations synced in parallel by one worker
+CALENDAR_SYNC_CONCURRENCY = config('CALENDAR_SYNC_CONCURRENCY', default=8, cast=int)
+CALENDAR_SYNC_INTERVAL_SECONDS = config('CALENDAR_SYNC_INTERVAL_SECONDS', default=300, cast=int)
+CALENDAR_SYNC_MAX_BACKOFF_SECONDS = config('CALENDAR_SYNC_MAX_BACKOFF_SECONDS', default=60 * 60, cast=int)
 
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Uploads above this size are spooled to a temp file and streamed to storage
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(2.5 * 1024 * 1024)  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
 
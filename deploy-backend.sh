@@ -104,6 +104,27 @@ autorestart=true
 stderr_logfile=/var/log/legal-connect/backend.err.log
 stdout_logfile=/var/log/legal-connect/backend.out.log
 environment=PATH="/home/ec2-user/legal-connect/backend/env/bin",HOME="/home/ec2-user"
+
+[program:legal-connect-celery-worker]
+directory=/home/ec2-user/legal-connect/backend
+command=/home/ec2-user/legal-connect/backend/env/bin/celery --app legal_connect worker --loglevel INFO --concurrency 2
+user=ec2-user
+autostart=true
+autorestart=true
+stopwaitsecs=60
+stderr_logfile=/var/log/legal-connect/celery-worker.err.log
+stdout_logfile=/var/log/legal-connect/celery-worker.out.log
+environment=PATH="/home/ec2-user/legal-connect/backend/env/bin",HOME="/home/ec2-user"
+
+[program:legal-connect-celery-beat]
+directory=/home/ec2-user/legal-connect/backend
+command=/home/ec2-user/legal-connect/backend/env/bin/celery --app legal_connect beat --loglevel INFO --schedule logs/celerybeat-schedule
+user=ec2-user
+autostart=true
+autorestart=true
+stderr_logfile=/var/log/legal-connect/celery-beat.err.log
+stdout_logfile=/var/log/legal-connect/celery-beat.out.log
+environment=PATH="/home/ec2-user/legal-connect/backend/env/bin",HOME="/home/ec2-user"
 EOF
 
 sudo cp supervisor-config.conf /etc/supervisord.conf.d/legal-connect.conf
@@ -154,7 +175,7 @@ python manage.py check > /dev/null 2>&1 && echo -e "${GREEN}✓ Django check pas
 echo ""
 echo "Service Status:"
 echo "Supervisor Status:"
-sudo supervisorctl status legal-connect-backend
+sudo supervisorctl status legal-connect-backend legal-connect-celery-worker legal-connect-celery-beat
 echo ""
 echo "Nginx Status:"
 sudo systemctl status nginx --no-pager
@@ -164,6 +185,7 @@ echo -e "${GREEN}Gunicorn app is running on port 8000 (proxied through Nginx)${N
 echo ""
 echo "Logs:"
 echo "- Supervisor: sudo tail -f /var/log/legal-connect/backend.err.log"
+echo "- Celery: sudo tail -f /var/log/legal-connect/celery-worker.err.log"
 echo "- Gunicorn: tail -f logs/access.log"
 echo "- Nginx Access: sudo tail -f /var/log/nginx/api_access.log"
 echo "- Nginx Error: sudo tail -f /var/log/nginx/error.log"
@@ -222,16 +222,71 @@ environment=PATH="/home/ubuntu/legal-connect/backend/env/bin",HOME="/home/ubuntu
 stopsignal=QUIT
 stopwaitsecs=10
 
+[program:legal-connect-celery-worker]
+directory=/home/ubuntu/legal-connect/backend
+command=/home/ubuntu/legal-connect/backend/env/bin/celery \
+    --app legal_connect \
+    worker \
+    --loglevel INFO \
+    --concurrency 2 \
+    --max-tasks-per-child 1000
+
+user=ubuntu
+autostart=true
+autorestart=true
+startsecs=10
+stopasgroup=true
+killasgroup=true
+
+stderr_logfile=/var/log/legal-connect/celery-worker.err.log
+stderr_logfile_maxbytes=10MB
+stderr_logfile_backups=5
+stdout_logfile=/var/log/legal-connect/celery-worker.out.log
+stdout_logfile_maxbytes=10MB
+stdout_logfile_backups=5
+
+environment=PATH="/home/ubuntu/legal-connect/backend/env/bin",HOME="/home/ubuntu",PYTHONUNBUFFERED="1"
+
+stopsignal=TERM
+stopwaitsecs=60
+
+[program:legal-connect-celery-beat]
+directory=/home/ubuntu/legal-connect/backend
+command=/home/ubuntu/legal-connect/backend/env/bin/celery \
+    --app legal_connect \
+    beat \
+    --loglevel INFO \
+    --schedule /home/ubuntu/legal-connect/backend/logs/celerybeat-schedule
+
+user=ubuntu
+autostart=true
+autorestart=true
+startsecs=10
+stopasgroup=true
+killasgroup=true
+
+stderr_logfile=/var/log/legal-connect/celery-beat.err.log
+stderr_logfile_maxbytes=10MB
+stderr_logfile_backups=5
+stdout_logfile=/var/log/legal-connect/celery-beat.out.log
+stdout_logfile_maxbytes=10MB
+stdout_logfile_backups=5
+
+environment=PATH="/home/ubuntu/legal-connect/backend/env/bin",HOME="/home/ubuntu",PYTHONUNBUFFERED="1"
+
+stopsignal=TERM
+stopwaitsecs=10
+
 [group:legal-connect]
-programs=legal-connect-backend
+programs=legal-connect-backend,legal-connect-celery-worker,legal-connect-celery-beat
 priority=999
 SUPERVISOR_EOF
 
 supervisorctl reread > /dev/null 2>&1
 supervisorctl update > /dev/null 2>&1
-supervisorctl start legal-connect-backend > /dev/null 2>&1
+supervisorctl start 'legal-connect:*' > /dev/null 2>&1
 sleep 2
-print_success "Supervisor configured and backend started"
+print_success "Supervisor configured, backend and Celery started"
 
 # ==========================================
 # FRONTEND SETUP